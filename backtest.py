@@ -0,0 +1,578 @@
+"""
+Rolling-window backtest engine for the hybrid LR + RF model.
+
+Every window trains on all rows before index ``i`` and predicts the next
+``horizon`` months. Windows do not depend on each other, so the engine can
+send them to a process pool and merge the results back in window order.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.inspection import permutation_importance
+
+from backtest_metrics import MetricsAccumulator, METRIC_COLUMNS
+from feature_store import FeatureStore
+from linear_update import fit_linear_path, linear_predict
+
+# Defaults mirror the original loop in rolling_window.py
+WINDOW_SIZE = 12  # months
+HORIZON = 3       # next quarter is 3 months
+TOP_N_FEATURES = 10
+BASE_SEED = 42
+RF_N_ESTIMATORS = 100
+
+# Residual RF training modes: 'full' refits every window, 'warm' carries the forest forward
+RF_MODES = ('full', 'warm')
+WARM_TREES = 10  # trees replaced per window in 'warm' mode
+
+TARGET_COL = 'RNFB_w/out'
+LINEAR_COLS = ['CPI_lag_1m', 'currency_rate']
+
+# Remove all current month data, because in real-world applications for predicting current month RNBF,
+# we cannot obtain current month data features. Testing showed no performance degradation.
+RF_EXCLUDE_COLS = ['RNFB_w/out', 'RNFB_intp', 'CPI no adjusted', 'CPI_change_rate',
+                   'diesel_price', 'jet_price', 'LE Price', 'GF Price', 'ZW Price', 'DC Price',
+                   'apparent_temperature', 'temperature_2m', 'WRSI', 'FDD', 'snowfall'
+                   ]
+
+# Permutation-importance feature selection settings (part of the selection cache key)
+SELECTION_PARAMS = {'n_estimators': 10, 'n_repeats': 5, 'top_n': TOP_N_FEATURES}
+
+# Bump when the window training logic changes so stale artifacts are recomputed
+ARTIFACT_VERSION = 3
+WINDOW_ARTIFACT_KEYS = ['i', 'date', 'actual', 'predicted', 'test_pred', 'top_features', 'hash'] + METRIC_COLUMNS
+
+# Data shared by every task in a worker process (set once by _init_worker)
+_WORKER_DATA = {}
+
+
+def prepare_features(df_all_data):
+    """
+    Split the indexed data frame into the target and the two feature sets.
+    Args:
+        df_all_data (pd.DataFrame): Data indexed by REF_DATE_DT.
+    Returns:
+        tuple: (y, X_linear, X_rf_candidate)
+    """
+    y = df_all_data[TARGET_COL]
+    X_linear = df_all_data[LINEAR_COLS]
+    X_rf_candidate = df_all_data.drop(columns=[c for c in RF_EXCLUDE_COLS if c in df_all_data.columns])
+    return y, X_linear, X_rf_candidate
+
+
+def window_seed(i, base_seed=BASE_SEED):
+    """
+    Deterministic random_state for window ``i``.
+    The seed depends only on the window index, so results are identical
+    no matter which worker runs the window or in which order.
+    """
+    return (base_seed + i) % (2**32)
+
+
+def plan_workers(n_workers, n_windows):
+    """
+    Budget CPU cores between pool workers and the n_jobs of each window.
+    Args:
+        n_workers (int or None): Requested pool size. None or <= 0 uses every core.
+        n_windows (int): Number of windows to run.
+    Returns:
+        tuple: (n_workers, n_jobs_per_window)
+    """
+    cpu_count = os.cpu_count() or 1
+    if not n_workers or n_workers <= 0:
+        n_workers = cpu_count
+    n_workers = max(1, min(n_workers, n_windows))
+    # Threads left over after one core per worker go to the RF fits inside each window
+    n_jobs = max(1, cpu_count // n_workers)
+    return n_workers, n_jobs
+
+
+def select_top_features(X_train_clean, residuals_train, feature_names, seed=BASE_SEED, n_jobs=-1):
+    """
+    Rank candidate RF features by permutation importance against the LR residuals.
+    Args:
+        X_train_clean (np.ndarray): Candidate features without NaN columns.
+        residuals_train (np.ndarray): LR residuals on the same rows.
+        feature_names (list): Names of the columns of X_train_clean.
+    Returns:
+        list: Names of the top SELECTION_PARAMS['top_n'] features (may be empty).
+    """
+    # Ensure at least one feature remains after dropping NaNs
+    if X_train_clean.shape[0] == 0 or X_train_clean.shape[1] == 0:
+        return []
+
+    # Create a dummy RF for permutation importance, can be lightweight
+    dummy_rf = RandomForestRegressor(n_estimators=SELECTION_PARAMS['n_estimators'], random_state=seed, n_jobs=n_jobs)
+    dummy_rf.fit(X_train_clean, residuals_train)
+
+    result = permutation_importance(dummy_rf, X_train_clean, residuals_train,
+                                    n_repeats=SELECTION_PARAMS['n_repeats'], random_state=seed, n_jobs=n_jobs)
+    sorted_idx = result.importances_mean.argsort()[::-1]
+    return [feature_names[k] for k in sorted_idx[:SELECTION_PARAMS['top_n']]]
+
+
+def fit_linear(X_linear_train, y_train, feature_names=None):
+    """Fit the level-1 LinearRegression from scratch."""
+    lr_model = LinearRegression()
+    lr_model.fit(X_linear_train, y_train)
+    if feature_names is not None:
+        lr_model.feature_names_in_ = np.asarray(feature_names, dtype=object)
+    return lr_model
+
+
+def _window_residuals(store, i, lr_model):
+    """Returns (lr_model, lr_pred_train, residuals_train) of window i."""
+    y_train, X_linear_train, _ = store.train(i)
+    if lr_model is None:
+        lr_model = fit_linear(X_linear_train, y_train, store.linear_columns)
+    lr_pred_train = linear_predict(lr_model, X_linear_train)
+    return lr_model, lr_pred_train, y_train - lr_pred_train
+
+
+def select_window_features(i, store, seed=BASE_SEED, n_jobs=-1, lr_model=None):
+    """Select the RF features of window i from the residuals of its LR layer (fitted here if not given)."""
+    _, _, residuals_train = _window_residuals(store, i, lr_model)
+    # Drop columns with NaN values if any, as permutation importance doesn't handle them
+    clean_cols = store.clean_rf_columns(i)
+    X_train_clean = store.X_rf[:i, clean_cols]
+    return select_top_features(X_train_clean, residuals_train, [store.rf_columns[k] for k in clean_cols],
+                               seed=seed, n_jobs=n_jobs)
+
+
+def fit_residual_rf(X_train, residuals_train, feature_names, seed=BASE_SEED, n_jobs=-1, prev_rf=None, warm_trees=0):
+    """
+    Fit the level-2 RandomForest on the LR residuals.
+    When ``prev_rf`` was trained on the same feature columns (in the same
+    order, see warm_feature_order) and ``warm_trees`` is set, the forest is
+    carried forward instead: its oldest ``warm_trees``
+    trees are dropped and as many new ones are grown on the current slice with
+    ``warm_start``, so the forest stays at RF_N_ESTIMATORS trees.
+    Note that prev_rf is modified in place.
+    The forest is fitted on arrays; call set_feature_names afterwards.
+    """
+    if warm_trees and same_feature_set(prev_rf, feature_names):
+        rf_model = prev_rf
+        n_keep = max(0, min(len(rf_model.estimators_), RF_N_ESTIMATORS - warm_trees))
+        rf_model.estimators_ = rf_model.estimators_[len(rf_model.estimators_) - n_keep:]
+        # A fresh random_state per window keeps the new trees from repeating earlier bootstraps
+        rf_model.set_params(warm_start=True, n_estimators=n_keep + warm_trees, random_state=seed, n_jobs=n_jobs)
+        rf_model.fit(X_train, residuals_train)
+        rf_model.set_params(warm_start=False)
+        return rf_model
+
+    rf_model = RandomForestRegressor(n_estimators=RF_N_ESTIMATORS, random_state=seed, n_jobs=n_jobs)
+    rf_model.fit(X_train, residuals_train)
+    return rf_model
+
+
+def same_feature_set(prev_rf, feature_names):
+    """True when prev_rf was trained on exactly these features (in any order)."""
+    prev_names = getattr(prev_rf, 'feature_names_in_', None)
+    return prev_names is not None and set(prev_names) == set(feature_names) and len(prev_names) == len(feature_names)
+
+
+def warm_feature_order(prev_rf, feature_names):
+    """
+    Order a window's features for warm-starting prev_rf.
+    Permutation importance returns the same features in a different order from
+    window to window; the trees index columns by position, so the columns
+    must follow the order prev_rf was trained in.
+    Returns:
+        list: prev_rf's feature order when the sets match, else feature_names unchanged.
+    """
+    if prev_rf is not None and same_feature_set(prev_rf, feature_names):
+        return [str(name) for name in prev_rf.feature_names_in_]
+    return list(feature_names)
+
+
+def set_feature_names(model, feature_names):
+    """
+    Record column names on a model fitted on arrays, so the saved model
+    checks the column names of the DataFrames it is served with.
+    """
+    model.feature_names_in_ = np.asarray(feature_names, dtype=object)
+    return model
+
+
+def train_window(i, store, horizon=HORIZON, seed=BASE_SEED, n_jobs=-1, keep_models=False,
+                 top_features=None, prev_rf=None, warm_trees=0, lr_model=None):
+    """
+    Train the hybrid model on rows [:i] of ``store`` (a FeatureStore) and predict rows [i:i+horizon].
+    When ``top_features`` is given, permutation importance is skipped and
+    those features (restricted to the ones usable in this window) are used.
+    ``prev_rf``/``warm_trees`` grow the previous window's forest instead of
+    refitting it (see fit_residual_rf). ``lr_model`` is a linear layer already
+    fitted on rows [:i] (see linear_update.fit_linear_path).
+    Returns:
+        dict: Window index, train/test predictions, selected features and
+              (when keep_models is True) the fitted LR and RF models.
+    """
+    # Split data into training and test sets (row views, no copies)
+    X_rf_train = store.X_rf[:i]
+    y_test, X_linear_test, X_rf_test = store.test(i, horizon)
+
+    # 1. Train Linear Regression model (unless it was updated incrementally)
+    # 2. Calculate residuals from Linear Regression on the training set
+    lr_model, lr_pred_train, residuals_train = _window_residuals(store, i, lr_model)
+    lr_pred_test = linear_predict(lr_model, X_linear_test)
+
+    # 3. Select the RF features from the candidates, unless they were selected earlier
+    if top_features is None:
+        top_features = select_window_features(i, store, seed=seed, n_jobs=n_jobs, lr_model=lr_model)
+    # Ensure top features have no NaN in the training rows (the dropna(axis=1) of the slice)
+    clean = set(store.clean_rf_columns(i).tolist())
+    top_features = [f for f in top_features if store.rf_col_index.get(f) in clean]
+
+    rf_model = None
+    rf_pred_test = 0  # Default to 0 if RF cannot be trained
+    rf_pred_train = np.zeros_like(residuals_train)  # Default to zeros for train residuals
+
+    warm = False
+    if top_features:
+        # 4. Train Random Forest Regressor on top features to predict residuals
+        if warm_trees:
+            top_features = warm_feature_order(prev_rf, top_features)
+            warm = same_feature_set(prev_rf, top_features)
+        cols = store.rf_column_indices(top_features)
+        X_top_train = X_rf_train[:, cols]
+        rf_model = fit_residual_rf(X_top_train, residuals_train, top_features,
+                                   seed=seed, n_jobs=n_jobs, prev_rf=prev_rf, warm_trees=warm_trees)
+        rf_pred_test = rf_model.predict(X_rf_test[:, cols])
+        rf_pred_train = rf_model.predict(X_top_train)
+        set_feature_names(rf_model, top_features)
+
+    # 5. Combine predictions
+    hybrid_pred_test = lr_pred_test + rf_pred_test
+    hybrid_pred_train = lr_pred_train + rf_pred_train
+
+    # Metrics are computed for all windows at once by run_backtest (see backtest_metrics)
+    window = {
+        'i': i,
+        'date': store.index[i],
+        'actual': float(y_test[0]),
+        'predicted': float(hybrid_pred_test[0]),
+        'test_pred': [float(v) for v in hybrid_pred_test],
+        'train_pred': np.asarray(hybrid_pred_train, dtype=float),
+        'top_features': top_features,
+        'rf_warm': warm,
+    }
+    if keep_models:
+        window['lr_model'] = lr_model
+        window['rf_model'] = rf_model
+    return window
+
+
+def _init_worker(store, n_jobs=None):
+    """Pool initializer: receive the data once and cap native thread pools."""
+    _WORKER_DATA['store'] = store
+    if n_jobs is None:
+        return
+    try:
+        # Keep BLAS/OpenMP from spawning one thread per core in every worker
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=n_jobs)
+    except ImportError:
+        pass
+
+
+def _run_window_task(args):
+    i, horizon, seed, n_jobs, keep_models, top_features, lr_model = args
+    return train_window(i, _WORKER_DATA['store'], horizon=horizon, seed=seed, n_jobs=n_jobs,
+                        keep_models=keep_models, top_features=top_features, lr_model=lr_model)
+
+
+def _run_selection_task(args):
+    i, seed, n_jobs, lr_model = args
+    return select_window_features(i, _WORKER_DATA['store'], seed=seed, n_jobs=n_jobs, lr_model=lr_model)
+
+
+def _prefix_hashes(row_hashes, header, lengths):
+    hashes = {}
+    for key, n in lengths.items():
+        h = hashlib.sha256(header)
+        h.update(row_hashes[:n].tobytes())
+        hashes[key] = h.hexdigest()
+    return hashes
+
+
+def window_hashes(df_all_data, indices, horizon=HORIZON, base_seed=BASE_SEED, reselect_every=1,
+                  rf_mode='full', warm_trees=WARM_TREES):
+    """
+    Content hash of the data each window reads (rows [:i+horizon]) plus its settings.
+    Rows are hashed once; each window then hashes the prefix of the row hashes.
+    Returns:
+        dict: window index -> hex digest
+    """
+    row_hashes = pd.util.hash_pandas_object(df_all_data, index=True).values
+    header = json.dumps({
+        'version': ARTIFACT_VERSION,
+        'columns': list(df_all_data.columns),
+        'horizon': horizon,
+        'base_seed': base_seed,
+        'reselect_every': reselect_every,
+        'rf_mode': rf_mode,
+        'warm_trees': warm_trees if rf_mode == 'warm' else 0,
+    }).encode('utf-8')
+    return _prefix_hashes(row_hashes, header, {i: i + horizon for i in indices})
+
+
+def selection_keys(df_all_data, anchors, base_seed=BASE_SEED):
+    """
+    Feature-selection cache key of each anchor window: a hash of its training
+    slice (rows [:i]), the selection hyperparameters and the window seed.
+    Returns:
+        dict: window index -> hex digest
+    """
+    row_hashes = pd.util.hash_pandas_object(df_all_data, index=True).values
+    keys = {}
+    for i in anchors:
+        header = json.dumps({
+            'columns': list(df_all_data.columns),
+            'params': SELECTION_PARAMS,
+            'seed': window_seed(i, base_seed),
+        }, sort_keys=True).encode('utf-8')
+        keys.update(_prefix_hashes(row_hashes, header, {i: i}))
+    return keys
+
+
+def _load_selection(feature_cache_dir, key):
+    path = os.path.join(feature_cache_dir, f"{key}.json")
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)['top_features']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_selection(feature_cache_dir, key, top_features):
+    path = os.path.join(feature_cache_dir, f"{key}.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'top_features': top_features, 'params': SELECTION_PARAMS}, f)
+    os.replace(tmp_path, path)
+
+
+def selection_anchors(indices, reselect_every=1):
+    """
+    Map each window to the window whose feature selection it reuses.
+    With reselect_every=N, features are selected on every N-th window and the
+    windows in between reuse the most recent selection.
+    Returns:
+        dict: window index -> anchor window index
+    """
+    reselect_every = max(1, int(reselect_every or 1))
+    return {i: indices[(pos // reselect_every) * reselect_every] for pos, i in enumerate(indices)}
+
+
+def _artifact_path(cache_dir, i):
+    return os.path.join(cache_dir, f"window_{i:04d}.json")
+
+
+def load_window_artifact(cache_dir, i, expected_hash):
+    """Return the stored window ``i`` if its hash still matches, else None."""
+    path = _artifact_path(cache_dir, i)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            window = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if window.get('hash') != expected_hash:
+        return None
+    window['date'] = pd.Timestamp(window['date'])
+    return window
+
+
+def save_window_artifact(cache_dir, window):
+    """Write the model-free part of a window result as JSON (atomic replace)."""
+    record = {k: window[k] for k in WINDOW_ARTIFACT_KEYS if k in window}
+    record['date'] = pd.Timestamp(record['date']).isoformat()
+    for k in METRIC_COLUMNS:
+        record[k] = float(record[k])
+    path = _artifact_path(cache_dir, window['i'])
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(record, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def add_window_metrics(windows, y_values, horizon=HORIZON):
+    """
+    Score freshly trained windows in one vectorized pass and store the
+    metrics on each window dict (the bulky train predictions are dropped).
+    """
+    if not windows:
+        return
+    acc = MetricsAccumulator(len(windows), max(w['i'] for w in windows), horizon)
+    for w in windows:
+        i = w['i']
+        acc.add(i, y_values[:i], w.pop('train_pred'), y_values[i:i+horizon], w['test_pred'])
+    metrics = acc.compute()
+    for w in windows:
+        for col in METRIC_COLUMNS:
+            w[col] = float(metrics.at[w['i'], col])
+
+
+def _run_warm_windows(todo, store, horizon, base_seed, selections, anchor_of, warm_trees, lr_models,
+                      report=None):
+    # Each window grows the previous window's forest, so windows run in order in this process
+    results = []
+    prev_rf = None
+    for i in todo:
+        window = train_window(i, store, horizon=horizon, seed=window_seed(i, base_seed),
+                              n_jobs=-1, keep_models=True, top_features=selections[anchor_of[i]],
+                              prev_rf=prev_rf, warm_trees=warm_trees, lr_model=lr_models[i])
+        prev_rf = window['rf_model'] if window['rf_model'] is not None else prev_rf
+        results.append(window)
+        if report is not None:
+            report('train', len(results), len(todo))
+    n_warm = sum(window['rf_warm'] for window in results)
+    print(f"Warm RF: {n_warm} of {len(results)} windows grown from the previous forest "
+          f"({len(results) - n_warm} full fits after a feature change)")
+    # Only the last window keeps its models, as in 'full' mode
+    for window in results[:-1]:
+        window.pop('lr_model')
+        window.pop('rf_model')
+    return results
+
+
+def run_backtest(df_all_data, window_size=WINDOW_SIZE, horizon=HORIZON, n_workers=1, base_seed=BASE_SEED,
+                 cache_dir=None, reselect_every=1, rf_mode='full', warm_trees=WARM_TREES, progress=None):
+    """
+    Run every rolling window and return the results in window order.
+    Args:
+        df_all_data (pd.DataFrame): Data indexed by REF_DATE_DT.
+        window_size (int): Size of the first training window in months.
+        horizon (int): Number of months predicted by each window.
+        n_workers (int or None): Process pool size. 1 runs serially in this
+            process; None or 0 uses every core.
+        base_seed (int): Seed from which each window's random_state is derived.
+        cache_dir (str, optional): Incremental mode. Window artifacts are kept
+            here and only windows whose input hash changed are retrained.
+            The last window is always retrained so its models are available.
+            Feature selections are cached under cache_dir/features.
+        reselect_every (int): Run permutation importance on every N-th window
+            only; the windows in between reuse the last selected features.
+        rf_mode (str): 'full' retrains the residual RF in every window. 'warm'
+            carries the forest forward and replaces ``warm_trees`` trees per
+            window; windows then train one after another in this process
+            (feature selection still uses the pool). A window whose selected
+            feature set differs from the previous window's falls back to a full
+            fit, so pair it with reselect_every > 1. Not supported with
+            cache_dir: cached windows do not keep the forest chain.
+        warm_trees (int): Trees replaced per window in 'warm' mode.
+        progress (callable, optional): Called as progress(stage, done, total)
+            after each feature selection (stage 'select') and each trained
+            window (stage 'train'). Windows reused from cache_dir are not counted.
+    Returns:
+        list: One dict per window (see train_window). Only the last window
+              carries its fitted models.
+    """
+    if rf_mode not in RF_MODES:
+        raise ValueError(f"rf_mode must be one of {RF_MODES}, got {rf_mode!r}")
+    if rf_mode == 'warm' and cache_dir:
+        raise ValueError("rf_mode='warm' cannot be used with cache_dir: cached windows do not keep "
+                         "the forest chain, so the results would depend on the cache.")
+    if rf_mode == 'warm' and max(1, int(reselect_every or 1)) == 1:
+        print("Warning: rf_mode='warm' with reselect_every=1 re-selects features every window; "
+              "the forest is only carried forward while the selected set stays the same. "
+              "Use reselect_every > 1 for a longer warm chain.")
+
+    y, X_linear, X_rf_candidate = prepare_features(df_all_data)
+    store = FeatureStore(y, X_linear, X_rf_candidate)
+    indices = list(range(window_size, len(df_all_data) - horizon))
+    if not indices:
+        return []
+    last_i = indices[-1]
+
+    cached = {}
+    hashes = {}
+    feature_cache_dir = None
+    if cache_dir:
+        feature_cache_dir = os.path.join(cache_dir, "features")
+        os.makedirs(feature_cache_dir, exist_ok=True)
+        hashes = window_hashes(df_all_data, indices, horizon=horizon, base_seed=base_seed,
+                               reselect_every=reselect_every, rf_mode=rf_mode, warm_trees=warm_trees)
+        for i in indices[:-1]:
+            window = load_window_artifact(cache_dir, i, hashes[i])
+            if window is not None:
+                cached[i] = window
+        print(f"Incremental backtest: {len(cached)} of {len(indices)} windows reused from {cache_dir}")
+
+    todo = [i for i in indices if i not in cached]
+    anchor_of = selection_anchors(indices, reselect_every)
+    anchors = sorted({anchor_of[i] for i in todo})
+
+    # Feature selections already on disk
+    selections = {}
+    keys = {}
+    if feature_cache_dir:
+        keys = selection_keys(df_all_data, anchors, base_seed=base_seed)
+        for a in anchors:
+            top_features = _load_selection(feature_cache_dir, keys[a])
+            if top_features is not None:
+                selections[a] = top_features
+    to_select = [a for a in anchors if a not in selections]
+
+    # The linear layer of every window comes from one incremental pass (O(p^2) per row)
+    lr_models = fit_linear_path(X_linear, y, sorted(set(todo) | set(to_select)))
+
+    n_workers, n_jobs = plan_workers(n_workers, max(len(todo), len(to_select)))
+    executor = None
+    if n_workers == 1:
+        # n_jobs=-1 is safe without a pool around it
+        n_jobs = -1
+        _init_worker(store)
+    else:
+        executor = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                       initargs=(store, n_jobs))
+
+    def map_tasks(fn, tasks):
+        if executor is None:
+            return (fn(t) for t in tasks)
+        # map() yields results in submission order, so windows come back sorted by i
+        return executor.map(fn, tasks, chunksize=1)
+
+    def report(stage, done, total):
+        if progress is not None:
+            progress(stage, done, total)
+
+    try:
+        # Phase 1: permutation-importance feature selection on the anchor windows
+        selection_tasks = [(a, window_seed(a, base_seed), n_jobs, lr_models[a]) for a in to_select]
+        for k, (a, top_features) in enumerate(zip(to_select, map_tasks(_run_selection_task, selection_tasks)), 1):
+            selections[a] = top_features
+            if feature_cache_dir:
+                _save_selection(feature_cache_dir, keys[a], top_features)
+            report('select', k, len(to_select))
+
+        # Phase 2: train every window on its anchor's features
+        if rf_mode == 'warm':
+            trained = _run_warm_windows(todo, store, horizon, base_seed, selections, anchor_of, warm_trees,
+                                        lr_models, report=report)
+        else:
+            tasks = [(i, horizon, window_seed(i, base_seed), n_jobs, i == last_i, selections[anchor_of[i]],
+                      lr_models[i]) for i in todo]
+            trained = []
+            for window in map_tasks(_run_window_task, tasks):
+                trained.append(window)
+                report('train', len(trained), len(todo))
+        add_window_metrics(trained, store.y, horizon)
+        for window in trained:
+            if cache_dir:
+                window['hash'] = hashes[window['i']]
+                save_window_artifact(cache_dir, window)
+            cached[window['i']] = window
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        _WORKER_DATA.clear()
+
+    return [cached[i] for i in indices]
@@ -0,0 +1,157 @@
+"""
+Chart data for the dashboard: backtest results plus model projections.
+
+load_results() reads actual_vs_hybrid_predicted_rnfb.csv (written by
+rolling_window.py) in one vectorized pass and keeps it until the file's
+mtime or size changes, so a new backtest shows up without a restart.
+
+results_metrics() scores the same file as a whole (RMSE, MAE, R², as
+rolling_window.summarize reports them) for the dashboard's metric cards.
+
+model_projections() predicts the months after the last backtested one
+from their real feature rows in all_samples_clean_final.csv (the rows whose
+target is not known yet) with the active LR+RF bundle. It runs once per
+model version and samples file.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import backtest_metrics
+import data_cache
+import model_load
+import scenario
+
+RESULTS_CSV_PATH = os.path.join(model_load.BASE_DIR, 'actual_vs_hybrid_predicted_rnfb.csv')
+SAMPLES_CSV_PATH = os.path.join(model_load.BASE_DIR, 'all_samples_clean_final.csv')
+
+_lock = threading.Lock()
+_results_cache = {}       # path -> (stat key, frame)
+_metrics_cache = {}       # path -> (stat key, metrics)
+_projection_cache = {}    # (version, samples stat key, last date) -> frame
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _empty_frame():
+    return pd.DataFrame({'name': pd.Series(dtype=object), 'actual': pd.Series(dtype=float),
+                         'predicted': pd.Series(dtype=float), 'type': pd.Series(dtype=object)})
+
+
+def load_results(path=RESULTS_CSV_PATH):
+    """
+    Backtest results as chart rows ('YYYY-MM' name, actual, predicted, type='historical').
+    Returns:
+        tuple: (frame, stat key); the frame is shared, do not modify it.
+    Raises:
+        OSError: The results file does not exist.
+    """
+    key = _stat_key(path)
+    with _lock:
+        cached = _results_cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1], key
+
+    results = pd.read_csv(path, parse_dates=['Date'])
+    frame = pd.DataFrame({
+        'name': results['Date'].dt.strftime('%Y-%m'),
+        'actual': results['Actual RNFB'].astype(float),
+        'predicted': results['Hybrid Predicted RNFB'].astype(float),
+        'type': 'historical',
+    })
+    with _lock:
+        _results_cache[path] = (key, frame)
+    return frame, key
+
+
+def results_metrics(path=RESULTS_CSV_PATH):
+    """
+    Overall hybrid performance of the backtest results.
+    Returns:
+        dict or None: 'rmse', 'mae', 'r2' over every backtested month; None when
+        the results file is missing or empty.
+    """
+    try:
+        results, key = load_results(path)
+    except OSError:
+        return None
+    with _lock:
+        cached = _metrics_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    if results.empty:
+        metrics = None
+    else:
+        rmse, mae, r2 = (m[0] for m in backtest_metrics.batch_regression_metrics(
+            results['actual'].to_numpy()[None, :], results['predicted'].to_numpy()[None, :]))
+        metrics = {'rmse': float(rmse), 'mae': float(mae), 'r2': float(r2)}
+    with _lock:
+        _metrics_cache[path] = (key, metrics)
+    return metrics
+
+
+def model_projections(bundle, after, samples_path=SAMPLES_CSV_PATH):
+    """
+    Hybrid predictions for the sample months after `after`, from their feature rows.
+    Args:
+        bundle (model_registry.ModelBundle): Models to project with (must be ready).
+        after (pd.Timestamp): Last backtested month.
+    Returns:
+        tuple: (frame of chart rows with type='projected', cache key)
+    """
+    key = (bundle.version, _stat_key(samples_path), after)
+    with _lock:
+        cached = _projection_cache.get(key)
+    if cached is not None:
+        return cached, key
+
+    samples = data_cache.load_samples(samples_path)
+    future = samples[samples.index > after]
+    lr_cols, rf_cols = scenario.model_columns(bundle)
+    missing = [c for c in lr_cols + rf_cols if c not in future.columns]
+    if future.empty or not rf_cols or missing:
+        frame = _empty_frame()
+    else:
+        # Months whose model inputs are all known
+        future = future[future[lr_cols + rf_cols].notna().all(axis=1)]
+        lr_pred = np.asarray(bundle.lr_model.predict(future[lr_cols]), dtype=float).reshape(-1)
+        rf_pred = scenario.predict_rf(bundle, future[rf_cols])
+        frame = pd.DataFrame({
+            'name': future.index.strftime('%Y-%m'),
+            'actual': np.nan,
+            'predicted': lr_pred + rf_pred,
+            'type': 'projected',
+        })
+    with _lock:
+        # Only the latest version's projections are worth keeping
+        _projection_cache.clear()
+        _projection_cache[key] = frame
+    return frame, key
+
+
+def chart_frame(bundle):
+    """
+    Rows of the price chart: backtest results, then model projections when
+    the bundle is ready.
+    Returns:
+        tuple: (frame, data key) -- the key changes whenever the rows may have.
+    """
+    try:
+        results, results_key = load_results()
+    except OSError:
+        results, results_key = _empty_frame(), None
+    frames = [results]
+    projection_key = None
+    if bundle.ready and not results.empty:
+        try:
+            projections, projection_key = model_projections(bundle, pd.Timestamp(results['name'].iloc[-1]))
+            frames.append(projections)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Chart projections unavailable: {e}")
+    data = pd.concat(frames, ignore_index=True) if len(frames) > 1 else results
+    return data, repr((results_key, projection_key))
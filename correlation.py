@@ -0,0 +1,145 @@
+"""
+Pearson and Spearman correlation of every candidate feature with the target.
+
+correlate() ranks the data once and computes both coefficients for all
+columns in one vectorized pass (Spearman is Pearson on average ranks).
+expanding_correlations() gives both coefficients for every expanding
+backtest window: Pearson from prefix sums in O(1) per window and column,
+Spearman from cumulative rank counts instead of re-ranking every prefix.
+Results match DataFrame.corrwith, which drops NaN rows per column.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _pearson_columns(A, b):
+    """Pearson of each column of A (n, p) with b (n,); no NaN allowed."""
+    A = A - A.mean(axis=0)
+    b = b - b.mean()
+    num = b @ A
+    den = np.sqrt((A ** 2).sum(axis=0) * (b ** 2).sum())
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(den > 0, num / den, np.nan)
+
+
+def _rank(values):
+    """Average ranks (1-based) along axis 0, like pandas rank(method='average')."""
+    return pd.DataFrame(values).rank(axis=0, method='average').to_numpy()
+
+
+def correlate(X, y):
+    """
+    Pearson and Spearman correlation of every column of X with y.
+    Args:
+        X (pd.DataFrame): Candidate features.
+        y (pd.Series): Target, same index as X.
+    Returns:
+        pd.DataFrame: Indexed by feature, columns 'pearson' and 'spearman'.
+    """
+    values = X.to_numpy(dtype=float)
+    target = y.to_numpy(dtype=float)
+    pearson = np.full(values.shape[1], np.nan)
+    spearman = np.full(values.shape[1], np.nan)
+
+    y_valid = ~np.isnan(target)
+    complete = ~np.isnan(values[y_valid]).any(axis=0)
+
+    # Columns without NaN share one ranking of y and one ranking pass over X
+    if complete.any():
+        A = values[y_valid][:, complete]
+        b = target[y_valid]
+        pearson[complete] = _pearson_columns(A, b)
+        spearman[complete] = _pearson_columns(_rank(A), _rank(b[:, None])[:, 0])
+
+    # Columns with gaps: y has to be ranked on each column's own rows
+    for k in np.flatnonzero(~complete):
+        rows = y_valid & ~np.isnan(values[:, k])
+        if rows.sum() < 2:
+            continue
+        a = values[rows, k][:, None]
+        b = target[rows]
+        pearson[k] = _pearson_columns(a, b)[0]
+        spearman[k] = _pearson_columns(_rank(a), _rank(b[:, None])[:, 0])[0]
+
+    return pd.DataFrame({'pearson': pearson, 'spearman': spearman}, index=X.columns)
+
+
+def _expanding_pearson(values, target, ends):
+    """Pearson of rows [:L] for every L in ends, from masked prefix sums."""
+    mask = ~np.isnan(values) & ~np.isnan(target)[:, None]
+    x = np.where(mask, values, 0.0)
+    t = np.where(mask, target[:, None], 0.0)
+    zero = np.zeros((1, values.shape[1]))
+    cum = {name: np.vstack([zero, np.cumsum(arr, axis=0)])[ends]
+           for name, arr in (('n', mask.astype(float)), ('x', x), ('y', t),
+                             ('xx', x * x), ('yy', t * t), ('xy', x * t))}
+    n = cum['n']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = cum['xy'] - cum['x'] * cum['y'] / n
+        var_x = cum['xx'] - cum['x'] ** 2 / n
+        var_y = cum['yy'] - cum['y'] ** 2 / n
+        den = np.sqrt(var_x * var_y)
+        return np.where((n >= 2) & (den > 0), cov / den, np.nan)
+
+
+def _prefix_ranks(v):
+    """
+    R[L, j] = average rank of v[j] among v[:L] (valid for j < L).
+    Counts of smaller/equal values are accumulated over the prefix, so every
+    prefix's ranking comes from one cumulative sum instead of a new sort.
+    """
+    less = (v[None, :] < v[:, None]).astype(float)    # less[j, k] = v[k] < v[j]
+    equal = (v[None, :] == v[:, None]).astype(float)
+    zero = np.zeros((v.shape[0], 1))
+    count_less = np.hstack([zero, np.cumsum(less, axis=1)])   # [j, L] over k < L
+    count_equal = np.hstack([zero, np.cumsum(equal, axis=1)])
+    return (count_less + (count_equal + 1) / 2).T
+
+
+def _expanding_spearman_1d(x, target, ends):
+    rows = ~np.isnan(x) & ~np.isnan(target)
+    out = np.full(len(ends), np.nan)
+    if rows.all():
+        Rx = _prefix_ranks(x)[ends]
+        Ry = _prefix_ranks(target)[ends]
+        in_prefix = np.arange(x.shape[0])[None, :] < np.asarray(ends)[:, None]
+        n = in_prefix.sum(axis=1)
+        Rx = np.where(in_prefix, Rx, 0.0)
+        Ry = np.where(in_prefix, Ry, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (Rx * Ry).sum(axis=1) - Rx.sum(axis=1) * Ry.sum(axis=1) / n
+            var_x = (Rx ** 2).sum(axis=1) - Rx.sum(axis=1) ** 2 / n
+            var_y = (Ry ** 2).sum(axis=1) - Ry.sum(axis=1) ** 2 / n
+            den = np.sqrt(var_x * var_y)
+            return np.where((n >= 2) & (den > 0), cov / den, np.nan)
+
+    # Columns with gaps (rare): rank each prefix's valid rows directly
+    for w, end in enumerate(ends):
+        r = rows[:end]
+        if r.sum() >= 2:
+            out[w] = _pearson_columns(_rank(x[:end][r][:, None]), _rank(target[:end][r][:, None])[:, 0])[0]
+    return out
+
+
+def expanding_correlations(X, y, ends):
+    """
+    Pearson and Spearman of every feature over each expanding window rows [:L].
+    Args:
+        X (pd.DataFrame): Candidate features.
+        y (pd.Series): Target, same index as X.
+        ends (list): Window lengths L, e.g. the backtest window indices.
+    Returns:
+        tuple: (pearson, spearman) DataFrames, one row per window (labelled by
+               the date of row L, the first month the window predicts, or of
+               the last row when L reaches the end) and one column per feature.
+    """
+    ends = np.asarray(ends, dtype=int)
+    values = X.to_numpy(dtype=float)
+    target = y.to_numpy(dtype=float)
+    labels = X.index[np.minimum(ends, len(X.index) - 1)]
+
+    pearson = _expanding_pearson(values, target, ends)
+    spearman = np.column_stack([_expanding_spearman_1d(values[:, k], target, ends)
+                                for k in range(values.shape[1])]) if values.shape[1] else np.empty((len(ends), 0))
+    return (pd.DataFrame(pearson, index=labels, columns=X.columns),
+            pd.DataFrame(spearman, index=labels, columns=X.columns))
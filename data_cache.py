@@ -0,0 +1,178 @@
+"""
+Binary cache for all_samples_clean_final.csv.
+
+The CSV is parsed once (including the REF_DATE_DT -> datetime index) and saved
+as typed column blocks in NumPy .npy files. Later loads read the blocks
+directly, optionally memory-mapped, without any text parsing. The cache is
+rebuilt when the CSV's mtime/size change and its content hash no longer
+matches. Every file is written to a temp file and renamed into place, meta
+last, so a process loading the cache while another rebuilds it (the
+dashboard next to a retrain job) never reads a half-written block.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 1
+DATE_COL = 'REF_DATE_DT'
+DEFAULT_CACHE_DIR_NAME = '.data_cache'
+FLOAT_DTYPES = ('float64', 'float32')
+
+
+def read_samples_csv(csv_path):
+    """Parse the CSV and index it by REF_DATE_DT (the uncached path)."""
+    df = pd.read_csv(csv_path)
+    df[DATE_COL] = pd.to_datetime(df[DATE_COL].astype(str), format='%Y%m')
+    return df.set_index(DATE_COL)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cache_paths(csv_path, cache_dir, float_dtype):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(csv_path)), DEFAULT_CACHE_DIR_NAME)
+    stem = f"{os.path.splitext(os.path.basename(csv_path))[0]}.{float_dtype}"
+    return cache_dir, os.path.join(cache_dir, f"{stem}.meta.json"), os.path.join(cache_dir, stem)
+
+
+def _source_stat(csv_path):
+    st = os.stat(csv_path)
+    return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+
+def _replace_npy(path, values):
+    """Save an array through a temp file, so readers never see a half-written block."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, values)
+    os.replace(tmp_path, path)
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp_path, meta_path)
+
+
+def _write_cache(df, csv_path, cache_dir, meta_path, prefix, float_dtype, source_hash):
+    os.makedirs(cache_dir, exist_ok=True)
+    blocks = []
+    # One Fortran-ordered 2-D block per dtype, so each column is contiguous on disk
+    for dtype, cols in df.columns.groupby(df.dtypes.astype(str)).items():
+        cols = list(cols)
+        if dtype.startswith('float'):
+            dtype = float_dtype
+        elif not (dtype.startswith('int') or dtype == 'bool'):
+            raise TypeError(f"Cannot cache non-numeric columns {cols} (dtype {dtype})")
+        block_path = f"{prefix}.{dtype}.npy"
+        _replace_npy(block_path, np.asfortranarray(df[cols].to_numpy(dtype=dtype)))
+        blocks.append({'dtype': dtype, 'columns': cols, 'file': os.path.basename(block_path)})
+    index_path = f"{prefix}.index.npy"
+    _replace_npy(index_path, df.index.to_numpy(dtype='datetime64[ns]'))
+
+    meta = {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(csv_path),
+        'sha256': source_hash,
+        'columns': list(df.columns),
+        'index_file': os.path.basename(index_path),
+        'blocks': blocks,
+        **_source_stat(csv_path),
+    }
+    # Meta is written last: a half-written cache has no valid meta and is ignored
+    _write_meta(meta_path, meta)
+    return meta
+
+
+def _read_cache(cache_dir, meta, mmap_mode):
+    """
+    Raises:
+        OSError, ValueError: A block is missing or does not match the meta
+            (e.g. replaced by a concurrent rebuild).
+    """
+    index = pd.DatetimeIndex(np.load(os.path.join(cache_dir, meta['index_file'])), name=DATE_COL)
+    frames = []
+    for block in meta['blocks']:
+        values = np.load(os.path.join(cache_dir, block['file']), mmap_mode=mmap_mode)
+        if values.shape != (len(index), len(block['columns'])):
+            raise ValueError(f"Cache block {block['file']} does not match its meta.")
+        frames.append(pd.DataFrame(values, index=index, columns=block['columns'], copy=False))
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, axis=1)
+    return df[meta['columns']] if list(df.columns) != meta['columns'] else df
+
+
+def load_samples(csv_path, cache_dir=None, float_dtype='float64', mmap_mode=None, use_cache=True):
+    """
+    Load the samples CSV as a frame indexed by REF_DATE_DT, through the binary cache.
+    Args:
+        csv_path (str): Path of all_samples_clean_final.csv.
+        cache_dir (str, optional): Where the cache lives. Defaults to
+            .data_cache/ next to the CSV.
+        float_dtype (str): 'float64' (exact) or 'float32' (half the size).
+        mmap_mode (str, optional): Passed to np.load, e.g. 'r' to memory-map
+            the blocks read-only instead of reading them into memory.
+        use_cache (bool): False parses the CSV directly.
+    Returns:
+        pd.DataFrame
+    """
+    if float_dtype not in FLOAT_DTYPES:
+        raise ValueError(f"float_dtype must be one of {FLOAT_DTYPES}, got {float_dtype!r}")
+    if not use_cache:
+        return read_samples_csv(csv_path)
+
+    cache_dir, meta_path, prefix = _cache_paths(csv_path, cache_dir, float_dtype)
+    meta = None
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+
+    if meta is not None and meta.get('version') == CACHE_VERSION:
+        stat = _source_stat(csv_path)
+        source_hash = None
+        if not (meta['mtime_ns'] == stat['mtime_ns'] and meta['size'] == stat['size']):
+            # Touched but maybe not changed (e.g. a fresh checkout): compare content before rebuilding
+            source_hash = file_sha256(csv_path)
+            if meta['sha256'] == source_hash:
+                meta.update(stat)
+                try:
+                    _write_meta(meta_path, meta)
+                except OSError:
+                    # Read-only cache directory: still a hit, the hash is checked again next time
+                    pass
+            else:
+                meta = None
+        if meta is not None:
+            try:
+                return _read_cache(cache_dir, meta, mmap_mode)
+            except (OSError, ValueError) as e:
+                print(f"Warning: data cache unreadable ({e}); rebuilding it.")
+        if source_hash is None:
+            source_hash = file_sha256(csv_path)
+    else:
+        source_hash = file_sha256(csv_path)
+
+    df = read_samples_csv(csv_path)
+    try:
+        meta = _write_cache(df, csv_path, cache_dir, meta_path, prefix, float_dtype, source_hash)
+    except (OSError, TypeError) as e:
+        print(f"Warning: could not write data cache ({e}); using the parsed CSV.")
+        return df
+    # Read back so the first load has the same dtypes as later cached loads
+    try:
+        return _read_cache(cache_dir, meta, mmap_mode)
+    except (OSError, ValueError):
+        # Another process rebuilt the cache in between; the parsed CSV is just as good
+        return df
@@ -0,0 +1,54 @@
+"""
+Array-backed feature store for the rolling-window backtest.
+
+Holds the target, the linear features and the RF candidate features as
+contiguous float64 arrays with a column index map, so a window's training
+and test sets are plain row-slice views instead of freshly allocated
+DataFrames. A per-column "first NaN row" table turns the per-window
+``dropna(axis=1)`` into a single vectorized comparison.
+"""
+import numpy as np
+
+
+class FeatureStore:
+    """
+    Args:
+        y (pd.Series): Target.
+        X_linear (pd.DataFrame): Linear-layer features.
+        X_rf_candidate (pd.DataFrame): RF candidate features.
+    All three must share the same index (see backtest.prepare_features).
+    """
+
+    def __init__(self, y, X_linear, X_rf_candidate):
+        self.index = y.index
+        self.y = np.ascontiguousarray(y.to_numpy(dtype=float))
+        self.X_linear = np.ascontiguousarray(X_linear.to_numpy(dtype=float))
+        self.X_rf = np.ascontiguousarray(X_rf_candidate.to_numpy(dtype=float))
+        self.linear_columns = list(X_linear.columns)
+        self.rf_columns = list(X_rf_candidate.columns)
+        self.rf_col_index = {name: k for k, name in enumerate(self.rf_columns)}
+
+        # First row holding a NaN in each RF column (n_rows if the column has none).
+        # Column c is NaN-free on rows [:i] exactly when rf_first_nan[c] >= i.
+        n_rows = self.X_rf.shape[0]
+        nan_mask = np.isnan(self.X_rf)
+        self.rf_first_nan = np.where(nan_mask.any(axis=0), nan_mask.argmax(axis=0), n_rows)
+
+    def __len__(self):
+        return self.y.shape[0]
+
+    def clean_rf_columns(self, i):
+        """Indices of the RF columns without NaN on rows [:i] (the dropna(axis=1) of the slice)."""
+        return np.flatnonzero(self.rf_first_nan >= i)
+
+    def rf_column_indices(self, names):
+        """Map RF column names to array column indices, skipping unknown names."""
+        return np.array([self.rf_col_index[n] for n in names if n in self.rf_col_index], dtype=np.intp)
+
+    def train(self, i):
+        """Views of the training rows [:i]: (y, X_linear, X_rf)."""
+        return self.y[:i], self.X_linear[:i], self.X_rf[:i]
+
+    def test(self, i, horizon):
+        """Views of the test rows [i:i+horizon]: (y, X_linear, X_rf)."""
+        return self.y[i:i+horizon], self.X_linear[i:i+horizon], self.X_rf[i:i+horizon]
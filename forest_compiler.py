@@ -0,0 +1,260 @@
+"""
+Flat-array inference for a fitted RandomForestRegressor.
+
+compile_forest() copies the nodes of every tree into contiguous arrays
+(feature, threshold, left, right, value) and CompiledForest.predict() walks
+all trees for all rows at once with NumPy, one tree level per step. This
+skips sklearn's input validation and per-tree dispatch, which dominate the
+cost of predicting one scenario row.
+
+Results are bit-for-bit identical to RandomForestRegressor.predict: inputs
+are rounded to float32 like sklearn's trees do, and tree outputs are summed
+in tree order before dividing by the number of trees.
+
+save_compiled()/load_compiled() store the node arrays as uncompressed .npy
+files that can be memory-mapped, so processes serving the same model share
+the pages instead of each holding an unpickled copy.
+"""
+import json
+import os
+
+import numpy as np
+
+TREE_LEAF = -1
+COMPILED_FORMAT_VERSION = 1
+NODE_ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'missing_left', 'roots')
+
+
+class CompiledForest:
+    """
+    Flattened forest. Node ``k`` of every tree lives at the same offset in
+    each array; ``roots`` holds the offset of each tree's root node.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, missing_left, roots, max_depth, feature_names=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.missing_left = missing_left
+        self.roots = roots
+        self.max_depth = max_depth
+        self.feature_names = list(feature_names) if feature_names is not None else None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    # sklearn-style attributes, so code that inspects RF models works on either
+    @property
+    def n_estimators(self):
+        return self.n_trees
+
+    @property
+    def feature_names_in_(self):
+        if self.feature_names is None:
+            raise AttributeError("feature_names_in_")
+        return np.asarray(self.feature_names, dtype=object)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def leaf_nodes(self, X):
+        """
+        Leaf reached by every row in every tree.
+        Args:
+            X (array-like): (n_rows, n_features), or a single row (n_features,).
+        Returns:
+            np.ndarray: (n_rows, n_trees) node offsets.
+        """
+        X = np.asarray(X, dtype=np.float32)   # sklearn's trees compare float32 inputs
+        if X.ndim == 1:
+            X = X[None, :]
+        X = X.astype(np.float64)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            left = self.left[node]
+            is_leaf = left == TREE_LEAF
+            if is_leaf.all():
+                break
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+            node = np.where(is_leaf, node, np.where(go_left, left, self.right[node]))
+        return node
+
+    def _values(self, X):
+        """DataFrames are reordered to the training columns by name; arrays pass through."""
+        if hasattr(X, 'columns'):
+            if self.feature_names is not None:
+                X = X[self.feature_names]
+            return X.to_numpy(dtype=np.float64)
+        return X
+
+    def predict_trees(self, X):
+        """Per-tree predictions, shape (n_rows, n_trees)."""
+        return self.value[self.leaf_nodes(self._values(X))]
+
+    def _mean(self, per_tree):
+        # cumsum adds in tree order, like sklearn's accumulation (np.sum would use pairwise sums)
+        return np.cumsum(per_tree, axis=1)[:, -1] / self.n_trees
+
+    def predict(self, X):
+        """
+        Mean over trees, shape (n_rows,). Same result as RandomForestRegressor.predict.
+        DataFrames are reordered to the training columns by name.
+        """
+        return self._mean(self.predict_trees(X))
+
+    def predict_frame(self, df):
+        """Predict from a DataFrame, taking the columns in training order by name."""
+        return self.predict(df)
+
+    def predict_quantiles(self, X, quantiles=(0.05, 0.95)):
+        """
+        Mean and quantiles of the per-tree predictions, from the same single
+        traversal as predict (the mean is identical to predict's).
+        Returns:
+            tuple: (mean (n_rows,), quantiles (n_rows, len(quantiles)))
+        """
+        per_tree = self.predict_trees(X)
+        return self._mean(per_tree), np.quantile(per_tree, quantiles, axis=1).T
+
+
+def compile_forest(rf_model):
+    """
+    Flatten a fitted single-output RandomForestRegressor.
+    Returns:
+        CompiledForest
+    """
+    estimators = getattr(rf_model, 'estimators_', None)
+    if not estimators:
+        raise ValueError("Model is not a fitted forest (no estimators_).")
+
+    features, thresholds, lefts, rights, values, missing, roots = [], [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for est in estimators:
+        tree = est.tree_
+        if tree.n_outputs != 1:
+            raise ValueError("Only single-output forests can be compiled.")
+        n = tree.node_count
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        leaf = left == TREE_LEAF
+        features.append(np.where(leaf, 0, tree.feature).astype(np.int64))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(leaf, TREE_LEAF, left + offset))
+        rights.append(np.where(leaf, TREE_LEAF, right + offset))
+        values.append(tree.value[:, 0, 0].astype(np.float64))
+        # Trees fitted without missing values send NaN right (x <= t is False)
+        missing_go_left = getattr(tree, 'missing_go_to_left', None)
+        missing.append(np.zeros(n, dtype=bool) if missing_go_left is None else missing_go_left.astype(bool))
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    return CompiledForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        right=np.concatenate(rights),
+        value=np.concatenate(values),
+        missing_left=np.concatenate(missing),
+        roots=np.asarray(roots, dtype=np.int64),
+        max_depth=max_depth + 1,
+        feature_names=getattr(rf_model, 'feature_names_in_', None),
+    )
+
+
+def save_compiled(compiled, out_dir, extra_meta=None):
+    """
+    Write the node arrays as uncompressed .npy files plus meta.json.
+    The directory is built next to out_dir and renamed into place, so
+    readers never see a half-written model.
+    """
+    tmp_dir = f"{out_dir}.tmp{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name in NODE_ARRAYS:
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(getattr(compiled, name)))
+    meta = {
+        'version': COMPILED_FORMAT_VERSION,
+        'max_depth': int(compiled.max_depth),
+        'feature_names': [str(f) for f in compiled.feature_names] if compiled.feature_names is not None else None,
+        **(extra_meta or {}),
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+    if os.path.isdir(out_dir):
+        old_dir = f"{out_dir}.old{os.getpid()}"
+        os.rename(out_dir, old_dir)
+        os.rename(tmp_dir, out_dir)
+        for name in os.listdir(old_dir):
+            os.remove(os.path.join(old_dir, name))
+        os.rmdir(old_dir)
+    else:
+        os.rename(tmp_dir, out_dir)
+    return out_dir
+
+
+def read_compiled_meta(model_dir):
+    with open(os.path.join(model_dir, 'meta.json'), 'r') as f:
+        return json.load(f)
+
+
+def load_compiled(model_dir, mmap_mode='r'):
+    """
+    Load a forest written by save_compiled. With mmap_mode='r' the node
+    arrays stay in the page cache and are shared by every process that maps them.
+    """
+    meta = read_compiled_meta(model_dir)
+    if meta.get('version') != COMPILED_FORMAT_VERSION:
+        raise ValueError(f"Unsupported compiled forest version {meta.get('version')}")
+    arrays = {name: np.load(os.path.join(model_dir, f"{name}.npy"), mmap_mode=mmap_mode) for name in NODE_ARRAYS}
+    return CompiledForest(max_depth=meta['max_depth'], feature_names=meta['feature_names'], **arrays)
+
+
+def sample_inputs(compiled, n_samples=256, seed=0):
+    """
+    Random rows spanning each feature's split thresholds (and a margin around
+    them), so every branch direction gets exercised by verify().
+    """
+    rng = np.random.default_rng(seed)
+    n_features = int(compiled.feature.max()) + 1 if compiled.n_nodes else 1
+    if compiled.feature_names is not None:
+        n_features = max(n_features, len(compiled.feature_names))
+    X = np.zeros((n_samples, n_features))
+    is_split = compiled.left != TREE_LEAF
+    for f in range(n_features):
+        t = compiled.threshold[is_split & (compiled.feature == f)]
+        if t.size == 0:
+            continue
+        lo, hi = t.min(), t.max()
+        margin = max(hi - lo, 1.0) * 0.1
+        X[:, f] = rng.uniform(lo - margin, hi + margin, n_samples)
+    return X
+
+
+def verify(rf_model, compiled, X=None):
+    """
+    Compare the compiled forest with sklearn on X (default: sample_inputs).
+    sklearn is run with n_jobs=1 so its tree outputs are added in order.
+    Returns:
+        tuple: (identical, max_abs_diff)
+    """
+    if X is None:
+        X = sample_inputs(compiled)
+    n_jobs = rf_model.n_jobs
+    try:
+        rf_model.n_jobs = 1
+        if compiled.feature_names is not None:
+            import pandas as pd
+            expected = rf_model.predict(pd.DataFrame(X, columns=compiled.feature_names))
+        else:
+            expected = rf_model.predict(X)
+    finally:
+        rf_model.n_jobs = n_jobs
+    actual = compiled.predict(X)
+    return bool(np.array_equal(actual, expected)), float(np.max(np.abs(actual - expected)))
@@ -0,0 +1,39 @@
+"""
+Production serving of the dashboard:
+
+    gunicorn -c gunicorn.conf.py
+
+preload_app imports the dashboard and loads the models once in the master
+(rnfb_dashboard.create_server). The forked workers then share those pages
+copy-on-write, and the memory-mapped compiled forest is shared outright.
+Uploads and retrains in one worker reach the others through the model
+registry's ACTIVE.json (ModelRegistry.sync_active).
+
+Workers share their state through files on this host, so every worker
+serves every session the same way:
+    * debug log and prediction cache: SQLite files in .prediction_cache/
+      (RNFB_LOG_STORE=0 / RNFB_PREDICTION_CACHE=0 make them per process;
+      keep RNFB_WORKERS=1 then, or the sidebar skips log entries);
+    * retrain jobs: one at a time across workers (lock file in
+      .retrain_jobs/), published by whichever worker sees the job end;
+    * stored models: deleted only under the model registry's lock.
+The locks are fcntl locks, so all workers must run on one host with a
+local filesystem (not NFS), which is what a single gunicorn master gives.
+
+Settings come from the environment:
+    RNFB_BIND      address to listen on (default 0.0.0.0:8050)
+    RNFB_WORKERS   worker processes (default: one per core)
+    RNFB_THREADS   threads per worker (default 4)
+    RNFB_TIMEOUT   seconds before a silent worker is restarted (default 120)
+"""
+import multiprocessing
+import os
+
+wsgi_app = "rnfb_dashboard:create_server()"
+bind = os.environ.get('RNFB_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('RNFB_WORKERS', multiprocessing.cpu_count()))
+# Threads serve concurrent callbacks of one worker; numpy/sklearn release the GIL in predict
+worker_class = 'gthread'
+threads = int(os.environ.get('RNFB_THREADS', 4))
+timeout = int(os.environ.get('RNFB_TIMEOUT', 120))
+preload_app = True
@@ -0,0 +1,210 @@
+"""
+Month-by-month hybrid forecasts from the end of the sample data to a target month.
+
+The models read lagged series (ZW_lag_8M is the wheat price 8 months
+earlier), so a forecast for a month far past the data depends on every
+month in between. HorizonForecaster extends the monthly raw series of
+all_samples_clean_final.csv one month at a time:
+    * the scenario drivers (CPI, exchange rate, fuel, wheat, milk, cattle)
+      take the user's scenario values from the first forecast month on;
+    * weather series (lag_features.CLIMATOLOGY_SERIES) take their
+      calendar-month means;
+    * any other series keeps its last observed value.
+The months go through a lag_features.LagBuffer, which yields each month's
+model columns by the same rules as training, so near months still read
+real history (ZW_lag_12M stays observed for a year). The predicted target
+is written back into the buffer as well. Steps are batched: all months
+that do not depend on each other are predicted in one LR call and one
+forest pass. The current models have no target lags, so the whole horizon
+is a single batch.
+
+Paths are cached per model version, samples file and scenario. Moving the
+target further out computes only the months past the cached prefix. The
+history and its climatology are read once per samples file, and with a
+prediction_cache.PredictionCache finished paths are shared with the other
+worker processes as well.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import backtest
+import data_cache
+import lag_features
+import prediction_cache
+import scenario
+
+MAX_HORIZON_MONTHS = 120
+DEFAULT_MAX_PATHS = 64
+SCENARIO_DECIMALS = 6
+
+
+def month_label(month):
+    return month.strftime('%Y-%m')
+
+
+class HorizonForecaster:
+    """
+    Args:
+        samples_path (str): all_samples_clean_final.csv (history of the raw series).
+        max_paths (int): Cached paths (least recently used dropped first).
+        cache (prediction_cache.PredictionCache, optional): Shared store for finished paths.
+    """
+
+    def __init__(self, samples_path, max_paths=DEFAULT_MAX_PATHS, cache=None):
+        self.samples_path = samples_path
+        self.max_paths = max(1, int(max_paths))
+        self.cache = cache
+        self._paths = OrderedDict()
+        self._history_cache = None   # (stat key, history, climatology)
+        self._lock = threading.Lock()
+
+    def _history(self):
+        """
+        Raw series of the sample data (derived columns dropped), their calendar-month
+        means and the samples file's stat key; reloaded only when the file changes.
+        """
+        st = os.stat(self.samples_path)
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._history_cache
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2], key
+        samples = data_cache.load_samples(self.samples_path)
+        history = samples[lag_features.raw_columns(samples)]
+        climatology = lag_features.climatology(history)
+        with self._lock:
+            self._history_cache = (key, history, climatology)
+        return history, climatology, key
+
+    def _future_raw(self, history, climatology, months, inputs, series):
+        """Raw series for months past the history, one row per month in `series` order (target left empty)."""
+        held = lag_features.held_values(history)
+        future = np.empty((len(months), len(series)))
+        for k, col in enumerate(series):
+            if col in scenario.SCENARIO_SERIES:
+                name, scale = scenario.SCENARIO_SERIES[col]
+                future[:, k] = float(inputs[name]) * scale
+            elif col == backtest.TARGET_COL:
+                future[:, k] = np.nan
+            elif col in lag_features.CLIMATOLOGY_SERIES and col in climatology.columns:
+                future[:, k] = climatology[col].reindex(months.month).to_numpy(dtype=float)
+            else:
+                future[:, k] = held[col]
+        return future
+
+    def _step_size(self, columns, horizon):
+        """Months that can be predicted together: the shortest lag of the target, if any."""
+        lags = [lag for _, source, lag in map(lag_features.resolve, columns)
+                if source == backtest.TARGET_COL and lag]
+        return min(lags) if lags else horizon
+
+    def forecast(self, bundle, inputs, target):
+        """
+        Hybrid path from the month after the sample data through `target`.
+        Args:
+            bundle (model_registry.ModelBundle): Models to use (must be ready).
+            inputs (dict): Scenario inputs (see scenario.SCENARIO_COLUMNS).
+            target (str): Target month 'YYYY-MM'.
+        Returns:
+            dict or None: 'months' ['YYYY-MM'], 'lr_pred', 'rf_pred', 'rf_low', 'rf_high',
+            'predicted' (arrays, one value per month, crisis adjustment included),
+            'computed' (months predicted by this call). None when the target is
+            inside the sample data.
+        """
+        if not bundle.ready:
+            raise RuntimeError("LR and RF models must both be loaded.")
+        row = scenario.scenario_frame([inputs]).iloc[0]
+        history, climatology, history_key = self._history()
+        start = history.index[-1] + pd.offsets.MonthBegin(1)
+        target_month = pd.Timestamp(f"{target}-01")
+        if target_month < start:
+            return None
+        horizon = (target_month.year - start.year) * 12 + target_month.month - start.month + 1
+        if horizon > MAX_HORIZON_MONTHS:
+            raise ValueError(f"Target {target} is {horizon} months past the data; the limit is {MAX_HORIZON_MONTHS}.")
+
+        lr_cols, rf_cols = scenario.model_columns(bundle)
+        columns = list(dict.fromkeys(lr_cols + rf_cols))
+        lr_idx = [columns.index(c) for c in lr_cols]
+        rf_idx = [columns.index(c) for c in rf_cols]
+        # Crisis is an adjustment on top of the path, so both regimes share one cached path
+        drivers = tuple(round(float(row[c]), SCENARIO_DECIMALS) for c in scenario.SCENARIO_COLUMNS if c != 'crisis')
+        key = (bundle.version, history_key, drivers)
+        adj = scenario.CRISIS_IMPACT if row['crisis'] else 0.0
+        labels = [month_label(m) for m in pd.date_range(start, periods=horizon, freq='MS')]
+
+        # Another worker (or an evicted path) may have computed this horizon already
+        shared_key = None
+        if self.cache is not None:
+            driver_frame = pd.DataFrame([drivers], columns=[c for c in scenario.SCENARIO_COLUMNS if c != 'crisis'])
+            shared_key = prediction_cache.input_key(f"{bundle.version}|horizon|{target}|{history_key}", driver_frame,
+                                                    decimals=SCENARIO_DECIMALS)
+            values = self.cache.get(shared_key)
+            if values is not None and len(values) == 4 * horizon:
+                lr, rf, low, high = np.asarray(values, dtype=float).reshape(4, horizon)
+                return {'months': labels, 'lr_pred': lr, 'rf_pred': rf, 'rf_low': low, 'rf_high': high,
+                        'predicted': lr + rf + adj, 'computed': 0}
+
+        with self._lock:
+            path = self._paths.get(key)
+            if path is not None:
+                self._paths.move_to_end(key)
+        if path is None:
+            buf = lag_features.LagBuffer.from_frame(history, columns, series=[backtest.TARGET_COL])
+            path = {'buffer': buf, 'lr': np.empty(0), 'rf': np.empty(0), 'q': np.empty((0, 2))}
+        done = len(path['lr'])
+        computed = max(horizon - done, 0)
+
+        if computed:
+            buf = path['buffer'].copy()
+            months = pd.date_range(start + pd.offsets.MonthBegin(done), periods=computed, freq='MS')
+            future = self._future_raw(history, climatology, months, row, buf.series)
+            lr_parts, rf_parts, q_parts = [path['lr']], [path['rf']], [path['q']]
+            step = self._step_size(columns, horizon)
+            feeds_back = backtest.TARGET_COL in lag_features.source_series(columns)
+            for lo in range(0, computed, step):
+                block = range(lo, min(lo + step, computed))
+                X = np.empty((len(block), len(columns)))
+                for j, i in enumerate(block):
+                    buf.push(months[i], future[i])
+                    X[j] = buf.features()
+                index = months[block.start:block.stop]
+                lr_pred = np.asarray(bundle.lr_model.predict(pd.DataFrame(X[:, lr_idx], columns=lr_cols, index=index)),
+                                     dtype=float).reshape(-1)
+                rf_pred, rf_q = scenario.predict_rf_interval(bundle, pd.DataFrame(X[:, rf_idx], columns=rf_cols, index=index))
+                if feeds_back:
+                    # Later steps read these months' predictions through the target lags
+                    buf.set_recent(backtest.TARGET_COL, lr_pred + rf_pred)
+                lr_parts.append(lr_pred)
+                rf_parts.append(rf_pred)
+                q_parts.append(rf_q)
+            path = {'buffer': buf, 'lr': np.concatenate(lr_parts), 'rf': np.concatenate(rf_parts),
+                    'q': np.concatenate(q_parts)}
+            with self._lock:
+                current = self._paths.get(key)
+                if current is None or len(current['lr']) < len(path['lr']):
+                    self._paths[key] = path
+                self._paths.move_to_end(key)
+                while len(self._paths) > self.max_paths:
+                    self._paths.popitem(last=False)
+
+        lr, rf, q = path['lr'][:horizon], path['rf'][:horizon], path['q'][:horizon]
+        if shared_key is not None:
+            self.cache.put(shared_key, bundle.version, *lr, *rf, *q[:, 0], *q[:, 1])
+        return {
+            'months': labels,
+            'lr_pred': lr,
+            'rf_pred': rf,
+            'rf_low': q[:, 0],
+            'rf_high': q[:, 1],
+            'predicted': lr + rf + adj,
+            'computed': computed,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._paths.clear()
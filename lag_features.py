@@ -0,0 +1,263 @@
+"""
+Derived model columns from raw monthly series, shared by training and serving.
+
+all_samples_clean_final.csv carries raw monthly series (ZW Price,
+diesel_price, WRSI, ...) next to columns derived from them. Each derived
+column is named after its source and lag:
+    * '<series>_lag_<k>m' / '_lag_<k>M': the series k months earlier, where a
+      few prefixes have their own raw name (ZW -> 'ZW Price', see LAG_SOURCES);
+    * 'CPI_change_rate' (and its lags): month-over-month change of the CPI;
+    * 'month_sin' / 'month_cos': position of the month in the year.
+The same rules serve three callers:
+    * derive() computes the columns for a whole history at once; training
+      checks the sample file against it (check_samples);
+    * LagBuffer keeps the last few months of every series in a ring buffer,
+      so rolling forward one month costs O(1) and yields one feature row;
+    * steady_state() fills a table of what-if scenarios, where every lag
+      equals the current value.
+Series a scenario does not set are continued from the history by one rule
+(held_values / climatology): weather series take their calendar-month
+means, everything else keeps its last observed value.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+LAG_SOURCES = {
+    'CPI': 'CPI no adjusted',
+    'Diesel_Price': 'diesel_price',
+    'Jet_Price': 'jet_price',
+    'ZW': 'ZW Price',
+    'DC': 'DC Price',
+    'GF': 'GF Price',
+    'LE': 'LE Price',
+    'RNFB': 'RNFB_w/out',
+}
+# Change-rate columns -> the series they are the month-over-month change of
+CHANGE_RATES = {'CPI_change_rate': 'CPI no adjusted'}
+LAG_PATTERN = re.compile(r'^(.+)_lag_(\d+)[mM]$')
+SEASONAL_COLUMNS = ('month_sin', 'month_cos')
+# Decimals of month_sin / month_cos in the sample data
+SEASONAL_DECIMALS = 3
+# Raw series continued with their calendar-month means past the data
+CLIMATOLOGY_SERIES = ('apparent_temperature', 'temperature_2m', 'WRSI', 'FDD', 'snowfall',
+                      'WRSI_Anomaly', 'WRSI_state')
+
+
+def resolve(column):
+    """
+    How a model column is computed.
+    Returns:
+        tuple: (kind, source series, lag) with kind 'raw', 'lag', 'change' or
+        'seasonal' ('raw' columns are the series itself, lag 0).
+    """
+    if column in SEASONAL_COLUMNS:
+        return 'seasonal', column, 0
+    if column in CHANGE_RATES:
+        return 'change', CHANGE_RATES[column], 0
+    match = LAG_PATTERN.match(column)
+    if match:
+        prefix, lag = match.group(1), int(match.group(2))
+        if prefix in CHANGE_RATES:
+            return 'change', CHANGE_RATES[prefix], lag
+        return 'lag', LAG_SOURCES.get(prefix, prefix), lag
+    return 'raw', column, 0
+
+
+def is_derived(column):
+    return resolve(column)[0] != 'raw'
+
+
+def raw_columns(frame):
+    """Columns of a sample frame that are raw series (not derived from others)."""
+    return [c for c in frame.columns if not is_derived(c)]
+
+
+def source_series(columns):
+    """Raw series the given model columns are computed from, in first-use order."""
+    return list(dict.fromkeys(source for kind, source, _ in map(resolve, columns) if kind != 'seasonal'))
+
+
+def max_lag(columns):
+    """Months of history the given columns look back (a change rate needs one more)."""
+    return max([lag + (kind == 'change') for kind, _, lag in map(resolve, columns) if kind != 'seasonal'],
+               default=0)
+
+
+def seasonal(months):
+    """month_sin / month_cos of a DatetimeIndex."""
+    angle = 2 * np.pi * np.asarray(months.month, dtype=float) / 12
+    return {'month_sin': np.round(np.sin(angle), SEASONAL_DECIMALS),
+            'month_cos': np.round(np.cos(angle), SEASONAL_DECIMALS)}
+
+
+def derive(raw, columns):
+    """
+    Compute model columns over a monthly history in one vectorized pass.
+    Args:
+        raw (pd.DataFrame): Consecutive months (DatetimeIndex) of the raw series.
+        columns (list): Model columns to compute.
+    Returns:
+        pd.DataFrame: One row per month; NaN where the history is too short.
+    """
+    out = {}
+    for col in columns:
+        kind, source, lag = resolve(col)
+        if kind == 'seasonal':
+            out[col] = seasonal(raw.index)[col]
+            continue
+        if source not in raw.columns:
+            raise KeyError(f"No series '{source}' for model column '{col}'.")
+        series = raw[source].astype(float)
+        if kind == 'change':
+            series = series / series.shift(1) - 1
+        out[col] = series.shift(lag).to_numpy(dtype=float)
+    return pd.DataFrame(out, index=raw.index)
+
+
+def steady_state(raw, columns):
+    """
+    Model columns for scenarios that hold their values: every lag equals the
+    current value and change rates are 0.
+    Args:
+        raw (pd.DataFrame): One row per scenario with the needed raw series.
+    Returns:
+        pd.DataFrame: One row per scenario, columns in the given order.
+    """
+    out = {}
+    for col in columns:
+        kind, source, _ = resolve(col)
+        if kind == 'seasonal':
+            raise ValueError(f"Model column '{col}' needs a calendar month; scenarios have none.")
+        if kind == 'change':
+            out[col] = np.zeros(len(raw))
+            continue
+        if source not in raw.columns:
+            raise ValueError(f"Scenarios do not provide '{source}' (needed for model column '{col}').")
+        out[col] = raw[source].to_numpy(dtype=float)
+    return pd.DataFrame(out)
+
+
+def climatology(raw):
+    """Calendar-month means (index 1-12) of the series of a monthly history."""
+    return raw.groupby(raw.index.month).mean(numeric_only=True)
+
+
+def held_values(raw):
+    """
+    Value of each raw series when a scenario holds it constant: the mean of its
+    calendar-month means for CLIMATOLOGY_SERIES, its last observed value otherwise.
+    Args:
+        raw (pd.DataFrame): Monthly history (DatetimeIndex) of the raw series.
+    Returns:
+        pd.Series: Series name -> value.
+    """
+    means = climatology(raw).mean()
+    last = raw.ffill().iloc[-1] if len(raw) else pd.Series(np.nan, index=raw.columns)
+    return pd.Series({col: means[col] if col in CLIMATOLOGY_SERIES and col in means.index else last[col]
+                      for col in raw.columns}, dtype=float)
+
+
+def check_samples(samples, rtol=1e-9):
+    """
+    Compare the derived columns stored in a sample frame with derive().
+    Only months with enough history on both sides are compared.
+    Returns:
+        dict: column -> number of mismatching months (empty when consistent).
+    """
+    derived = [c for c in samples.columns if is_derived(c)]
+    expected = derive(samples[raw_columns(samples)], derived)
+    mismatches = {}
+    for col in derived:
+        stored = samples[col].to_numpy(dtype=float)
+        computed = expected[col].to_numpy(dtype=float)
+        both = ~np.isnan(stored) & ~np.isnan(computed)
+        bad = int((~np.isclose(stored[both], computed[both], rtol=rtol, atol=0.0)).sum())
+        if bad:
+            mismatches[col] = bad
+    return mismatches
+
+
+class LagBuffer:
+    """
+    Ring buffer of the last months of every raw series the model columns need.
+    push() adds one month and features() returns that month's model columns,
+    both in O(1) in the length of the history.
+
+    Args:
+        columns (list): Model columns to produce.
+        series (list, optional): Extra raw series to keep (e.g. the target).
+    """
+
+    def __init__(self, columns, series=()):
+        self.columns = list(columns)
+        self.series = list(dict.fromkeys(list(series) + source_series(self.columns)))
+        self.capacity = max_lag(self.columns) + 1
+        index = {s: i for i, s in enumerate(self.series)}
+        specs = [resolve(c) for c in self.columns]
+        self._seasonal = [(k, source) for k, (kind, source, _) in enumerate(specs) if kind == 'seasonal']
+        self._cols = np.array([index.get(source, 0) for _, source, _ in specs], dtype=int)
+        self._lags = np.array([lag for _, _, lag in specs], dtype=int)
+        self._change = np.array([kind == 'change' for kind, _, _ in specs], dtype=bool)
+        self._data = np.full((self.capacity, len(self.series)), np.nan)
+        self._pos = -1
+        self._count = 0
+        self.month = None
+
+    @classmethod
+    def from_frame(cls, raw, columns, series=()):
+        """Buffer holding the last months of a raw history (consecutive months)."""
+        buf = cls(columns, series)
+        missing = [s for s in buf.series if s not in raw.columns]
+        if missing:
+            raise KeyError(f"History has no series {missing}.")
+        tail = raw[buf.series].to_numpy(dtype=float)[-buf.capacity:]
+        buf._data[:len(tail)] = tail
+        buf._pos = len(tail) - 1
+        buf._count = len(raw)
+        buf.month = raw.index[-1] if len(raw) else None
+        return buf
+
+    def copy(self):
+        buf = LagBuffer.__new__(LagBuffer)
+        buf.__dict__.update(self.__dict__)
+        buf._data = self._data.copy()
+        return buf
+
+    def push(self, month, values):
+        """
+        Add the next month.
+        Args:
+            month (pd.Timestamp): Must follow the last month pushed.
+            values (array-like): One value per series, in self.series order (NaN = unknown).
+        """
+        month = pd.Timestamp(month)
+        if self.month is not None and month != self.month + pd.offsets.MonthBegin(1):
+            raise ValueError(f"Expected {self.month + pd.offsets.MonthBegin(1):%Y-%m}, got {month:%Y-%m}.")
+        self._pos = (self._pos + 1) % self.capacity
+        self._data[self._pos] = values
+        self._count += 1
+        self.month = month
+
+    def set_recent(self, series, values):
+        """Overwrite a series over the last len(values) months (e.g. predicted targets)."""
+        values = np.asarray(values, dtype=float)
+        if len(values) > min(self.capacity, self._count):
+            raise ValueError("Only the months still in the buffer can be updated.")
+        rows = (self._pos - np.arange(len(values))[::-1]) % self.capacity
+        self._data[rows, self.series.index(series)] = values
+
+    def features(self):
+        """Model columns of the last month pushed, as a float array in self.columns order."""
+        rows = (self._pos - self._lags) % self.capacity
+        values = self._data[rows, self._cols]
+        if self._change.any():
+            previous = self._data[(rows - 1) % self.capacity, self._cols]
+            values = np.where(self._change, values / previous - 1, values)
+        values[self._lags + self._change >= self._count] = np.nan
+        if self._seasonal:
+            angles = seasonal(pd.DatetimeIndex([self.month]))
+            for k, name in self._seasonal:
+                values[k] = angles[name][0]
+        return values
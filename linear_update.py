@@ -0,0 +1,98 @@
+"""
+Incremental least squares for the level-1 (base trend) linear layer.
+
+The expanding-window backtest adds one row per window, so instead of refitting
+LinearRegression on the whole slice every time, the running means and
+co-moment matrices (Welford updates) are kept and the coefficients are solved
+from them in O(p^2) per row. Centering the statistics the same way
+LinearRegression centers X and y keeps the coefficients equal to a full refit
+up to floating point rounding.
+"""
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+
+class IncrementalLinearRegression:
+    """
+    Ordinary least squares with an intercept, updated one row at a time.
+    Args:
+        n_features (int): Number of input columns.
+        feature_names (list, optional): Column names, copied to the sklearn model.
+    """
+
+    def __init__(self, n_features, feature_names=None):
+        self.n_features = n_features
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.n_samples = 0
+        self.mean_x = np.zeros(n_features)
+        self.mean_y = 0.0
+        self.cov_xx = np.zeros((n_features, n_features))  # sum of (x - mean_x)(x - mean_x)^T
+        self.cov_xy = np.zeros(n_features)                 # sum of (x - mean_x)(y - mean_y)
+
+    def partial_fit(self, x_row, y_value):
+        """Add one observation (Welford co-moment update)."""
+        x_row = np.asarray(x_row, dtype=float)
+        self.n_samples += 1
+        dx = x_row - self.mean_x
+        dy = y_value - self.mean_y
+        self.mean_x = self.mean_x + dx / self.n_samples
+        self.mean_y = self.mean_y + dy / self.n_samples
+        self.cov_xx += np.outer(dx, x_row - self.mean_x)
+        self.cov_xy += dx * (y_value - self.mean_y)
+        return self
+
+    def coefficients(self):
+        """
+        Solve the centered normal equations.
+        Returns:
+            tuple: (coef, intercept). lstsq gives the minimum-norm solution when
+                   the statistics are rank deficient, like LinearRegression.
+        """
+        if self.n_samples == 0:
+            raise ValueError("No samples have been added yet.")
+        coef = np.linalg.lstsq(self.cov_xx, self.cov_xy, rcond=None)[0]
+        intercept = self.mean_y - self.mean_x @ coef
+        return coef, intercept
+
+    def predict(self, X):
+        coef, intercept = self.coefficients()
+        return np.asarray(X, dtype=float) @ coef + intercept
+
+    def to_sklearn(self):
+        """Snapshot the current fit as a fitted sklearn LinearRegression (for saving/serving)."""
+        coef, intercept = self.coefficients()
+        lr_model = LinearRegression()
+        lr_model.coef_ = coef
+        lr_model.intercept_ = float(intercept)
+        lr_model.n_features_in_ = self.n_features
+        if self.feature_names is not None:
+            lr_model.feature_names_in_ = np.asarray(self.feature_names, dtype=object)
+        return lr_model
+
+
+def fit_linear_path(X_linear, y, indices):
+    """
+    Fit the linear layer for every expanding window in one pass over the rows.
+    Args:
+        X_linear (pd.DataFrame): Linear features.
+        y (pd.Series): Target.
+        indices (list): Sorted window ends; window i trains on rows [:i].
+    Returns:
+        dict: window index -> fitted sklearn LinearRegression
+    """
+    X = X_linear.to_numpy(dtype=float)
+    y_values = y.to_numpy(dtype=float)
+    updater = IncrementalLinearRegression(X.shape[1], feature_names=X_linear.columns)
+    models = {}
+    row = 0
+    for i in indices:
+        while row < i:
+            updater.partial_fit(X[row], y_values[row])
+            row += 1
+        models[i] = updater.to_sklearn()
+    return models
+
+
+def linear_predict(lr_model, X):
+    """LR prediction as a plain matrix product, skipping sklearn's input validation."""
+    return np.asarray(X, dtype=float) @ lr_model.coef_ + lr_model.intercept_
@@ -0,0 +1,203 @@
+"""
+Server-side ring buffer for the dashboard's debug log.
+
+Every browser session gets its own bounded buffer (max_entries entries and
+max_bytes of text; the oldest entries are dropped first). Entries carry
+an increasing sequence number, so clients fetch only what is newer than
+the last sequence number they have seen: since(session, cursor).
+Sessions themselves are kept in an LRU of max_sessions.
+
+With a path, the buffers live in a SQLite file (WAL, like
+prediction_cache.py) shared by every worker process on the host, and the
+sequence numbers are allocated in the same transaction as the entry, so
+they are global per session no matter which worker served a request.
+Without a path (or when the file cannot be opened) the store lives in the
+process's memory and a session only sees the entries of its own worker.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+DEFAULT_MAX_ENTRIES = 200
+DEFAULT_MAX_BYTES = 256 * 1024
+DEFAULT_MAX_SESSIONS = 500
+TRUNCATED_MARKER = "\n… (truncated)"
+# Shared-store session cleanup runs once every this many appends
+PRUNE_EVERY = 64
+
+
+class LogStore:
+    """
+    Args:
+        max_entries (int): Entries kept per session.
+        max_bytes (int): Bytes of text kept per session.
+        max_sessions (int): Sessions kept (least recently used dropped first).
+        path (str, optional): SQLite file shared across workers (None = in-process only).
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, max_sessions=DEFAULT_MAX_SESSIONS,
+                 path=None):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.max_sessions = max(1, int(max_sessions))
+        self.path = path
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self._writes = 0
+
+    def _connection(self):
+        """SQLite connection of this process (recreated after fork), or None if the store is in-process."""
+        if self.path is None:
+            return None
+        if self._conn is None or self._conn_pid != os.getpid():
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS log_sessions ("
+                             "session TEXT PRIMARY KEY, last_seq INTEGER, touched REAL)")
+                conn.execute("CREATE TABLE IF NOT EXISTS log_entries ("
+                             "session TEXT, seq INTEGER, text TEXT, size INTEGER, PRIMARY KEY (session, seq))")
+            except sqlite3.Error as e:
+                print(f"Log store: shared store disabled, keeping logs per process ({e})")
+                self.path = None
+                return None
+            self._conn, self._conn_pid = conn, os.getpid()
+        return self._conn
+
+    def _clip(self, text):
+        """Text cut to max_bytes (with a marker) and its size in bytes."""
+        data = text.encode('utf-8')
+        if len(data) > self.max_bytes:
+            keep = self.max_bytes - len(TRUNCATED_MARKER.encode('utf-8'))
+            text = data[:max(keep, 0)].decode('utf-8', errors='ignore') + TRUNCATED_MARKER
+            data = text.encode('utf-8')
+        return text, len(data)
+
+    def _session(self, session_id):
+        buf = self._sessions.get(session_id)
+        if buf is None:
+            buf = {'entries': deque(), 'bytes': 0, 'last_seq': 0}
+            self._sessions[session_id] = buf
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+        return buf
+
+    def append(self, session_id, text):
+        """
+        Add one entry (any number of lines) to a session's log.
+        Returns:
+            int: Sequence number of the new entry.
+        """
+        text, size = self._clip(text)
+        with self._lock:
+            conn = self._connection()
+            if conn is not None:
+                return self._append_shared(conn, session_id, text, size)
+            buf = self._session(session_id)
+            buf['last_seq'] += 1
+            buf['entries'].append((buf['last_seq'], text, size))
+            buf['bytes'] += size
+            while len(buf['entries']) > self.max_entries or buf['bytes'] > self.max_bytes:
+                _, _, dropped = buf['entries'].popleft()
+                buf['bytes'] -= dropped
+            return buf['last_seq']
+
+    def _append_shared(self, conn, session_id, text, size):
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock first, so two workers never hand out the same seq
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT INTO log_sessions (session, last_seq, touched) VALUES (?, 1, ?) "
+                         "ON CONFLICT(session) DO UPDATE SET last_seq = last_seq + 1, touched = excluded.touched",
+                         (session_id, now))
+            seq = conn.execute("SELECT last_seq FROM log_sessions WHERE session = ?", (session_id,)).fetchone()[0]
+            conn.execute("INSERT INTO log_entries (session, seq, text, size) VALUES (?, ?, ?, ?)",
+                         (session_id, seq, text, size))
+            # Ring buffer: keep the newest entries within max_entries and max_bytes
+            total, cutoff = 0, None
+            rows = conn.execute("SELECT seq, size FROM log_entries WHERE session = ? ORDER BY seq DESC",
+                                (session_id,)).fetchall()
+            for n, (row_seq, row_size) in enumerate(rows, 1):
+                total += row_size
+                if n > self.max_entries or total > self.max_bytes:
+                    cutoff = row_seq
+                    break
+            if cutoff is not None:
+                conn.execute("DELETE FROM log_entries WHERE session = ? AND seq <= ?", (session_id, cutoff))
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 0:
+                self._prune(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return seq
+
+    def _prune(self, conn):
+        """Drop the least recently used sessions beyond max_sessions."""
+        stale = conn.execute("SELECT session FROM log_sessions ORDER BY touched DESC LIMIT -1 OFFSET ?",
+                             (self.max_sessions,)).fetchall()
+        for (session_id,) in stale:
+            conn.execute("DELETE FROM log_entries WHERE session = ?", (session_id,))
+            conn.execute("DELETE FROM log_sessions WHERE session = ?", (session_id,))
+
+    def since(self, session_id, cursor=0, limit=None):
+        """
+        Entries of a session newer than cursor, oldest first.
+        Args:
+            cursor (int): Last sequence number the client has (0 = none).
+            limit (int, optional): Return at most this many entries (page size).
+        Returns:
+            dict: 'entries' [(seq, text)], 'cursor' (pass back on the next call),
+                  'more' (another page is waiting), 'truncated' (entries after the
+                  client's cursor were already dropped from the ring buffer).
+        """
+        with self._lock:
+            conn = self._connection()
+            if conn is not None:
+                found = self._since_shared(conn, session_id, cursor, limit)
+            else:
+                found = self._since_memory(session_id, cursor)
+        if found is None:
+            return {'entries': [], 'cursor': cursor, 'more': False, 'truncated': False}
+        entries, oldest = found
+        truncated = cursor < oldest - 1
+        more = limit is not None and len(entries) > limit
+        if more:
+            entries = entries[:limit]
+        return {'entries': entries, 'cursor': entries[-1][0] if entries else max(cursor, oldest - 1),
+                'more': more, 'truncated': truncated}
+
+    def _since_memory(self, session_id, cursor):
+        buf = self._sessions.get(session_id)
+        if buf is None:
+            return None
+        self._sessions.move_to_end(session_id)
+        entries = [(seq, text) for seq, text, _ in buf['entries'] if seq > cursor]
+        oldest = buf['entries'][0][0] if buf['entries'] else buf['last_seq'] + 1
+        return entries, oldest
+
+    def _since_shared(self, conn, session_id, cursor, limit):
+        # One read transaction, so the entries and the oldest seq come from the same snapshot
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT last_seq FROM log_sessions WHERE session = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            oldest = conn.execute("SELECT MIN(seq) FROM log_entries WHERE session = ?", (session_id,)).fetchone()[0]
+            query = "SELECT seq, text FROM log_entries WHERE session = ? AND seq > ? ORDER BY seq"
+            params = (session_id, cursor)
+            if limit is not None:
+                # One extra row tells whether another page is waiting
+                query += " LIMIT ?"
+                params += (limit + 1,)
+            entries = [tuple(r) for r in conn.execute(query, params).fetchall()]
+        finally:
+            conn.execute("COMMIT")
+        return entries, oldest if oldest is not None else row[0] + 1
@@ -1,18 +1,176 @@
 import joblib
+import json
 import os
+import shutil
 import sys
 import numpy as np
 
+import forest_compiler
+from data_cache import file_sha256
+
 # Set paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LR_MODEL_PATH = os.path.join(BASE_DIR, 'lr_model.pkl')
 RF_MODEL_PATH = os.path.join(BASE_DIR, 'rf_model.pkl') # Assuming 'rd_model' refers to the random forest model
 
-def load_lr_model(path=None):
+# Memory-mappable compiled forest stored next to the RF pickle (e.g. rf_model.pkl.compiled/)
+COMPILED_SUFFIX = '.compiled'
+
+def compiled_rf_path(path=None):
+    return (path if path else RF_MODEL_PATH) + COMPILED_SUFFIX
+
+def save_compiled_rf(rf_model, path=None):
+    """
+    Write the compiled forest of rf_model next to its pickle, as uncompressed
+    .npy node arrays that load_rd_model(mmap=True) can memory-map.
+    The compiled forest must match sklearn bit-for-bit or nothing is written.
+    Args:
+        rf_model: Fitted RandomForestRegressor (already saved at path).
+        path (str, optional): Path of the RF .pkl file. Defaults to RF_MODEL_PATH.
+    Returns:
+        str: Directory of the compiled forest.
+    """
+    target_path = path if path else RF_MODEL_PATH
+    compiled = forest_compiler.compile_forest(rf_model)
+    identical, max_diff = forest_compiler.verify(rf_model, compiled)
+    if not identical:
+        raise ValueError(f"Compiled forest differs from sklearn (max diff {max_diff:.3g})")
+    return forest_compiler.save_compiled(compiled, compiled_rf_path(target_path),
+                                         extra_meta={'source_sha256': file_sha256(target_path)})
+
+def _load_compiled_rf(target_path):
+    """Memory-map the compiled forest of target_path, (re)building it when missing or stale."""
+    model_dir = compiled_rf_path(target_path)
+    source_hash = file_sha256(target_path)
+    try:
+        if forest_compiler.read_compiled_meta(model_dir).get('source_sha256') == source_hash:
+            return forest_compiler.load_compiled(model_dir, mmap_mode='r')
+    except (OSError, ValueError):
+        pass
+
+    print(f"Building compiled forest in {model_dir}")
+    try:
+        save_compiled_rf(joblib.load(target_path), target_path)
+    except OSError:
+        # Another process may have built it at the same time; use theirs if it matches
+        if forest_compiler.read_compiled_meta(model_dir).get('source_sha256') != source_hash:
+            raise
+    return forest_compiler.load_compiled(model_dir, mmap_mode='r')
+
+# JSON sidecar with the model's metadata (e.g. rf_model.pkl.meta.json), readable without unpickling
+METADATA_SUFFIX = '.meta.json'
+METADATA_VERSION = 1
+
+def metadata_path(path):
+    return path + METADATA_SUFFIX
+
+def model_metadata(model, kind, extra=None):
+    """
+    Metadata of a fitted model: feature names plus coefficients (LR) or tree count (RF).
+    Args:
+        model: Fitted LinearRegression / RandomForestRegressor (or CompiledForest).
+        kind (str): 'lr' or 'rf'.
+        extra (dict, optional): Training window, metrics, ... merged in as-is.
+    Returns:
+        dict
+    """
+    names = getattr(model, 'feature_names_in_', None)
+    meta = {
+        'version': METADATA_VERSION,
+        'kind': kind,
+        'model_class': type(model).__name__,
+        'feature_names': [str(n) for n in names] if names is not None else None,
+    }
+    if kind == 'lr':
+        meta['coefficients'] = np.asarray(model.coef_).tolist()
+        meta['intercept'] = np.asarray(model.intercept_).tolist()
+    else:
+        meta['n_estimators'] = int(model.n_estimators)
+    meta.update(extra or {})
+    return meta
+
+def write_model_metadata(model, path, kind, extra=None):
+    """
+    Write <path>.meta.json for a model already saved at path. The sidecar records
+    the pickle's sha256 and size, so a replaced pickle invalidates it.
+    Returns:
+        dict: The metadata written.
+    """
+    meta = model_metadata(model, kind, extra)
+    meta['sha256'] = file_sha256(path)
+    meta['size'] = os.path.getsize(path)
+    out_path = metadata_path(path)
+    tmp_path = f"{out_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=1, default=str)
+    os.replace(tmp_path, out_path)
+    return meta
+
+def read_model_metadata(path, sha256=None):
+    """
+    Read the sidecar of the model at path.
+    Args:
+        path (str): Path of the .pkl file.
+        sha256 (str, optional): Known digest of the pickle (skips hashing it again).
+    Returns:
+        dict or None: None when the sidecar is missing or belongs to other bytes.
+    """
+    try:
+        with open(metadata_path(path), 'r') as f:
+            meta = json.load(f)
+        size = os.path.getsize(path)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != METADATA_VERSION or meta.get('size') != size:
+        return None
+    if meta.get('sha256') != (sha256 if sha256 else file_sha256(path)):
+        return None
+    return meta
+
+def metadata_info(meta, source):
+    """Info lines (as built by load_lr_model/load_rd_model) from a metadata dict."""
+    info = [f"Source: {source}"]
+    if meta['kind'] == 'lr':
+        info.append(f"Coefficients: {meta['coefficients']}")
+        info.append(f"Intercept: {meta['intercept']}")
+    else:
+        info.append(f"N Estimators: {meta['n_estimators']}")
+    info.append(f"Input Features: {meta['feature_names']}")
+    if meta.get('train_start'):
+        info.append(f"Training Window: {meta['train_start']} .. {meta['train_end']} ({meta.get('n_train_rows')} rows)")
+    if meta.get('metrics'):
+        info.append("Window Metrics: " + ", ".join(f"{k}={v:.3f}" for k, v in meta['metrics'].items()))
+    if meta.get('sha256'):
+        info.append(f"SHA256: {meta['sha256'][:12]}")
+    return info
+
+def describe_model(kind, path=None):
+    """
+    Metadata of a saved model from its sidecar, without unpickling it. When the
+    sidecar is missing or stale the model is loaded once and the sidecar rewritten.
+    Args:
+        kind (str): 'lr' or 'rf'.
+        path (str, optional): Path of the .pkl file. Defaults to LR_MODEL_PATH / RF_MODEL_PATH.
+    Returns:
+        tuple: (metadata dict or None, info_str)
+    """
+    target_path = path if path else (LR_MODEL_PATH if kind == 'lr' else RF_MODEL_PATH)
+    if not os.path.exists(target_path):
+        return None, f"Error: Model file not found at {target_path}"
+    meta = read_model_metadata(target_path)
+    if meta is None:
+        try:
+            meta = write_model_metadata(joblib.load(target_path), target_path, kind)
+        except Exception as e:
+            return None, f"Failed to describe {kind.upper()} model: {e}"
+    return meta, "\n".join(metadata_info(meta, os.path.basename(target_path)))
+
+def load_lr_model(path=None, mmap=False):
     """
     Load the Linear Regression model and print its input parameters/features.
     Args:
         path (str, optional): Path to the .pkl file. Defaults to None (uses LR_MODEL_PATH).
+        mmap (bool): Memory-map numpy arrays stored uncompressed in the pickle.
     Returns:
         tuple: (model, info_str) or (None, error_str)
     """
@@ -25,10 +183,15 @@ def load_lr_model(path=None):
         return None, msg
 
     try:
-        lr_model = joblib.load(target_path)
+        lr_model = joblib.load(target_path, mmap_mode='r' if mmap else None)
         
         info = []
         info.append("Model Loaded Successfully.")
+        meta = read_model_metadata(target_path)
+        if meta is not None:
+            # The sidecar also knows the training window and metrics
+            info.extend(metadata_info(meta, os.path.basename(target_path)))
+            return lr_model, "\n".join(info)
         info.append(f"Source: {os.path.basename(target_path)}")
         
         # Inspect parameters
@@ -46,11 +209,14 @@ def load_lr_model(path=None):
         print(msg)
         return None, msg
 
-def load_rd_model(path=None):
+def load_rd_model(path=None, mmap=False):
     """
     Load the Random Forest model (referred to as rd_model) and print its input parameters/features.
     Args:
         path (str, optional): Path to the .pkl file. Defaults to None (uses RF_MODEL_PATH).
+        mmap (bool): Return a forest_compiler.CompiledForest whose node arrays are
+            memory-mapped from <path>.compiled/ (built on first use), so several
+            processes share one copy. Falls back to unpickling on failure.
     Returns:
         tuple: (model, info_str) or (None, error_str)
     """
@@ -62,10 +228,34 @@ def load_rd_model(path=None):
         print(msg)
         return None, msg
 
+    fallback_note = None
+    if mmap:
+        try:
+            rf_model = _load_compiled_rf(target_path)
+            info = []
+            info.append("Model Loaded Successfully (memory-mapped compiled forest).")
+            meta = read_model_metadata(target_path)
+            if meta is not None:
+                info.extend(metadata_info(meta, os.path.basename(compiled_rf_path(target_path))))
+                return rf_model, "\n".join(info)
+            info.append(f"Source: {os.path.basename(compiled_rf_path(target_path))}")
+            info.append(f"N Estimators: {rf_model.n_estimators}")
+            info.append(f"Input Features: {rf_model.feature_names}")
+            return rf_model, "\n".join(info)
+        except Exception as e:
+            fallback_note = f"Memory-mapped load failed ({e}); unpickled instead."
+            print(fallback_note)
+
     try:
         rf_model = joblib.load(target_path)
         info = []
         info.append("Model Loaded Successfully.")
+        if fallback_note:
+            info.append(fallback_note)
+        meta = read_model_metadata(target_path)
+        if meta is not None:
+            info.extend(metadata_info(meta, os.path.basename(target_path)))
+            return rf_model, "\n".join(info)
         info.append(f"Source: {os.path.basename(target_path)}")
         
         # Inspect parameters
@@ -85,6 +275,87 @@ def load_rd_model(path=None):
         print(msg)
         return None, msg
 
+# Pending renames of a publish_files() call, replayed by finish_publish() if the process died midway
+PUBLISH_JOURNAL = os.path.join(BASE_DIR, '.publish.json')
+
+def _replace_path(src, dest):
+    """os.replace for files; a directory is swapped in after moving the old one aside."""
+    if not os.path.isdir(src):
+        os.replace(src, dest)
+        return
+    old_dir = f"{dest}.old{os.getpid()}"
+    if os.path.isdir(dest):
+        os.rename(dest, old_dir)
+    os.rename(src, dest)
+    # Processes that memory-mapped the old arrays keep them until they unmap
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def finish_publish(journal_path=PUBLISH_JOURNAL):
+    """
+    Complete the renames of a publish_files() call that was interrupted.
+    Safe to run when nothing is pending (the usual case).
+    Returns:
+        int: Paths moved into place.
+    """
+    try:
+        with open(journal_path, 'r') as f:
+            moves = json.load(f)
+    except FileNotFoundError:
+        return 0
+    except ValueError:
+        # The journal is swapped in whole, so this only happens if the file was damaged afterwards
+        print(f"Ignoring unreadable publish journal {journal_path}")
+        moves = []
+    done = 0
+    for tmp_path, dest in moves:
+        if os.path.exists(tmp_path):
+            _replace_path(tmp_path, dest)
+            done += 1
+    os.remove(journal_path)
+    return done
+
+def publish_files(files, journal_path=PUBLISH_JOURNAL):
+    """
+    Copy files and directories over their destinations as one unit.
+    Every source is first copied next to its destination under a temporary
+    name (the slow part, during which the old files stay in place). Then a
+    journal of the renames is written, the renames run and the journal is
+    removed. If the process dies during the renames, finish_publish()
+    (run at dashboard startup) completes them, so a restart never loads a
+    mix of old and new files.
+    Args:
+        files (list): (source, destination) pairs.
+    """
+    finish_publish(journal_path)
+    moves = []
+    try:
+        for src, dest in files:
+            tmp_path = f"{dest}.publish{os.getpid()}"
+            if os.path.isdir(src):
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                shutil.copytree(src, tmp_path)
+            else:
+                shutil.copyfile(src, tmp_path)
+            moves.append((tmp_path, dest))
+        tmp_journal = f"{journal_path}.tmp{os.getpid()}"
+        with open(tmp_journal, 'w') as f:
+            json.dump(moves, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_journal, journal_path)
+    except BaseException:
+        # Nothing was renamed yet: drop the copies and leave the old files as they are
+        for tmp_path, _ in moves:
+            if os.path.isdir(tmp_path):
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+    finish_publish(journal_path)
+
 if __name__ == "__main__":
-    lr = load_lr_model()
-    rd = load_rd_model()
+    # Print the metadata from the sidecars; models are only unpickled when a sidecar is missing
+    for kind in ('lr', 'rf'):
+        meta, info = describe_model(kind)
+        print(f"\n--- {kind.upper()} Model ---")
+        print(info)
@@ -0,0 +1,436 @@
+"""
+Content-addressed registry of the dashboard's LR and RF models.
+
+Uploaded model files are stored in model_registry/ under their sha256, so
+uploading the same bytes twice reuses the model that is already loaded.
+Loaded models are kept in an LRU of max_versions entries per kind. Models
+that belong to the active bundle or to a pinned bundle are never evicted.
+
+The active LR+RF pair is an immutable ModelBundle. It is swapped in with a
+single reference assignment. A request takes one bundle when it starts, or
+pins a version, and uses that bundle throughout. A concurrent upload
+therefore cannot hand it the LR of one version and the RF of another.
+
+Every stored model gets a model_load metadata sidecar, so stored_versions()
+lists what is on disk without unpickling anything.
+
+Each web worker process has its own registry. publish_active() records the
+active pair in store_dir/ACTIVE.json, and sync_active() (one stat per call)
+makes another worker load and activate that pair after an upload or retrain
+somewhere else. Evicting a model only drops it from this process; its files
+are deleted under a lock on the store directory, and only when ACTIVE.json
+does not name it and no process stored or published it in the last
+FILE_GRACE_SECONDS.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single dev server, nothing to coordinate with
+    fcntl = None
+
+import forest_compiler
+import model_load
+from data_cache import file_sha256
+
+KINDS = ('lr', 'rf')
+DEFAULT_MAX_VERSIONS = 5
+# Digest prefix used in bundle versions, e.g. "3f9a0c1b2d4e-77aa01c2e9f0"
+VERSION_PREFIX_LEN = 12
+NO_MODEL = 'none'
+ACTIVE_FILE = 'ACTIVE.json'
+LOCK_FILE = '.lock'
+# Stored files touched this recently are kept, so a version another worker is about to publish survives
+FILE_GRACE_SECONDS = 600
+
+DEFAULT_STORE_DIR = os.path.join(model_load.BASE_DIR, 'model_registry')
+
+
+def compile_rf_model(rf_model):
+    """
+    Compile the RF into flat arrays and check it against sklearn.
+    Returns:
+        tuple: (compiled or None, log message)
+    """
+    try:
+        compiled = forest_compiler.compile_forest(rf_model)
+        identical, max_diff = forest_compiler.verify(rf_model, compiled)
+    except Exception as e:
+        return None, f"[RF] ⚠ Compiled inference unavailable, using sklearn predict: {e}"
+    if not identical:
+        return None, f"[RF] ⚠ Compiled forest differs from sklearn (max diff {max_diff:.3g}), using sklearn predict"
+    return compiled, f"[RF] ⚡ Compiled inference: {compiled.n_trees} trees, {compiled.n_nodes} nodes (verified bit-for-bit)"
+
+
+def _check_kind(kind):
+    if kind not in KINDS:
+        raise ValueError(f"Unknown model kind {kind!r}; expected one of {KINDS}")
+
+
+def _short(digest):
+    return digest[:VERSION_PREFIX_LEN] if digest else NO_MODEL
+
+
+class ModelBundle:
+    """
+    One LR+RF pair, built from two registry entries (either may be None).
+    Never mutated after construction; the registry swaps in a new one instead.
+    """
+
+    def __init__(self, lr_entry=None, rf_entry=None):
+        self.lr_entry = lr_entry
+        self.rf_entry = rf_entry
+        self.lr_model = lr_entry['model'] if lr_entry else None
+        self.lr_info = lr_entry['info'] if lr_entry else ""
+        self.rf_model = rf_entry['model'] if rf_entry else None
+        self.rf_info = rf_entry['info'] if rf_entry else ""
+        # Flat-array copy of rf_model used for inference (None -> fall back to rf_model.predict)
+        self.rf_compiled = rf_entry['compiled'] if rf_entry else None
+        self.digests = {'lr': lr_entry['digest'] if lr_entry else None,
+                        'rf': rf_entry['digest'] if rf_entry else None}
+        self.version = f"{_short(self.digests['lr'])}-{_short(self.digests['rf'])}"
+
+    @property
+    def ready(self):
+        """Both models are loaded, so hybrid predictions can be made."""
+        return self.lr_model is not None and self.rf_model is not None
+
+
+class ModelRegistry:
+    """
+    Args:
+        store_dir (str): Where uploaded model files are stored by content hash.
+        max_versions (int): Loaded models kept per kind (LRU beyond that).
+        mmap (bool): Passed to model_load; memory-maps the compiled RF.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, max_versions=DEFAULT_MAX_VERSIONS, mmap=False):
+        self.store_dir = store_dir
+        self.max_versions = max(1, int(max_versions))
+        self.mmap = mmap
+        self._entries = {kind: OrderedDict() for kind in KINDS}
+        self._pins = {}   # digest -> number of holders
+        self._lock = threading.RLock()
+        self._active = ModelBundle()
+        self._synced = None   # (mtime_ns, size) of the ACTIVE.json this process follows
+
+    def active(self):
+        """The current bundle. Read it once per request and use that object throughout."""
+        return self._active
+
+    def _path(self, kind, digest):
+        return os.path.join(self.store_dir, f"{kind}-{digest}.pkl")
+
+    def _load(self, kind, path):
+        """Load a model file. Returns the registry entry fields (without digest/path)."""
+        if kind == 'lr':
+            model, info = model_load.load_lr_model(path, mmap=self.mmap)
+            compiled, compile_msg = None, None
+        else:
+            model, info = model_load.load_rd_model(path, mmap=self.mmap)
+            if isinstance(model, forest_compiler.CompiledForest):
+                # Already compiled and verified when its .compiled/ directory was written
+                compiled = model
+                compile_msg = f"[RF] ⚡ Compiled inference: {model.n_trees} trees, {model.n_nodes} nodes (memory-mapped)"
+            elif model is not None:
+                compiled, compile_msg = compile_rf_model(model)
+            else:
+                compiled, compile_msg = None, None
+        if model is None:
+            raise ValueError(info)
+        return {'model': model, 'info': info, 'compiled': compiled, 'compile_msg': compile_msg}
+
+    def _metadata(self, kind, digest, path, model):
+        """Sidecar of a stored model; written on first load for uploads that came without one."""
+        meta = model_load.read_model_metadata(path, sha256=digest)
+        if meta is None:
+            try:
+                meta = model_load.write_model_metadata(model, path, kind)
+            except (OSError, AttributeError, TypeError) as e:
+                print(f"Could not write metadata for {path}: {e}")
+        return meta
+
+    def register_file(self, kind, path):
+        """
+        Register a model file in place (e.g. the local lr_model.pkl) under its content hash.
+        Returns:
+            tuple: (entry, reused) -- reused is True when these bytes were already loaded.
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model file not found at {path}")
+        return self._register(kind, file_sha256(path), path, owned=False)
+
+    def add_bytes(self, kind, data):
+        """
+        Store uploaded model bytes as model_registry/<kind>-<sha256>.pkl and load them,
+        unless the same bytes are already loaded.
+        Returns:
+            tuple: (entry, reused)
+        """
+        _check_kind(kind)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(kind, digest)
+        # Stored (or refreshed) even when already loaded: another process may have collected the file
+        with self._store_lock():
+            if os.path.exists(path):
+                os.utime(path)
+            else:
+                tmp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+        with self._lock:
+            entry = self._touch(kind, digest)
+        if entry is not None:
+            return entry, True
+        return self._register(kind, digest, path, owned=True)
+
+    def _touch(self, kind, digest):
+        entry = self._entries[kind].get(digest)
+        if entry is not None:
+            self._entries[kind].move_to_end(digest)
+        return entry
+
+    def _register(self, kind, digest, path, owned):
+        _check_kind(kind)
+        with self._lock:
+            entry = self._touch(kind, digest)
+        if entry is not None:
+            return entry, True
+
+        # Loading is slow, so it runs outside the lock; a concurrent load of the same bytes loses the race below
+        try:
+            loaded = self._load(kind, path)
+            loaded['meta'] = self._metadata(kind, digest, path, loaded['model'])
+        except Exception:
+            if owned:
+                self._remove_files(path)
+            raise
+        with self._lock:
+            entry = self._touch(kind, digest)
+            if entry is not None:
+                return entry, True
+            entry = {'kind': kind, 'digest': digest, 'path': path, 'owned': owned, **loaded}
+            self._entries[kind][digest] = entry
+            self._evict(kind)
+        return entry, False
+
+    def _remove_files(self, path):
+        for file_path in (path, model_load.metadata_path(path)):
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        shutil.rmtree(model_load.compiled_rf_path(path), ignore_errors=True)
+
+    @contextmanager
+    def _store_lock(self):
+        """Exclusive lock on store_dir shared by every process (file writes, ACTIVE.json, collection)."""
+        os.makedirs(self.store_dir, exist_ok=True)
+        with open(os.path.join(self.store_dir, LOCK_FILE), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_active_record(self):
+        try:
+            with open(self._active_file(), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _collect(self, entries):
+        """Delete the files of evicted models unless another process may still need them."""
+        with self._store_lock():
+            record = self._read_active_record()
+            published = {item.get('digest') for item in record.values() if isinstance(item, dict)}
+            now = time.time()
+            for entry in entries:
+                if entry['digest'] in published:
+                    continue
+                try:
+                    if now - os.stat(entry['path']).st_mtime < FILE_GRACE_SECONDS:
+                        continue
+                except OSError:
+                    continue
+                self._remove_files(entry['path'])
+
+    def _evict(self, kind):
+        """Drop least recently used models beyond max_versions, except active and pinned ones."""
+        protected = set(self._pins) | set(self._active.digests.values())
+        entries = self._entries[kind]
+        evicted = []
+        for digest in list(entries):
+            if len(entries) <= self.max_versions:
+                break
+            if digest in protected:
+                continue
+            entry = entries.pop(digest)
+            if entry['owned']:
+                evicted.append(entry)
+        if evicted:
+            self._collect(evicted)
+
+    def _lookup(self, kind, digest):
+        """Entry for a full digest or a unique prefix of one."""
+        entries = self._entries[kind]
+        if digest in entries:
+            return entries[digest]
+        matches = [d for d in entries if d.startswith(digest)]
+        if len(matches) != 1:
+            raise KeyError(f"No unique {kind.upper()} model matches {digest!r}")
+        return entries[matches[0]]
+
+    def activate(self, lr=None, rf=None):
+        """
+        Atomically make a new bundle active. A digest that is not given keeps
+        the model of the current bundle.
+        Returns:
+            ModelBundle: The new active bundle.
+        """
+        with self._lock:
+            current = self._active
+            lr_entry = self._lookup('lr', lr) if lr else current.lr_entry
+            rf_entry = self._lookup('rf', rf) if rf else current.rf_entry
+            self._active = ModelBundle(lr_entry, rf_entry)
+            # Models of the previous bundle may be evictable now
+            for kind in KINDS:
+                self._evict(kind)
+            return self._active
+
+    def _active_file(self):
+        return os.path.join(self.store_dir, ACTIVE_FILE)
+
+    def publish_active(self):
+        """Record the active bundle for the other worker processes (see sync_active)."""
+        bundle = self._active
+        record = {kind: {'digest': entry['digest'], 'path': entry['path']}
+                  for kind, entry in (('lr', bundle.lr_entry), ('rf', bundle.rf_entry)) if entry}
+        path = self._active_file()
+        with self._store_lock():
+            for entry in (bundle.lr_entry, bundle.rf_entry):
+                # Raises FileNotFoundError when the file is gone: the other workers could not load it
+                if entry and entry['owned']:
+                    os.utime(entry['path'])
+                elif entry:
+                    os.stat(entry['path'])
+            tmp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+            with open(tmp_path, 'w') as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)
+            st = os.stat(path)
+        self._synced = (st.st_mtime_ns, st.st_size)
+
+    def sync_active(self):
+        """
+        Follow the bundle last published by any process: when ACTIVE.json changed
+        since the last call, load its models and activate them.
+        Returns:
+            ModelBundle or None: The new active bundle, None when nothing changed.
+        """
+        path = self._active_file()
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (st.st_mtime_ns, st.st_size)
+        if key == self._synced:
+            return None
+        # Marked first, so a record that cannot be loaded is not retried on every call
+        self._synced = key
+        try:
+            with open(path, 'r') as f:
+                record = json.load(f)
+            digests = {}
+            for kind in KINDS:
+                if kind in record:
+                    # Not owned here: only the process that stored the file may delete it
+                    entry, _ = self._register(kind, record[kind]['digest'], record[kind]['path'], owned=False)
+                    digests[kind] = entry['digest']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Model registry: could not follow {path}: {e}")
+            return None
+        if digests == {k: d for k, d in self._active.digests.items() if d}:
+            return None
+        return self.activate(**digests)
+
+    def bundle(self, version=None):
+        """
+        The active bundle, or the bundle of a version string "<lr>-<rf>"
+        (digest prefixes, 'none' for a missing model). Raises KeyError if a
+        model of that version is no longer loaded.
+        """
+        if version is None:
+            return self._active
+        lr, _, rf = version.partition('-')
+        with self._lock:
+            lr_entry = None if lr in ('', NO_MODEL) else self._lookup('lr', lr)
+            rf_entry = None if rf in ('', NO_MODEL) else self._lookup('rf', rf)
+        return ModelBundle(lr_entry, rf_entry)
+
+    def pin(self, version=None):
+        """Resolve a version (default: active) and protect its models from eviction until unpin()."""
+        with self._lock:
+            bundle = self.bundle(version)
+            for digest in bundle.digests.values():
+                if digest:
+                    self._pins[digest] = self._pins.get(digest, 0) + 1
+            return bundle
+
+    def unpin(self, bundle):
+        with self._lock:
+            for digest in bundle.digests.values():
+                if digest in self._pins:
+                    self._pins[digest] -= 1
+                    if self._pins[digest] <= 0:
+                        del self._pins[digest]
+            for kind in KINDS:
+                self._evict(kind)
+
+    @contextmanager
+    def pinned(self, version=None):
+        """with registry.pinned(version) as bundle: ... -- one consistent LR+RF pair for a request."""
+        bundle = self.pin(version)
+        try:
+            yield bundle
+        finally:
+            self.unpin(bundle)
+
+    def versions(self):
+        """Loaded models, most recently used last, as dicts (kind, digest, info, meta, active, pinned)."""
+        with self._lock:
+            active = self._active.digests
+            return [{'kind': kind, 'digest': digest, 'info': entry['info'], 'meta': entry['meta'],
+                     'active': active[kind] == digest, 'pinned': self._pins.get(digest, 0)}
+                    for kind in KINDS for digest, entry in self._entries[kind].items()]
+
+    def stored_versions(self):
+        """
+        Models stored in store_dir, from their metadata sidecars only (nothing is
+        unpickled). Files are named by digest, so they are not re-hashed either.
+        Returns:
+            list: Dicts (kind, digest, loaded, meta); meta is None without a sidecar.
+        """
+        if not os.path.isdir(self.store_dir):
+            return []
+        stored = []
+        for name in sorted(os.listdir(self.store_dir)):
+            kind, _, rest = name.partition('-')
+            if kind not in KINDS or not rest.endswith('.pkl'):
+                continue
+            digest = rest[:-len('.pkl')]
+            stored.append({'kind': kind, 'digest': digest,
+                           'loaded': digest in self._entries[kind],
+                           'meta': model_load.read_model_metadata(os.path.join(self.store_dir, name), sha256=digest)})
+        return stored
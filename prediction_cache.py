@@ -0,0 +1,168 @@
+"""
+Memoized LR/RF predictions for repeated dashboard inputs.
+
+update_chart fires on every date or crisis toggle, but the model inputs
+usually stay the same. Predictions are cached under the active model
+version plus the model input vector, quantized to `decimals` places so
+float noise from the input widgets does not cause misses.
+
+Two layers:
+    * an in-process LRU with a TTL (fast path, per worker);
+    * an optional SQLite file shared by all worker processes on the host.
+      Its entries expire after the same TTL and the oldest are dropped
+      beyond max_entries.
+Keys include the model version, so a swapped model never serves old
+predictions; invalidate() also drops the other versions' entries.
+Cached values are tuples of floats (e.g. LR, RF and the RF interval).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_TTL = 3600.0
+DEFAULT_DECIMALS = 6
+# Shared-store cleanup (expiry + size cap) runs once every this many writes
+PRUNE_EVERY = 64
+
+
+def input_key(version, *feature_frames, decimals=DEFAULT_DECIMALS):
+    """
+    Cache key of one prediction: model version plus the quantized model inputs.
+    Args:
+        version (str): Model bundle version.
+        feature_frames: One-row feature DataFrames (e.g. lr_features, rf_features).
+    Returns:
+        str
+    """
+    parts = [version]
+    for frame in feature_frames:
+        values = np.round(frame.to_numpy(dtype=float).reshape(-1), decimals) + 0.0   # + 0.0 folds -0.0 into 0.0
+        parts.append(",".join(f"{name}={value!r}" for name, value in zip(frame.columns, values.tolist())))
+    return hashlib.sha1("|".join(parts).encode('utf-8')).hexdigest()
+
+
+class PredictionCache:
+    """
+    Args:
+        path (str, optional): SQLite file shared across workers (None = in-process only).
+        max_entries (int): Entries kept in each layer.
+        ttl (float): Seconds an entry stays valid.
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self._memory = OrderedDict()   # key -> (created, version, value)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self):
+        """SQLite connection of this process (recreated after fork), or None if the store is off."""
+        if self.path is None:
+            return None
+        if self._conn is None or self._conn_pid != os.getpid():
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=1.0, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS prediction_values ("
+                             "key TEXT PRIMARY KEY, version TEXT, value TEXT, created REAL)")
+            except sqlite3.Error as e:
+                print(f"Prediction cache: shared store disabled ({e})")
+                self.path = None
+                return None
+            self._conn, self._conn_pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key):
+        """
+        Returns:
+            tuple or None: The values given to put() when cached and not expired.
+        """
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None and now - item[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return item[2]
+            if item is not None:
+                del self._memory[key]
+
+            conn = self._connection()
+            row = None
+            if conn is not None:
+                try:
+                    row = conn.execute("SELECT version, value, created FROM prediction_values WHERE key = ?",
+                                       (key,)).fetchone()
+                except sqlite3.Error:
+                    row = None
+            if row is None or now - row[2] > self.ttl:
+                self.misses += 1
+                return None
+            value = tuple(json.loads(row[1]))
+            self._remember(key, row[2], row[0], value)
+            self.hits += 1
+            return value
+
+    def _remember(self, key, created, version, value):
+        self._memory[key] = (created, version, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key, version, *values):
+        now = time.time()
+        value = tuple(float(v) for v in values)
+        with self._lock:
+            self._remember(key, now, version, value)
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                conn.execute("INSERT OR REPLACE INTO prediction_values (key, version, value, created) VALUES (?, ?, ?, ?)",
+                             (key, version, json.dumps(value), now))
+                self._writes += 1
+                if self._writes % PRUNE_EVERY == 0:
+                    self._prune(conn, now)
+            except sqlite3.Error:
+                # A busy shared store only costs a future miss
+                pass
+
+    def _prune(self, conn, now):
+        conn.execute("DELETE FROM prediction_values WHERE created < ?", (now - self.ttl,))
+        conn.execute("DELETE FROM prediction_values WHERE key IN ("
+                     "SELECT key FROM prediction_values ORDER BY created DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def invalidate(self, keep_version=None):
+        """Drop every entry (or every entry not computed with keep_version), in both layers."""
+        with self._lock:
+            for key in [k for k, item in self._memory.items() if item[1] != keep_version]:
+                del self._memory[key]
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                if keep_version is None:
+                    conn.execute("DELETE FROM prediction_values")
+                else:
+                    conn.execute("DELETE FROM prediction_values WHERE version != ?", (keep_version,))
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._memory),
+                'hit_rate': self.hits / total if total else 0.0}
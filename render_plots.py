@@ -0,0 +1,93 @@
+"""
+Render the training plots from the results saved by rolling_window.py.
+
+matplotlib and seaborn are only imported when a plot is actually drawn, so
+headless training runs (rolling_window.py --headless) never load them.
+
+Usage:
+    python render_plots.py            # render every plot from the saved results
+"""
+import os
+
+import pandas as pd
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+CORRELATIONS_CSV = 'correlations.csv'
+RESULTS_CSV = 'actual_vs_hybrid_predicted_rnfb.csv'
+CORRELATION_PNG = 'correlation_analysis.png'
+RESULTS_PNG = 'actual_vs_hybrid_predicted_rnfb.png'
+
+
+def _pyplot():
+    # Lazy import; the Agg backend needs no display on batch runners
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+
+def render_correlation(correlations_csv, out_path, top_n=20, dpi=300):
+    """Bar charts of the top Pearson and Spearman correlations (from correlations.csv)."""
+    plt, sns = _pyplot()
+    correlations = pd.read_csv(correlations_csv, index_col=0)
+    top_20_features_pearson = correlations['pearson'].abs().sort_values(ascending=False).head(top_n)
+    top_20_features_spearman = correlations['spearman'].abs().sort_values(ascending=False).head(top_n)
+
+    # Create a figure with two subplots arranged in a single column
+    fig, axes = plt.subplots(1, 2, figsize=(16, 8))
+
+    # Plot the top 20 Pearson correlations
+    sns.barplot(x=top_20_features_pearson.values, y=top_20_features_pearson.index, palette='viridis', ax=axes[0])
+    axes[0].set_title('Top 20 Most Correlated Features with RNFB (Pearson Correlation)')
+    axes[0].set_xlabel('Absolute Pearson Correlation Coefficient')
+    axes[0].set_ylabel('Feature')
+    axes[0].grid(axis='x', linestyle='--', alpha=0.7)
+
+    # Plot the top 20 Spearman correlations
+    sns.barplot(x=top_20_features_spearman.values, y=top_20_features_spearman.index, palette='plasma', ax=axes[1])
+    axes[1].set_title('Top 20 Most Correlated Features with RNFB (Spearman Correlation)')
+    axes[1].set_xlabel('Absolute Spearman Correlation Coefficient')
+    axes[1].set_ylabel('Feature')
+    axes[1].grid(axis='x', linestyle='--', alpha=0.7)
+
+    plt.tight_layout()
+    fig.savefig(out_path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return out_path
+
+
+def render_predictions(results_csv, out_path, dpi=300):
+    """Line chart of actual vs. hybrid predicted RNFB (from actual_vs_hybrid_predicted_rnfb.csv)."""
+    plt, sns = _pyplot()
+    results_df = pd.read_csv(results_csv, index_col='Date', parse_dates=['Date'])
+
+    fig = plt.figure(figsize=(15, 7))
+    sns.lineplot(data=results_df[['Actual RNFB', 'Hybrid Predicted RNFB']])
+    plt.title('Actual vs. Hybrid Model Predicted RNFB Over Time')
+    plt.xlabel('Date')
+    plt.ylabel('RNFB_w/out Value')
+    plt.legend(title='Prediction Type')
+    plt.grid(True)
+    plt.tight_layout()
+    fig.savefig(out_path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return out_path
+
+
+def render_all(results_dir=script_dir, dpi=300):
+    """Render every plot whose input file exists in results_dir. Returns the written paths."""
+    written = []
+    correlations_csv = os.path.join(results_dir, CORRELATIONS_CSV)
+    if os.path.exists(correlations_csv):
+        written.append(render_correlation(correlations_csv, os.path.join(results_dir, CORRELATION_PNG), dpi=dpi))
+    results_csv = os.path.join(results_dir, RESULTS_CSV)
+    if os.path.exists(results_csv):
+        written.append(render_predictions(results_csv, os.path.join(results_dir, RESULTS_PNG), dpi=dpi))
+    return written
+
+
+if __name__ == "__main__":
+    for path in render_all():
+        print(f"Saved plot: {path}")
@@ -0,0 +1,295 @@
+"""
+Retraining jobs started from the dashboard.
+
+A retrain runs the rolling_window.py pipeline (train_and_save) in a
+separate Python process (this module run as a script), so no web worker
+thread waits on a multi-minute backtest and the web process never imports
+the training stack for it.
+Each job gets its own directory under the jobs root. The job writes its
+models and results there, and reports progress by atomically replacing
+status.json: state, stage, windows done / total, message. The launching
+web process records the job's pid next to it.
+
+Web worker processes coordinate through the jobs root alone, under an
+fcntl lock on root_dir/.lock:
+    * start() refuses while any job directory holds a running job whose
+      process is alive, so one job runs at a time across all workers;
+    * whichever worker first sees a job that ended (status.json says done
+      or failed, or the process is gone without reporting) finalizes it:
+      calls the `publish` hook once for a successful job and records
+      'published' and 'finalized' in status.json. The launching worker
+      does so from a watcher thread as soon as the process exits; if that
+      worker is gone, the next status() call from any worker does it.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single dev server, the thread lock is enough
+    fcntl = None
+
+STATUS_FILE = 'status.json'
+PID_FILE = 'pid'
+LOCK_FILE = '.lock'
+DEFAULT_KEEP_JOBS = 5
+# A job without a recorded pid counts as starting for this long
+LAUNCH_GRACE_SECONDS = 60
+STAGE_LABELS = {'select': 'Selecting features', 'train': 'Training windows'}
+
+
+def _write_status(job_dir, **status):
+    status['updated'] = time.time()
+    tmp_path = os.path.join(job_dir, f"{STATUS_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f)
+    os.replace(tmp_path, os.path.join(job_dir, STATUS_FILE))
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # os.kill would terminate the process there; assume it runs until its own process reports
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def run_job(job_dir, options):
+    """Job process: run the training pipeline into job_dir, reporting progress to status.json."""
+    import rolling_window
+
+    started = time.time()
+    args = rolling_window.parse_args(['--headless', '--output-dir', job_dir])
+    for name, value in options.items():
+        setattr(args, name, value)
+
+    def progress(stage, done, total):
+        _write_status(job_dir, state='running', stage=stage, done=done, total=total, started=started,
+                      message=f"{STAGE_LABELS.get(stage, stage)}: {done}/{total}")
+
+    _write_status(job_dir, state='running', stage='load', done=0, total=0, started=started,
+                  message="Loading data")
+    try:
+        summary = rolling_window.train_and_save(args, progress=progress)
+    except Exception as e:
+        _write_status(job_dir, state='failed', stage='error', done=0, total=0, started=started,
+                      message=f"{type(e).__name__}: {e}")
+        raise
+    _write_status(job_dir, state='done', stage='done', done=1, total=1, started=started,
+                  message="Training finished", metrics=summary,
+                  lr_path=os.path.join(job_dir, 'lr_model.pkl'),
+                  rf_path=os.path.join(job_dir, 'rf_model.pkl'),
+                  results_path=os.path.join(job_dir, 'actual_vs_hybrid_predicted_rnfb.csv'))
+
+
+class RetrainJobs:
+    """
+    Args:
+        root_dir (str): Where job directories are created (shared by every worker process).
+        keep_jobs (int): Finished job directories kept (oldest removed first).
+        publish (callable, optional): publish(job_id, status) -> str, called once
+            for every job that finished successfully; its return value (or the
+            error it raised) is reported as the job's 'published' message.
+    """
+
+    def __init__(self, root_dir, keep_jobs=DEFAULT_KEEP_JOBS, publish=None):
+        self.root_dir = root_dir
+        self.keep_jobs = max(1, int(keep_jobs))
+        self.publish = publish
+        self._processes = {}   # job id -> subprocess.Popen (jobs this process launched)
+        self._lock = threading.Lock()
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.root_dir, job_id)
+
+    @contextmanager
+    def _jobs_lock(self):
+        """Exclusive lock on root_dir shared by every worker process."""
+        os.makedirs(self.root_dir, exist_ok=True)
+        with self._lock, open(os.path.join(self.root_dir, LOCK_FILE), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _job_ids(self):
+        try:
+            names = sorted(os.listdir(self.root_dir))
+        except OSError:
+            return []
+        return [name for name in names if os.path.isdir(self._job_dir(name))]
+
+    def _read_status(self, job_id):
+        """
+        status.json of a job, with a job whose process is gone without reporting
+        marked failed. Raises KeyError for an unknown job.
+        """
+        job_dir = self._job_dir(job_id)
+        try:
+            with open(os.path.join(job_dir, STATUS_FILE), 'r') as f:
+                status = json.load(f)
+        except FileNotFoundError:
+            raise KeyError(job_id)
+        except ValueError:
+            status = {'state': 'running', 'stage': 'start', 'done': 0, 'total': 0, 'message': "Starting"}
+        status.setdefault('published', None)
+        status.setdefault('finalized', False)
+        if status['state'] == 'running' and not self._alive(job_id):
+            # The process died without reporting (killed, out of memory, ...); see job.log
+            process = self._processes.get(job_id)
+            code = f" with code {process.returncode}" if process is not None and process.returncode is not None else ""
+            status.update(state='failed', stage='error', message=f"Job process exited{code} without reporting")
+        return status
+
+    def _alive(self, job_id):
+        process = self._processes.get(job_id)
+        if process is not None:
+            return process.poll() is None
+        try:
+            with open(os.path.join(self._job_dir(job_id), PID_FILE), 'r') as f:
+                pid = int(f.read().strip())
+        except FileNotFoundError:
+            # No pid yet: start() is launching it, unless the launching worker died before recording one
+            try:
+                return time.time() - os.path.getmtime(os.path.join(self._job_dir(job_id), STATUS_FILE)) < LAUNCH_GRACE_SECONDS
+            except OSError:
+                return False
+        except (OSError, ValueError):
+            return False
+        return _pid_alive(pid)
+
+    def running(self):
+        """Id of the job still running (launched by any worker process), or None."""
+        for job_id in self._job_ids():
+            try:
+                if self._read_status(job_id)['state'] == 'running':
+                    return job_id
+            except KeyError:
+                continue
+        return None
+
+    def start(self, **options):
+        """
+        Launch a retrain job.
+        Args:
+            options: rolling_window arguments to override (workers, seed, rf_mode, ...).
+        Returns:
+            str: Job id.
+        Raises:
+            RuntimeError: Another job is still running.
+        """
+        with self._jobs_lock():
+            running = self.running()
+            if running is not None:
+                raise RuntimeError(f"Retrain job {running} is still running.")
+            job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+            job_dir = self._job_dir(job_id)
+            os.makedirs(job_dir)
+            _write_status(job_dir, state='running', stage='start', done=0, total=0, started=time.time(),
+                          message="Starting")
+            log = open(os.path.join(job_dir, 'job.log'), 'wb')
+            try:
+                process = subprocess.Popen([sys.executable, os.path.abspath(__file__), job_dir, json.dumps(options)],
+                                           stdout=log, stderr=subprocess.STDOUT,
+                                           cwd=os.path.dirname(os.path.abspath(__file__)))
+            except OSError as e:
+                _write_status(job_dir, state='failed', stage='error', done=0, total=0, started=time.time(),
+                              message=f"Could not start the job process: {e}", finalized=True)
+                raise
+            finally:
+                # The child keeps its own handle
+                log.close()
+            with open(os.path.join(job_dir, PID_FILE), 'w') as f:
+                f.write(str(process.pid))
+            self._processes[job_id] = process
+        threading.Thread(target=self._watch, args=(job_id, process), name=f"retrain-{job_id}", daemon=True).start()
+        self._cleanup(keep=job_id)
+        return job_id
+
+    def _watch(self, job_id, process):
+        process.wait()
+        try:
+            self._finalize(job_id)
+        except (KeyError, OSError) as e:
+            print(f"Retrain job {job_id}: could not finalize ({e})")
+
+    def _finalize(self, job_id):
+        """
+        Publish an ended job once across all worker processes and record the
+        outcome in its status.json.
+        Returns:
+            dict: The job's status.
+        """
+        with self._jobs_lock():
+            # Read again under the lock: another worker may have finalized it meanwhile
+            status = self._read_status(job_id)
+            if status['finalized'] or status['state'] == 'running':
+                return status
+            if status['state'] != 'done':
+                message = None
+            elif self.publish is None:
+                message = "Not published (no publish hook)"
+            else:
+                try:
+                    message = self.publish(job_id, status)
+                except Exception as e:
+                    message = f"Publishing failed: {type(e).__name__}: {e}"
+            status.update(published=message, finalized=True)
+            _write_status(self._job_dir(job_id), **status)
+            return status
+
+    def status(self, job_id):
+        """
+        Returns:
+            dict: The job's status.json ('state' running/done/failed, 'stage', 'done',
+                  'total', 'message', and on success 'lr_path', 'rf_path',
+                  'results_path', 'metrics'), plus 'elapsed' seconds and
+                  'published' (the publish message, if any) and 'finalized' (the
+                  job was published or has failed; nothing more will change).
+                  An ended job that no worker has finalized yet is finalized here.
+        Raises:
+            KeyError: Unknown job.
+        """
+        status = self._read_status(job_id)
+        if status['state'] != 'running' and not status['finalized']:
+            status = self._finalize(job_id)
+        # A finalized job stopped the clock when it was last written
+        end = status.get('updated', time.time()) if status['finalized'] else time.time()
+        status['elapsed'] = end - status.get('started', end)
+        return status
+
+    def _cleanup(self, keep=None):
+        """Remove the oldest ended job directories beyond keep_jobs."""
+        job_ids = self._job_ids()
+        for job_id in job_ids[:-self.keep_jobs]:
+            if job_id == keep:
+                continue
+            try:
+                status = self._read_status(job_id)
+            except KeyError:
+                status = {'state': 'failed', 'finalized': True}
+            if status['state'] == 'running' or not status['finalized']:
+                continue
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+            with self._lock:
+                self._processes.pop(job_id, None)
+
+
+if __name__ == "__main__":
+    # python retrain_jobs.py <job_dir> <options json>
+    run_job(sys.argv[1], json.loads(sys.argv[2]))
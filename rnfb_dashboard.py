@@ -1,162 +1,296 @@
 import dash
-from dash import html, dcc, Input, Output, State, callback
-import pandas as pd
+from dash import html, dcc, Input, Output, State
 import plotly.graph_objects as go
-import numpy as np
-import math
-from datetime import datetime, timedelta
+from datetime import datetime
 import model_load
-import io
+import model_registry
+import scenario
+import prediction_cache
+import sensitivity
+import log_store
+import chart_data
+import horizon
+import retrain_jobs
+import uuid
+import copy
+from flask import request, jsonify, Response
 import os
-
-# Global Models 
-LR_MODEL = None
-RF_MODEL = None
-LR_INFO = ""
-RF_INFO = ""
+import threading
+
+# Global Models: the active LR+RF bundle lives in the registry and is swapped atomically on upload
+# Memory-map the compiled forest so worker processes share its pages (RNFB_MMAP_MODELS=0 disables)
+MMAP_MODELS = os.environ.get('RNFB_MMAP_MODELS', '1') != '0'
+MODEL_REGISTRY = model_registry.ModelRegistry(
+    max_versions=int(os.environ.get('RNFB_MODEL_VERSIONS', model_registry.DEFAULT_MAX_VERSIONS)),
+    mmap=MMAP_MODELS)
+
+# Predictions memoized per model version and input vector, shared by workers through a local SQLite file
+# (RNFB_PREDICTION_CACHE=0 keeps the cache in-process only)
+_prediction_cache_path = os.environ.get('RNFB_PREDICTION_CACHE', os.path.join(model_load.BASE_DIR, '.prediction_cache', 'predictions.sqlite'))
+PREDICTION_CACHE = prediction_cache.PredictionCache(
+    path=None if _prediction_cache_path in ('', '0') else _prediction_cache_path,
+    ttl=float(os.environ.get('RNFB_PREDICTION_CACHE_TTL', prediction_cache.DEFAULT_TTL)))
+
+# Debug log entries per browser session, bounded server-side; the sidebar fetches only new entries.
+# Workers share them through the same SQLite directory (RNFB_LOG_STORE=0 keeps them in-process)
+_log_store_path = os.environ.get('RNFB_LOG_STORE', os.path.join(model_load.BASE_DIR, '.prediction_cache', 'logs.sqlite'))
+LOG_STORE = log_store.LogStore(
+    max_entries=int(os.environ.get('RNFB_LOG_MAX_ENTRIES', log_store.DEFAULT_MAX_ENTRIES)),
+    max_bytes=int(os.environ.get('RNFB_LOG_MAX_BYTES', log_store.DEFAULT_MAX_BYTES)),
+    path=None if _log_store_path in ('', '0') else _log_store_path)
+# Entries the sidebar keeps in the page before dropping the oldest
+SIDEBAR_MAX_ENTRIES = 100
+LOG_POLL_MS = 5000
+# Largest page /api/logs returns (also the page size when no limit is given)
+LOG_API_MAX_LIMIT = 200
 
 # --- Auto-load models at startup ---
 STARTUP_LOG_LINES = []
 
-# WRSI Anomaly average from all_samples_clean_final.csv (used as mock value for prototype)
-WRSI_ANOMALY_AVG = 171.29
-
 def _auto_load_models():
-    global LR_MODEL, RF_MODEL, LR_INFO, RF_INFO
     STARTUP_LOG_LINES.append(f"=== Dashboard Startup [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ===")
     STARTUP_LOG_LINES.append("Auto-loading models from local directory...\n")
+    digests = {}
 
     # Load LR model
     STARTUP_LOG_LINES.append(f"[LR] Searching: {model_load.LR_MODEL_PATH}")
     try:
-        lr_model, lr_info = model_load.load_lr_model()
-        if lr_model:
-            LR_MODEL = lr_model
-            LR_INFO = lr_info
-            STARTUP_LOG_LINES.append(f"[LR] ✅ Loaded successfully")
-            STARTUP_LOG_LINES.append(lr_info)
-        else:
-            STARTUP_LOG_LINES.append(f"[LR] ❌ Failed: {lr_info}")
+        entry, _ = MODEL_REGISTRY.register_file('lr', model_load.LR_MODEL_PATH)
+        digests['lr'] = entry['digest']
+        STARTUP_LOG_LINES.append(f"[LR] ✅ Loaded successfully")
+        STARTUP_LOG_LINES.append(entry['info'])
     except Exception as e:
-        STARTUP_LOG_LINES.append(f"[LR] ❌ Error: {str(e)}")
+        STARTUP_LOG_LINES.append(f"[LR] ❌ Failed: {str(e)}")
 
     STARTUP_LOG_LINES.append("")  # blank line separator
 
     # Load RF model
     STARTUP_LOG_LINES.append(f"[RF] Searching: {model_load.RF_MODEL_PATH}")
     try:
-        rf_model, rf_info = model_load.load_rd_model()
-        if rf_model:
-            RF_MODEL = rf_model
-            RF_INFO = rf_info
-            STARTUP_LOG_LINES.append(f"[RF] ✅ Loaded successfully")
-            STARTUP_LOG_LINES.append(rf_info)
-        else:
-            STARTUP_LOG_LINES.append(f"[RF] ❌ Failed: {rf_info}")
+        entry, _ = MODEL_REGISTRY.register_file('rf', model_load.RF_MODEL_PATH)
+        digests['rf'] = entry['digest']
+        STARTUP_LOG_LINES.append(f"[RF] ✅ Loaded successfully")
+        STARTUP_LOG_LINES.append(entry['info'])
+        STARTUP_LOG_LINES.append(entry['compile_msg'])
     except Exception as e:
-        STARTUP_LOG_LINES.append(f"[RF] ❌ Error: {str(e)}")
+        STARTUP_LOG_LINES.append(f"[RF] ❌ Failed: {str(e)}")
 
+    bundle = MODEL_REGISTRY.activate(**digests)
+    STARTUP_LOG_LINES.append(f"\n[Registry] Active model version: {bundle.version}")
     STARTUP_LOG_LINES.append("\n=== Auto-load Complete ===")
 
-_auto_load_models()
-STARTUP_LOG = "\n".join(STARTUP_LOG_LINES)
+# Filled in by create_app(), which runs the startup once per process (or once in the pre-fork master)
+STARTUP_LOG = ""
+
+# --- Retraining (rolling_window.py in a background process) ---
+RETRAIN_POLL_MS = 2000
+
+def publish_retrained(job_id, status):
+    """
+    Swap a finished retrain job's LR+RF pair in as one bundle and publish it,
+    with its backtest results, to the files loaded at startup. Runs once per
+    job, in whichever worker process finalizes it (see retrain_jobs.RetrainJobs).
+    Returns:
+        str: Log message.
+    """
+    entries = {}
+    for kind in model_registry.KINDS:
+        with open(status[f'{kind}_path'], 'rb') as f:
+            entries[kind], _ = MODEL_REGISTRY.add_bytes(kind, f.read())
+    # Pickles, compiled forest, sidecars and results replace the startup files as one unit,
+    # so a restart loads the retrained pair next to its own backtest (chart_data follows the mtime)
+    files = [(status['lr_path'], model_load.LR_MODEL_PATH), (status['rf_path'], model_load.RF_MODEL_PATH),
+             (model_load.compiled_rf_path(status['rf_path']), model_load.compiled_rf_path()),
+             (status['results_path'], chart_data.RESULTS_CSV_PATH)]
+    for kind in model_registry.KINDS:
+        files.append((model_load.metadata_path(status[f'{kind}_path']),
+                      model_load.metadata_path(model_load.LR_MODEL_PATH if kind == 'lr' else model_load.RF_MODEL_PATH)))
+    # Files the job did not write (e.g. a compiled forest that failed verification) are skipped:
+    # the old ones no longer match the new pickle's hash, so startup rebuilds or ignores them
+    model_load.publish_files([(src, dest) for src, dest in files if os.path.exists(src)])
+    # Both models become active together, so no prediction sees a mixed pair
+    bundle = MODEL_REGISTRY.activate(lr=entries['lr']['digest'], rf=entries['rf']['digest'])
+    MODEL_REGISTRY.publish_active()
+    PREDICTION_CACHE.invalidate(keep_version=bundle.version)
+    print(f"Retrain job {job_id} published as model version {bundle.version}")
+    return f"[Registry] Active model version: {bundle.version}"
+
+RETRAIN_JOBS = retrain_jobs.RetrainJobs(
+    os.path.join(model_load.BASE_DIR, '.retrain_jobs'),
+    keep_jobs=int(os.environ.get('RNFB_RETRAIN_KEEP_JOBS', retrain_jobs.DEFAULT_KEEP_JOBS)),
+    publish=publish_retrained)
+# Training processes of a retrain job (rolling_window.py --workers)
+RETRAIN_WORKERS = int(os.environ.get('RNFB_RETRAIN_WORKERS', 1))
 
 # Initialize the Dash app
 app = dash.Dash(__name__, external_scripts=[{'src': 'https://cdn.tailwindcss.com'}], suppress_callback_exceptions=True)
 app.title = "RNFB Price Predictor"
+# WSGI callable; production servers should use create_server() so the models load before forking
+server = app.server
 
-# Constants & Data 
-RAW_CSV_DATA = """Date,Actual RNFB,Hybrid Predicted RNFB
-2013-01-01,401.55,395.20
-2013-04-01,393.57,399.16
-2013-07-01,391.05,394.17
-2013-10-01,400.19,391.72
-2014-01-01,395.94,399.87
-2014-04-01,402.61,397.98
-2014-07-01,401.17,400.61
-2014-10-01,403.66,402.25
-2015-01-01,406.05,400.99
-2015-04-01,405.06,405.20
-2015-07-01,405.6,406.54
-2015-10-01,410.46,406.47
-2016-01-01,414.58,409.73
-2016-04-01,429.4,411.35
-2016-07-01,421.5,425.11
-2016-10-01,413.15,420.64
-2017-01-01,413.19,420.68
-2017-04-01,403.33,415.76
-2017-07-01,404.38,406.12
-2017-10-01,415.63,410.14
-2018-01-01,422.12,416.03
-2018-04-01,423.91,420.78
-2018-07-01,422.3,421.83
-2018-10-01,428.12,424.13
-2019-01-01,422.07,425.35
-2019-04-01,422.04,426.93
-2019-07-01,421.69,423.34
-2019-10-01,418.72,429.44
-2020-01-01,416.65,428.80
-2020-04-01,434.97,425.11
-2020-07-01,425.02,444.21
-2020-10-01,420.18,426.87
-2021-01-01,419.99,426.12
-2021-04-01,420.05,424.18
-2021-07-01,424.83,424.51
-2021-10-01,434.03,426.05"""
-
-def get_base_data():
-    lines = RAW_CSV_DATA.split('\n')[1:]
-    data = []
-    for line in lines:
-        parts = line.split(',')
-        date_str = parts[0]
-        actual = float(parts[1]) if parts[1] else None
-        predicted = float(parts[2]) if parts[2] else None
-        
-        data.append({
-            'name': date_str[:7],
-            'actual': actual,
-            'predicted': predicted,
-            'type': 'historical'
-        })
-    
-    # Extrapolation logic
-    last_real = data[-1]
-    current_date = datetime.strptime(last_real['name'] + "-01", "%Y-%m-%d")
-    last_pred_val = last_real['predicted']
-    
-    target_date = datetime.strptime("2024-01-01", "%Y-%m-%d")
-    
-    # Simple consistent randomization for demo
-    np.random.seed(42) 
-    
-    while current_date < target_date:
-        # Add 3 months
-        # Logic to advance quarters roughly
-        month = current_date.month
-        year = current_date.year
-        new_month = month + 3
-        if new_month > 12:
-            new_month -= 12
-            year += 1
-        current_date = datetime(year, new_month, 1)
-        
-        date_str = current_date.strftime("%Y-%m")
-        
-        # Trend simulation
-        seasonality = math.sin((new_month - 1) / 6 * math.pi) * 2
-        last_pred_val += 0.8 + (np.random.random() - 0.3) + seasonality
-        
-        data.append({
-            'name': date_str,
-            'actual': None,
-            'predicted': round(last_pred_val, 2),
-            'type': 'projected'
-        })
-        
-    return pd.DataFrame(data)
+# --- Batch scenario API ---
+@app.server.route('/api/scenarios', methods=['POST'])
+def scenario_api():
+    """
+    Hybrid predictions for a batch of what-if scenarios.
+    Body: JSON (list of objects or {"scenarios": [...]}) or CSV (Content-Type: text/csv)
+    with any of scenario.SCENARIO_COLUMNS; omitted inputs take the dashboard defaults.
+    ?version=<lr>-<rf> pins a registry version (default: the active one);
+    ?quantiles=0.05,0.95 adds predicted_q<q> columns from the per-tree residuals;
+    ?format=csv (or Accept: text/csv) returns CSV instead of JSON.
+    """
+    try:
+        quantiles = scenario.parse_quantiles(request.args.get('quantiles'))
+        scenarios = scenario.parse_scenarios(request.get_data(), request.content_type)
+        with MODEL_REGISTRY.pinned(request.args.get('version')) as bundle:
+            if not bundle.ready:
+                return jsonify({'error': "Models not loaded", 'model_version': bundle.version}), 503
+            results = scenario.predict_scenarios(bundle, scenarios, quantiles=quantiles)
+    except KeyError as e:
+        return jsonify({'error': str(e).strip("'\"")}), 404
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    if request.args.get('format') == 'csv' or request.accept_mimetypes.best == 'text/csv':
+        return Response(results.to_csv(index=False), mimetype='text/csv',
+                        headers={'X-Model-Version': bundle.version})
+    return jsonify({
+        'model_version': bundle.version,
+        'n_scenarios': len(results),
+        'predictions': results.to_dict(orient='records'),
+    })
+
+
+@app.server.route('/api/sensitivity', methods=['POST'])
+def sensitivity_api():
+    """
+    Tornado and partial-dependence data for one scenario.
+    Body: {"scenario": {...}, "drivers": [...], "pairs": [["diesel", "jet"]], "points": 21, "pair_points": 11};
+    every field is optional and an omitted or empty "scenario" uses the dashboard defaults.
+    Grids are capped (sensitivity.MAX_POINTS, MAX_PAIR_POINTS) and the whole sweep
+    at scenario.MAX_SCENARIOS rows, like the batch endpoint.
+    ?version=<lr>-<rf> pins a registry version.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object (e.g. {"scenario": {...}}).'}), 400
+    try:
+        with MODEL_REGISTRY.pinned(request.args.get('version')) as bundle:
+            if not bundle.ready:
+                return jsonify({'error': "Models not loaded", 'model_version': bundle.version}), 503
+            result = sensitivity.sweep(
+                bundle, payload.get('scenario') or {}, drivers=payload.get('drivers'),
+                n_points=sensitivity.parse_points(payload.get('points', sensitivity.DEFAULT_POINTS), 'points'),
+                pairs=[tuple(p) for p in payload.get('pairs', [])],
+                pair_points=sensitivity.parse_points(payload.get('pair_points', sensitivity.DEFAULT_PAIR_POINTS),
+                                                     'pair_points', maximum=sensitivity.MAX_PAIR_POINTS))
+    except KeyError as e:
+        return jsonify({'error': str(e).strip("'\"")}), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    result['model_version'] = bundle.version
+    return jsonify(result)
+
+# A retrain publish interrupted by a crash is completed before anything reads the published files
+model_load.finish_publish()
+
+# Constants & Data
+# Backtest results (actual_vs_hybrid_predicted_rnfb.csv) plus the active models'
+# projections; chart_data reloads them when the files or the model version change
+df_base, BASE_CHART_KEY = chart_data.chart_frame(MODEL_REGISTRY.active())
+
+def metric_texts(metrics):
+    """Card texts for the backtest metrics (chart_data.results_metrics), '—' without results."""
+    if metrics is None:
+        return {'rmse': "—", 'mae': "—", 'r2': "—"}
+    return {key: f"{metrics[key]:.2f}" for key in ('rmse', 'mae', 'r2')}
+
+# RMSE / MAE / R² cards: the same backtest results as the chart (refreshed by update_metric_cards)
+BASE_METRICS = metric_texts(chart_data.results_metrics())
+
+# Trace order of the price chart; update_chart patches FORECAST_TRACE, HORIZON_TRACE and the predicted line colour
+ACTUAL_TRACE, PREDICTED_TRACE, FORECAST_TRACE, HORIZON_TRACE = 0, 1, 2, 3
+
+# Month-by-month scenario paths past the sample data, cached per model version and scenario
+# (finished paths also go to PREDICTION_CACHE, so workers share them)
+HORIZON = horizon.HorizonForecaster(chart_data.SAMPLES_CSV_PATH,
+                                    max_paths=int(os.environ.get('RNFB_HORIZON_PATHS', horizon.DEFAULT_MAX_PATHS)),
+                                    cache=PREDICTION_CACHE)
+
+def build_base_figure(data):
+    """
+    Price chart with the static actual/predicted traces and an empty forecast marker.
+    Built once; it ships with the page layout and update_chart only sends patches.
+    """
+    fig = go.Figure()
+
+    # Actual Trace
+    fig.add_trace(go.Scatter(
+        x=data[data['actual'].notnull()]['name'],
+        y=data[data['actual'].notnull()]['actual'],
+        mode='lines',
+        name='Actual RNFB',
+        line=dict(color='#3b82f6', width=2)
+    ))
 
-df_base = get_base_data()
+    # Predicted Trace (dashed)
+    fig.add_trace(go.Scatter(
+        x=data['name'],
+        y=data['predicted'],
+        mode='lines',
+        name='Hybrid Predicted',
+        line=dict(color='#ef4444', width=2, dash='dash')
+    ))
+
+    # Forecast Point (filled in by update_chart)
+    fig.add_trace(go.Scatter(
+        x=[],
+        y=[],
+        mode='markers+text',
+        name='Forecast',
+        marker=dict(color='#ef4444', size=12, line=dict(color='white', width=2)),
+        error_y=dict(visible=False),
+        text=[],
+        textposition="top center"
+    ))
+
+    # Scenario path from the end of the data to the forecast month (filled in by update_chart)
+    fig.add_trace(go.Scatter(
+        x=[],
+        y=[],
+        mode='lines',
+        name='Scenario Path',
+        line=dict(color='#ef4444', width=1.5, dash='dot')
+    ))
+
+    fig.update_layout(
+        template='plotly_white',
+        margin=dict(l=20, r=20, t=10, b=10),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        hovermode="x unified",
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        xaxis=dict(showgrid=False),
+        yaxis=dict(showgrid=True, gridcolor="#f1f5f9"),
+    )
+    return fig
+
+# Serialized once (plain dict), so page loads do not rebuild or re-validate the figure
+BASE_FIGURE = build_base_figure(df_base).to_plotly_json()
+_chart_figures = {BASE_CHART_KEY: BASE_FIGURE}   # chart data key -> serialized base figure (latest only)
+
+def current_chart():
+    """
+    Price chart rows for the active models, their data key and the serialized base figure.
+    The figure is rebuilt only when the key changes (new backtest, samples or model version).
+    """
+    data, key = chart_data.chart_frame(MODEL_REGISTRY.active())
+    figure = _chart_figures.get(key)
+    if figure is None:
+        figure = build_base_figure(data).to_plotly_json()
+        _chart_figures.clear()
+        _chart_figures[key] = figure
+    return data, key, figure
 
 MONTHS = [
     {'value': '01', 'label': 'January'}, {'value': '02', 'label': 'February'},
@@ -358,7 +492,12 @@ def slider_field(id_name, label, value, min, max, step):
     ])
 
 # --- Layout ---
-app.layout = html.Div(className="h-screen bg-slate-50 text-slate-800 font-sans flex flex-col overflow-hidden", children=[
+# Components whose startup content create_app() fills in (models, startup log, chart with projections)
+PRICE_CHART = dcc.Graph(id='price-chart', figure=BASE_FIGURE, style={'height': '100%'}, config={'displayModeBar': False})
+DEBUG_LOG_CONTENT = html.Div(className="p-4 flex-1 overflow-y-auto font-mono text-[11px] text-slate-600 whitespace-pre-wrap leading-relaxed", id='debug-log-content', children=[STARTUP_LOG])
+CHART_KEY_STORE = dcc.Store(id='chart-data-key', data=BASE_CHART_KEY)
+
+BASE_LAYOUT = html.Div(className="h-screen bg-slate-50 text-slate-800 font-sans flex flex-col overflow-hidden", children=[
     
     # Header
     html.Header(className="bg-white border-b border-slate-200 z-20 px-6 py-3 flex items-center justify-between shadow-sm flex-shrink-0", children=[
@@ -396,6 +535,14 @@ app.layout = html.Div(className="h-screen bg-slate-50 text-slate-800 font-sans f
                 html.Div(id='rf-status-indicator', className="w-3 h-3 rounded-full bg-slate-300", title="RF Model Status")
             ]),
 
+            # Retrain (runs rolling_window.py in the background)
+            html.Div(className="flex items-center gap-2", children=[
+                html.Button([
+                    html.Span("Retrain", className="text-xs font-semibold")
+                ], id='retrain-btn', className="px-3 py-1.5 bg-slate-100 hover:bg-slate-200 text-slate-700 rounded transition-colors text-xs"),
+                html.Span(id='retrain-status', className="text-[10px] text-slate-500")
+            ]),
+
             html.Div(className="hidden md:flex items-center gap-4 text-sm text-slate-600 bg-slate-100 px-4 py-2 rounded-full", children=[
                 html.Span(className="flex items-center gap-1", children=[
                     icon_activity(16, "text-indigo-500"), "Model: Linear Regression + RF Regressor"
@@ -557,17 +704,17 @@ app.layout = html.Div(className="h-screen bg-slate-50 text-slate-800 font-sans f
                 # RMSE
                 html.Div(className="bg-white p-4 rounded-xl shadow-sm border border-slate-200 flex flex-col justify-center", children=[
                      html.P(className="text-slate-500 text-[10px] font-bold uppercase tracking-wide mb-1 flex items-center gap-1", children=[icon_activity(12), " RMSE"]),
-                     html.Div(className="flex items-end gap-2", children=[html.Span("5.46", className="text-xl font-bold text-slate-800")])
+                     html.Div(className="flex items-end gap-2", children=[html.Span(BASE_METRICS['rmse'], id='metric-rmse', className="text-xl font-bold text-slate-800")])
                 ]),
                 # MAE
                 html.Div(className="bg-white p-4 rounded-xl shadow-sm border border-slate-200 flex flex-col justify-center", children=[
                      html.P(className="text-slate-500 text-[10px] font-bold uppercase tracking-wide mb-1 flex items-center gap-1", children=[icon_target(12), " MAE"]),
-                     html.Div(className="flex items-end gap-2", children=[html.Span("4.18", className="text-xl font-bold text-slate-800")])
+                     html.Div(className="flex items-end gap-2", children=[html.Span(BASE_METRICS['mae'], id='metric-mae', className="text-xl font-bold text-slate-800")])
                 ]),
                 # R2
                 html.Div(className="bg-white p-4 rounded-xl shadow-sm border border-slate-200 flex flex-col justify-center", children=[
                      html.P(className="text-slate-500 text-[10px] font-bold uppercase tracking-wide mb-1 flex items-center gap-1", children=[icon_bar_chart(12), " R² Score"]),
-                     html.Div(className="flex items-end gap-2", children=[html.Span("0.76", className="text-xl font-bold text-slate-800")])
+                     html.Div(className="flex items-end gap-2", children=[html.Span(BASE_METRICS['r2'], id='metric-r2', className="text-xl font-bold text-slate-800")])
                 ])
             ]),
             
@@ -581,7 +728,28 @@ app.layout = html.Div(className="h-screen bg-slate-50 text-slate-800 font-sans f
                 ]),
                 
                 dcc.Loading(type="default", children=[
-                    dcc.Graph(id='price-chart', style={'height': '100%'}, config={'displayModeBar': False})
+                    PRICE_CHART
+                ])
+            ]),
+
+            # Sensitivity (tornado + partial dependence for the current scenario)
+            html.Div(className="bg-white p-6 rounded-xl shadow-sm border border-slate-200 flex flex-col", children=[
+                html.Div(className="flex justify-between items-center mb-4", children=[
+                    html.Div([
+                        html.H3("Driver Sensitivity", className="text-lg font-bold text-slate-800"),
+                        html.P("Forecast swing across each driver's range, other inputs held at the current scenario", className="text-sm text-slate-500")
+                    ]),
+                    dcc.Dropdown(
+                        id='sensitivity-driver',
+                        options=[{'label': label, 'value': d} for d, (label, _, _) in sensitivity.DRIVERS.items()],
+                        value='diesel',
+                        clearable=False,
+                        className="w-48 text-sm"
+                    )
+                ]),
+                html.Div(className="grid grid-cols-1 md:grid-cols-2 gap-4", children=[
+                    dcc.Graph(id='sensitivity-tornado', style={'height': '280px'}, config={'displayModeBar': False}),
+                    dcc.Graph(id='sensitivity-pdp', style={'height': '280px'}, config={'displayModeBar': False})
                 ])
             ])
         ])
@@ -596,7 +764,7 @@ app.layout = html.Div(className="h-screen bg-slate-50 text-slate-800 font-sans f
             html.H3("System Debug Log", className="font-bold text-sm text-slate-800 flex items-center gap-2"),
             html.Button("✕", id="close-sidebar", className="text-slate-400 hover:text-slate-700 font-bold text-lg leading-none")
         ]),
-        html.Div(className="p-4 flex-1 overflow-y-auto font-mono text-[11px] text-slate-600 whitespace-pre-wrap leading-relaxed", id='debug-log-content', children=STARTUP_LOG)
+        DEBUG_LOG_CONTENT
     ]),
 
     ]), # End flex row (main + sidebar)
@@ -604,9 +772,18 @@ app.layout = html.Div(className="h-screen bg-slate-50 text-slate-800 font-sans f
     # Store for sidebar state
     dcc.Store(id='sidebar-state', data={'open': True}),
 
-    # Stores for log management (avoids duplicate Output on debug-log-content)
-    dcc.Store(id='upload-log-store', data=''),
-    dcc.Store(id='prediction-log-store', data=''),
+    # Log signals: the sequence number of the newest entry written by uploads / predictions.
+    # The entries themselves stay in LOG_STORE; log-cursor is the last one the sidebar shows.
+    dcc.Store(id='upload-log-signal', data=0),
+    dcc.Store(id='prediction-log-signal', data=0),
+    dcc.Store(id='retrain-log-signal', data=0),
+    dcc.Store(id='log-cursor', data={'seq': 0, 'shown': 0}),
+    dcc.Interval(id='log-poll', interval=LOG_POLL_MS),
+    # Retrain job started from this page, polled while it runs
+    dcc.Store(id='retrain-job', data=None),
+    dcc.Interval(id='retrain-poll', interval=RETRAIN_POLL_MS, disabled=True),
+    # Data key of the figure the page's price chart holds (the layout ships BASE_FIGURE)
+    CHART_KEY_STORE,
     # Hidden div to trigger auto-scroll
     html.Div(id='auto-scroll-trigger', style={'display': 'none'}),
 
@@ -672,13 +849,58 @@ app.layout = html.Div(className="h-screen bg-slate-50 text-slate-800 font-sans f
     ])
 ])
 
+def serve_layout():
+    """Layout for one page load, carrying a fresh session id for the server-side debug log."""
+    return html.Div(className=BASE_LAYOUT.className,
+                    children=BASE_LAYOUT.children + [dcc.Store(id='session-id', data=uuid.uuid4().hex)])
+
+app.layout = serve_layout
+
+_startup_lock = threading.Lock()
+_started = False
+
+def create_app():
+    """
+    Load the local models, record them for the other worker processes and return
+    the Dash app. Runs once per process; under gunicorn with preload_app (see
+    gunicorn.conf.py) it runs in the master, so the workers share the loaded
+    models copy-on-write instead of each loading its own.
+    """
+    global STARTUP_LOG, _started
+    with _startup_lock:
+        if not _started:
+            _auto_load_models()
+            MODEL_REGISTRY.publish_active()
+            STARTUP_LOG = "\n".join(STARTUP_LOG_LINES)
+            DEBUG_LOG_CONTENT.children = [STARTUP_LOG]
+            # Page loads ship the chart with the loaded models' projections
+            _, chart_key, figure = current_chart()
+            PRICE_CHART.figure = figure
+            CHART_KEY_STORE.data = chart_key
+            _started = True
+    return app
+
+def create_server():
+    """WSGI factory: gunicorn 'rnfb_dashboard:create_server()'."""
+    return create_app().server
+
+@server.before_request
+def _follow_published_models():
+    # Started as plain rnfb_dashboard:server: load the models on the first request instead
+    if not _started:
+        create_app()
+    # Models uploaded or retrained in another worker process become active here too
+    bundle = MODEL_REGISTRY.sync_active()
+    if bundle is not None:
+        PREDICTION_CACHE.invalidate(keep_version=bundle.version)
+
 # --- Callbacks ---
 
-# --- Upload callback: writes to upload-log-store ---
+# --- Upload callback: writes its log to LOG_STORE and signals upload-log-signal ---
 @app.callback(
     [Output('lr-status-indicator', 'className'),
      Output('rf-status-indicator', 'className'),
-     Output('upload-log-store', 'data'),
+     Output('upload-log-signal', 'data'),
      Output('debug-sidebar', 'className')],
     [Input('upload-lr-model', 'contents'),
      Input('upload-rf-model', 'contents'),
@@ -686,12 +908,10 @@ app.layout = html.Div(className="h-screen bg-slate-50 text-slate-800 font-sans f
      Input('toggle-debug-sidebar', 'n_clicks')],
     [State('upload-lr-model', 'filename'),
      State('upload-rf-model', 'filename'),
-     State('upload-log-store', 'data'),
+     State('session-id', 'data'),
      State('debug-sidebar', 'className')]
 )
-def handle_model_uploads(lr_contents, rf_contents, close_msg, toggle_msg, lr_filename, rf_filename, current_upload_log, current_sidebar_class_state):
-    global LR_MODEL, RF_MODEL, LR_INFO, RF_INFO
-
+def handle_model_uploads(lr_contents, rf_contents, close_msg, toggle_msg, lr_filename, rf_filename, session_id, current_sidebar_class_state):
     ctx = dash.callback_context
     triggered_id = ctx.triggered[0]['prop_id'].split('.')[0]
 
@@ -700,94 +920,189 @@ def handle_model_uploads(lr_contents, rf_contents, close_msg, toggle_msg, lr_fil
     error_class = "w-3 h-3 rounded-full bg-red-500 shadow-sm ring-2 ring-red-200"
     neutral_class = "w-3 h-3 rounded-full bg-slate-300"
 
-    lr_status = neutral_class if LR_MODEL is None else success_class
-    rf_status = neutral_class if RF_MODEL is None else success_class
+    bundle = MODEL_REGISTRY.active()
+    lr_status = neutral_class if bundle.lr_model is None else success_class
+    rf_status = neutral_class if bundle.rf_model is None else success_class
 
     # Sidebar classes (inline panel: show/hide via width)
     sidebar_open_class = "w-80 bg-white border-l border-slate-200 flex flex-col flex-shrink-0 transition-all duration-300 overflow-hidden"
     sidebar_closed_class = "w-0 bg-white border-l border-slate-200 flex flex-col flex-shrink-0 transition-all duration-300 overflow-hidden"
 
     new_sidebar_class = current_sidebar_class_state if current_sidebar_class_state else sidebar_open_class
-    upload_log = current_upload_log or ''
+    upload_signal = dash.no_update
 
     # Handle Toggle/Close
     if triggered_id == 'close-sidebar':
         new_sidebar_class = sidebar_closed_class
-        return lr_status, rf_status, upload_log, new_sidebar_class
+        return lr_status, rf_status, upload_signal, new_sidebar_class
 
     if triggered_id == 'toggle-debug-sidebar':
         if 'w-80' in new_sidebar_class:
             new_sidebar_class = sidebar_closed_class
         else:
             new_sidebar_class = sidebar_open_class
-        return lr_status, rf_status, upload_log, new_sidebar_class
+        return lr_status, rf_status, upload_signal, new_sidebar_class
 
     log_updates = []
 
-    # Handle LR Upload
-    if triggered_id == 'upload-lr-model' and lr_contents:
+    # Handle LR / RF Upload: stored by content hash, then swapped in as a new LR+RF bundle
+    uploads = [('lr', 'upload-lr-model', lr_contents), ('rf', 'upload-rf-model', rf_contents)]
+    for kind, component_id, contents in uploads:
+        if triggered_id != component_id or not contents:
+            continue
+        label = kind.upper()
         try:
-            content_type, content_string = lr_contents.split(',')
+            content_type, content_string = contents.split(',')
             decoded = base64.b64decode(content_string)
-            temp_path = "temp_lr_model.pkl"
-            with open(temp_path, "wb") as f:
-                f.write(decoded)
-            model, info = model_load.load_lr_model(temp_path)
-            if model:
-                LR_MODEL = model
-                LR_INFO = info
-                lr_status = success_class
-                log_updates.append(f"--- LR Model Loaded [{datetime.now().strftime('%H:%M:%S')}] ---\n{info}")
-                new_sidebar_class = sidebar_open_class
-            else:
-                lr_status = error_class
-                log_updates.append(f"--- LR Model Load Failed ---\n{info}")
+            entry, reused = MODEL_REGISTRY.add_bytes(kind, decoded)
+            bundle = MODEL_REGISTRY.activate(**{kind: entry['digest']})
+            # Other worker processes follow through sync_active()
+            MODEL_REGISTRY.publish_active()
+            # Cached predictions of the replaced version can never be served again
+            PREDICTION_CACHE.invalidate(keep_version=bundle.version)
+            status = success_class
+            lines = [f"--- {label} Model Loaded [{datetime.now().strftime('%H:%M:%S')}] ---", entry['info']]
+            if entry['compile_msg']:
+                lines.append(entry['compile_msg'])
+            if reused:
+                lines.append(f"[Registry] Same file as {entry['digest'][:model_registry.VERSION_PREFIX_LEN]}, reused without reloading")
+            lines.append(f"[Registry] Active model version: {bundle.version}")
+            log_updates.append("\n".join(lines))
+            new_sidebar_class = sidebar_open_class
+        except ValueError as e:
+            status = error_class
+            log_updates.append(f"--- {label} Model Load Failed ---\n{e}")
         except Exception as e:
-            lr_status = error_class
-            log_updates.append(f"Error processing LR file: {str(e)}")
+            status = error_class
+            log_updates.append(f"Error processing {label} file: {str(e)}")
+        if kind == 'lr':
+            lr_status = status
+        else:
+            rf_status = status
+
+    if log_updates:
+        upload_signal = LOG_STORE.append(session_id, "\n\n".join(log_updates))
 
-    # Handle RF Upload
-    if triggered_id == 'upload-rf-model' and rf_contents:
+    return lr_status, rf_status, upload_signal, new_sidebar_class
+
+
+# --- Retrain: start a background job, then poll its status file ---
+@app.callback(
+    [Output('retrain-job', 'data'),
+     Output('retrain-poll', 'disabled'),
+     Output('retrain-status', 'children'),
+     Output('retrain-log-signal', 'data')],
+    [Input('retrain-btn', 'n_clicks'),
+     Input('retrain-poll', 'n_intervals')],
+    [State('retrain-job', 'data'),
+     State('session-id', 'data')],
+    prevent_initial_call=True
+)
+def handle_retrain(n_clicks, n_intervals, job_id, session_id):
+    ctx = dash.callback_context
+    triggered_id = ctx.triggered[0]['prop_id'].split('.')[0]
+
+    if triggered_id == 'retrain-btn':
         try:
-            content_type, content_string = rf_contents.split(',')
-            decoded = base64.b64decode(content_string)
-            temp_path = "temp_rf_model.pkl"
-            with open(temp_path, "wb") as f:
-                f.write(decoded)
-            model, info = model_load.load_rd_model(temp_path)
-            if model:
-                RF_MODEL = model
-                RF_INFO = info
-                rf_status = success_class
-                log_updates.append(f"--- RF Model Loaded [{datetime.now().strftime('%H:%M:%S')}] ---\n{info}")
-                new_sidebar_class = sidebar_open_class
-            else:
-                rf_status = error_class
-                log_updates.append(f"--- RF Model Load Failed ---\n{info}")
-        except Exception as e:
-            rf_status = error_class
-            log_updates.append(f"Error processing RF file: {str(e)}")
+            job_id = RETRAIN_JOBS.start(workers=RETRAIN_WORKERS)
+        except (RuntimeError, OSError) as e:
+            signal = LOG_STORE.append(session_id, f"--- Retrain Not Started ---\n{e}")
+            return dash.no_update, dash.no_update, "Busy", signal
+        signal = LOG_STORE.append(session_id, f"--- Retrain Started [{datetime.now().strftime('%H:%M:%S')}] ---\n"
+                                              f"Job {job_id}: rolling_window.py in a background process")
+        return job_id, False, "Starting…", signal
+
+    if not job_id:
+        raise dash.exceptions.PreventUpdate
+    try:
+        status = RETRAIN_JOBS.status(job_id)
+    except KeyError:
+        return None, True, "", dash.no_update
+    elapsed = f"{status['elapsed'] / 60:.0f} min" if status['elapsed'] >= 60 else f"{status['elapsed']:.0f} s"
+    if status['state'] == 'running' or not status['finalized']:
+        progress = f"{status['done'] / status['total']:.0%} · " if status['total'] else ""
+        return dash.no_update, False, f"{progress}{status['message']} ({elapsed})", dash.no_update
+
+    # Finished: stop polling and report once
+    if status['state'] == 'done':
+        metrics = status.get('metrics') or {}
+        lines = [f"--- Retrain Finished [{datetime.now().strftime('%H:%M:%S')}] ---",
+                 f"Job {job_id} took {elapsed}"]
+        if metrics:
+            lines.append(f"Backtest RMSE {metrics['rmse']:.2f}, MAE {metrics['mae']:.2f}, R² {metrics['r2']:.2f}")
+        lines.append(status['published'] or "Not published")
+        label = "Retrained ✓"
+    else:
+        lines = [f"--- Retrain Failed [{datetime.now().strftime('%H:%M:%S')}] ---", f"Job {job_id}: {status['message']}"]
+        label = "Retrain failed"
+    return None, True, label, LOG_STORE.append(session_id, "\n".join(lines))
 
-    if log_updates:
-        new_entry = "\n\n".join(log_updates)
-        upload_log = upload_log + ("\n\n" if upload_log else "") + new_entry
 
-    return lr_status, rf_status, upload_log, new_sidebar_class
+# --- Backtest metric cards: recomputed when the chart data changes or a retrain is published ---
+@app.callback(
+    [Output('metric-rmse', 'children'),
+     Output('metric-mae', 'children'),
+     Output('metric-r2', 'children')],
+    [Input('chart-data-key', 'data'),
+     Input('retrain-status', 'children')],
+    prevent_initial_call=True
+)
+def update_metric_cards(chart_key, retrain_status):
+    texts = metric_texts(chart_data.results_metrics())
+    return texts['rmse'], texts['mae'], texts['r2']
 
 
-# --- Combine all logs into debug-log-content ---
+# --- Append new log entries to debug-log-content (only entries past the cursor cross the wire) ---
 @app.callback(
-    Output('debug-log-content', 'children'),
-    [Input('upload-log-store', 'data'),
-     Input('prediction-log-store', 'data')]
+    [Output('debug-log-content', 'children'),
+     Output('log-cursor', 'data')],
+    [Input('upload-log-signal', 'data'),
+     Input('prediction-log-signal', 'data'),
+     Input('retrain-log-signal', 'data'),
+     Input('log-poll', 'n_intervals')],
+    [State('session-id', 'data'),
+     State('log-cursor', 'data')]
 )
-def combine_debug_logs(upload_log, prediction_log):
-    parts = [STARTUP_LOG]
-    if upload_log:
-        parts.append(upload_log)
-    if prediction_log:
-        parts.append(prediction_log)
-    return "\n\n".join(parts)
+def append_debug_logs(upload_signal, prediction_signal, retrain_signal, n_intervals, session_id, cursor):
+    cursor = cursor or {'seq': 0, 'shown': 0}
+    page = LOG_STORE.since(session_id, cursor['seq'])
+    if not page['entries']:
+        raise dash.exceptions.PreventUpdate
+
+    children = dash.Patch()
+    shown = cursor['shown']
+    if page['truncated']:
+        # Older entries were dropped from the ring buffer before we fetched them; start over
+        children = [STARTUP_LOG]
+        shown = 0
+    new_texts = ["\n\n" + text for _, text in page['entries']][-SIDEBAR_MAX_ENTRIES:]
+    # Drop the oldest shown entries (index 0 is the startup log) to keep the page bounded
+    overflow = max(0, shown + len(new_texts) - SIDEBAR_MAX_ENTRIES)
+    if isinstance(children, dash.Patch):
+        for _ in range(min(overflow, shown)):
+            del children[1]
+    children.extend(new_texts)
+    shown = min(shown + len(new_texts), SIDEBAR_MAX_ENTRIES)
+    return children, {'seq': page['cursor'], 'shown': shown}
+
+
+# --- Incremental log API (same store as the sidebar) ---
+@app.server.route('/api/logs', methods=['GET'])
+def logs_api():
+    """
+    ?session=<id>&since=<seq>&limit=<n> -> entries newer than seq, oldest first,
+    at most min(n, LOG_API_MAX_LIMIT) of them ('more' tells whether a page follows).
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', LOG_API_MAX_LIMIT))
+    except ValueError:
+        return jsonify({'error': "since and limit must be integers"}), 400
+    if limit < 1:
+        return jsonify({'error': "limit must be at least 1"}), 400
+    page = LOG_STORE.since(request.args.get('session'), since, min(limit, LOG_API_MAX_LIMIT))
+    page['entries'] = [{'seq': seq, 'text': text} for seq, text in page['entries']]
+    return jsonify(page)
 
 # --- Auto-scroll debug log to bottom ---
 app.clientside_callback(
@@ -1039,7 +1354,8 @@ def update_jet_label(val):
      Output('metric-card-main', 'className'),
      Output('target-date-label', 'className'),
      Output('status-text', 'children'),
-     Output('prediction-log-store', 'data')],
+     Output('prediction-log-signal', 'data'),
+     Output('chart-data-key', 'data')],
     [Input('run-btn', 'n_clicks'),
      Input('month-select', 'value'),
      Input('year-select', 'value'),
@@ -1054,75 +1370,114 @@ def update_jet_label(val):
      State('input-cattle-feeder', 'value'),
      State('input-wheat', 'value'),
      State('input-milk', 'value'),
-     State('prediction-log-store', 'data')]
+     State('session-id', 'data'),
+     State('chart-data-key', 'data')]
 )
 def update_chart(n_clicks, month, year, crisis_mode_val,
-                 cpi, ex_rate, diesel, jet, temp, snow, cattle_l, cattle_f, wheat, milk, existing_pred_log):
+                 cpi, ex_rate, diesel, jet, temp, snow, cattle_l, cattle_f, wheat, milk, session_id, chart_key):
 
     selected_date = f"{year}-{month}"
     is_crisis = 'crisis' in crisis_mode_val if crisis_mode_val else False
     prediction_log_lines = []
 
-    # 1. Base chart data
-    data = df_base.copy()
+    # 1. Base chart data (read-only; reloaded only when the backtest or the models change)
+    data, data_key, base_figure = current_chart()
+    interval = None   # (low, high) around the forecast when the models provide one
+    path = None       # month-by-month forecast when the target is past the sample data
 
     # --- Real Model Prediction ---
-    use_model = (LR_MODEL is not None and RF_MODEL is not None)
+    # One bundle for the whole request, so a concurrent upload cannot mix LR and RF versions
+    bundle = MODEL_REGISTRY.active()
+    use_model = bundle.ready
 
     if use_model:
         prediction_log_lines.append(f"━━━ Prediction Run [{datetime.now().strftime('%H:%M:%S')}] ━━━")
         prediction_log_lines.append(f"📅 Target Date: {selected_date}")
+        prediction_log_lines.append(f"🏷 Model Version: {bundle.version}")
         prediction_log_lines.append(f"")
 
-        # --- LR Prediction (base trend) ---
-        lr_features = pd.DataFrame({
-            'CPI_lag_1m': [float(cpi)],
-            'currency_rate': [float(ex_rate)]
-        })
-        try:
-            lr_pred = LR_MODEL.predict(lr_features)[0]
-            prediction_log_lines.append(f"┌─ [LR] Linear Regression (Base Trend)")
-            prediction_log_lines.append(f"│  Input:")
-            prediction_log_lines.append(f"│    CPI_lag_1m     = {cpi}")
-            prediction_log_lines.append(f"│    currency_rate  = {ex_rate}")
-            prediction_log_lines.append(f"│  ✅ Result: {lr_pred:.4f}")
-            prediction_log_lines.append(f"└─────────────────────────")
-        except Exception as e:
-            lr_pred = 420.0
-            prediction_log_lines.append(f"[LR] ❌ Error: {str(e)}")
-            prediction_log_lines.append(f"     Using fallback = {lr_pred}")
-
-        prediction_log_lines.append(f"")
+        # Same column mapping as the batch scenario API, with a one-row scenario
+        scenario_inputs = {
+            'cpi': cpi, 'ex_rate': ex_rate, 'diesel': diesel, 'jet': jet, 'temp': temp, 'snow': snow,
+            'cattle_live': cattle_l, 'cattle_feeder': cattle_f, 'wheat': wheat, 'milk': milk, 'crisis': is_crisis,
+        }
+        inputs = scenario.scenario_frame([scenario_inputs])
+        lr_features, rf_features = scenario.build_features(inputs, *scenario.model_columns(bundle))
 
-        # --- RF Prediction (residual/correction) ---
-        rf_features = pd.DataFrame({
-            'ZW_lag_12M':         [float(wheat)],
-            'Diesel_Price_lag_1M': [float(diesel) * 100],
-            'DC_lag_3M':          [float(milk)],
-            'GF_lag_6M':          [float(cattle_f)],
-            'WRSI_Anomaly':       [WRSI_ANOMALY_AVG],
-            'Jet_Price_lag_1M':   [float(jet) * 100],
-            'currency_rate':      [float(ex_rate)],
-            'ZW_lag_8M':          [float(wheat)],
-            'DC_lag_4M':          [float(milk)],
-            'CPI_lag_1m':         [float(cpi)]
-        })
+        # Past the sample data: roll the models forward month by month to the target
         try:
-            rf_pred = RF_MODEL.predict(rf_features)[0]
-            prediction_log_lines.append(f"┌─ [RF] Random Forest (Residual)")
-            prediction_log_lines.append(f"│  Input Features:")
-            for col in rf_features.columns:
-                prediction_log_lines.append(f"│    {col:.<25s} {rf_features[col].values[0]:.4f}")
-            prediction_log_lines.append(f"│  ✅ Result: {rf_pred:.4f}")
-            prediction_log_lines.append(f"└─────────────────────────")
+            path = HORIZON.forecast(bundle, scenario_inputs, selected_date)
         except Exception as e:
-            rf_pred = 0.0
-            prediction_log_lines.append(f"[RF] ❌ Error: {str(e)}")
-            prediction_log_lines.append(f"     Using fallback = {rf_pred}")
+            prediction_log_lines.append(f"[Horizon] ❌ Error: {str(e)}")
+            prediction_log_lines.append(f"     Predicting {selected_date} on its own")
+            prediction_log_lines.append(f"")
+
+        # Unchanged model inputs under the same model version -> reuse the cached predictions
+        cache_key = prediction_cache.input_key(bundle.version, lr_features, rf_features)
+        cached = PREDICTION_CACHE.get(cache_key) if path is None else None
+        rf_low = rf_high = None
+        if path is not None:
+            lr_pred, rf_pred = path['lr_pred'][-1], path['rf_pred'][-1]
+            rf_low, rf_high = path['rf_low'][-1], path['rf_high'][-1]
+            n_months = len(path['months'])
+            prediction_log_lines.append(f"┌─ [Horizon] {path['months'][0]} → {path['months'][-1]} ({n_months} months)")
+            prediction_log_lines.append(f"│  Lag features from the sample data, then the scenario drivers")
+            if path['computed'] == 0:
+                prediction_log_lines.append(f"│  ♻ [Cache] Same scenario and target as an earlier run, reusing its path")
+            elif path['computed'] < n_months:
+                prediction_log_lines.append(f"│  ♻ Reused {n_months - path['computed']} cached months, computed {path['computed']}")
+            prediction_log_lines.append(f"│  LR = {lr_pred:.4f}, RF = {rf_pred:.4f}  (tree spread {rf_low:.4f} .. {rf_high:.4f})")
+            prediction_log_lines.append(f"└─────────────────────────")
+        elif cached is not None:
+            lr_pred, rf_pred, rf_low, rf_high = cached
+            prediction_log_lines.append(f"♻ [Cache] Same inputs as an earlier run, reusing its predictions")
+            prediction_log_lines.append(f"   LR = {lr_pred:.4f}, RF = {rf_pred:.4f}")
+        else:
+            predictions_ok = True
+            # --- LR Prediction (base trend) ---
+            try:
+                lr_pred = bundle.lr_model.predict(lr_features)[0]
+                prediction_log_lines.append(f"┌─ [LR] Linear Regression (Base Trend)")
+                prediction_log_lines.append(f"│  Input:")
+                prediction_log_lines.append(f"│    CPI_lag_1m     = {cpi}")
+                prediction_log_lines.append(f"│    currency_rate  = {ex_rate}")
+                prediction_log_lines.append(f"│  ✅ Result: {lr_pred:.4f}")
+                prediction_log_lines.append(f"└─────────────────────────")
+            except Exception as e:
+                lr_pred = 420.0
+                predictions_ok = False
+                prediction_log_lines.append(f"[LR] ❌ Error: {str(e)}")
+                prediction_log_lines.append(f"     Using fallback = {lr_pred}")
+
+            prediction_log_lines.append(f"")
+
+            # --- RF Prediction (residual/correction) ---
+            try:
+                rf_compiled = bundle.rf_compiled
+                # Mean and interval of the per-tree residuals from one traversal
+                rf_mean, rf_quantiles = scenario.predict_rf_interval(bundle, rf_features)
+                rf_pred = rf_mean[0]
+                rf_low, rf_high = rf_quantiles[0]
+                prediction_log_lines.append(f"┌─ [RF] Random Forest (Residual){' ⚡ compiled' if rf_compiled is not None else ''}")
+                prediction_log_lines.append(f"│  Input Features:")
+                for col in rf_features.columns:
+                    prediction_log_lines.append(f"│    {col:.<25s} {rf_features[col].values[0]:.4f}")
+                prediction_log_lines.append(f"│  ✅ Result: {rf_pred:.4f}  (tree spread {rf_low:.4f} .. {rf_high:.4f})")
+                prediction_log_lines.append(f"└─────────────────────────")
+            except Exception as e:
+                rf_pred = 0.0
+                rf_low = rf_high = None
+                predictions_ok = False
+                prediction_log_lines.append(f"[RF] ❌ Error: {str(e)}")
+                prediction_log_lines.append(f"     Using fallback = {rf_pred}")
+
+            # Fallback values are not cached
+            if predictions_ok:
+                PREDICTION_CACHE.put(cache_key, bundle.version, lr_pred, rf_pred, rf_low, rf_high)
 
         # --- Combine: Hybrid = LR + RF ---
         predicted_value = lr_pred + rf_pred
-        regime_impact = 25.5 if is_crisis else 0
+        regime_impact = scenario.CRISIS_IMPACT if is_crisis else 0
         predicted_value += regime_impact
 
         prediction_log_lines.append(f"")
@@ -1132,6 +1487,11 @@ def update_chart(n_clicks, month, year, crisis_mode_val,
         if is_crisis:
             prediction_log_lines.append(f"│  Crisis adj  = {regime_impact:+.1f}")
         prediction_log_lines.append(f"│  ✅ RNFB Predicted = ${predicted_value:.2f}")
+        if rf_low is not None:
+            # Spread of the residual forest's trees around the same LR base
+            interval = (lr_pred + rf_low + regime_impact, lr_pred + rf_high + regime_impact)
+            q_low, q_high = scenario.INTERVAL_QUANTILES
+            prediction_log_lines.append(f"│  Interval ({q_low:.0%}-{q_high:.0%} of trees) = ${interval[0]:.2f} .. ${interval[1]:.2f}")
         prediction_log_lines.append(f"└─────────────────────────")
         prediction_log_lines.append(f"━━━ Prediction Complete ━━━")
         status_text = "Crisis Impact Applied" if is_crisis else "Model Prediction"
@@ -1142,6 +1502,8 @@ def update_chart(n_clicks, month, year, crisis_mode_val,
         existing_point = data[data['name'] == selected_date]
         if not existing_point.empty:
             base_value = existing_point['predicted'].values[0]
+        elif data.empty:
+            base_value = 420.0
         else:
             last_point = data.iloc[-1]
             last_date = datetime.strptime(last_point['name'] + "-01", "%Y-%m-%d")
@@ -1153,53 +1515,32 @@ def update_chart(n_clicks, month, year, crisis_mode_val,
         core_impact = (cpi - 158.3) * 0.4 + (ex_rate - 1.36) * 15
         logistics_impact = (diesel - 1.85) * 10 + (jet - 2.10) * 15
         commodities_impact = (cattle_l - 185.5) * 0.02 + (wheat - 580) * 0.005
-        regime_impact = 25.5 if is_crisis else 0
+        regime_impact = scenario.CRISIS_IMPACT if is_crisis else 0
         total_delta = core_impact + logistics_impact + commodities_impact + regime_impact
         predicted_value = base_value + total_delta
         status_text = "Crisis Impact Applied" if is_crisis else "Mock Projection (no model)"
 
-    # --- Build Chart ---
-    fig = go.Figure()
-
-    # Actual Trace
-    fig.add_trace(go.Scatter(
-        x=data[data['actual'].notnull()]['name'],
-        y=data[data['actual'].notnull()]['actual'],
-        mode='lines',
-        name='Actual RNFB',
-        line=dict(color='#3b82f6', width=2)
-    ))
-
-    # Predicted Trace (dashed)
-    fig.add_trace(go.Scatter(
-        x=data['name'],
-        y=data['predicted'],
-        mode='lines',
-        name='Hybrid Predicted',
-        line=dict(color='#ef4444' if not is_crisis else '#d97706', width=2, dash='dash')
-    ))
-
-    # Forecast Point
-    fig.add_trace(go.Scatter(
-        x=[selected_date],
-        y=[predicted_value],
-        mode='markers+text',
-        name='Forecast',
-        marker=dict(color='#ef4444' if not is_crisis else '#d97706', size=12, line=dict(color='white', width=2)),
-        text=[selected_date],
-        textposition="top center"
-    ))
-
-    fig.update_layout(
-        template='plotly_white',
-        margin=dict(l=20, r=20, t=10, b=10),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        hovermode="x unified",
-        paper_bgcolor="rgba(0,0,0,0)",
-        plot_bgcolor="rgba(0,0,0,0)",
-        xaxis=dict(showgrid=False),
-        yaxis=dict(showgrid=True, gridcolor="#f1f5f9"),
-    )
+    # --- Update Chart ---
+    # The historical/projection traces are already in the page; only the forecast marker
+    # and the crisis colours are sent, unless the chart data changed since the page got them
+    line_color = '#ef4444' if not is_crisis else '#d97706'
+    fig = dash.Patch() if chart_key == data_key else copy.deepcopy(base_figure)
+    fig['data'][PREDICTED_TRACE]['line']['color'] = line_color
+    fig['data'][FORECAST_TRACE]['x'] = [selected_date]
+    fig['data'][FORECAST_TRACE]['y'] = [predicted_value]
+    fig['data'][FORECAST_TRACE]['text'] = [selected_date]
+    fig['data'][FORECAST_TRACE]['marker']['color'] = line_color
+    if interval is not None:
+        fig['data'][FORECAST_TRACE]['error_y'] = dict(
+            type='data', symmetric=False, visible=True,
+            array=[max(interval[1] - predicted_value, 0.0)],
+            arrayminus=[max(predicted_value - interval[0], 0.0)],
+            color='#94a3b8', thickness=1.5, width=6)
+    else:
+        fig['data'][FORECAST_TRACE]['error_y'] = dict(visible=False)
+    fig['data'][HORIZON_TRACE]['x'] = path['months'] if path is not None else []
+    fig['data'][HORIZON_TRACE]['y'] = path['predicted'].tolist() if path is not None else []
+    fig['data'][HORIZON_TRACE]['line']['color'] = line_color
 
     # Styles based on crisis mode
     card_class = "md:col-span-1 p-4 rounded-xl shadow-md text-white flex flex-col justify-between min-h-[100px] transition-colors duration-300 "
@@ -1208,15 +1549,89 @@ def update_chart(n_clicks, month, year, crisis_mode_val,
     text_class = "text-[10px] font-bold uppercase tracking-wider mb-1 "
     text_class += "text-amber-100" if is_crisis else "text-indigo-100"
 
-    new_prediction_log = "\n".join(prediction_log_lines)
-    # Append to existing log
-    if existing_pred_log:
-        prediction_log = existing_pred_log + "\n\n" + new_prediction_log
-    else:
-        prediction_log = new_prediction_log
+    # The log stays server-side; the store only carries its sequence number
+    prediction_signal = LOG_STORE.append(session_id, "\n".join(prediction_log_lines))
+
+    return fig, f"${predicted_value:.2f}", f"{selected_date} Forecast", card_class, text_class, status_text, prediction_signal, data_key
+
 
-    return fig, f"${predicted_value:.2f}", f"{selected_date} Forecast", card_class, text_class, status_text, prediction_log
+def _empty_figure(message):
+    fig = go.Figure()
+    fig.add_annotation(text=message, showarrow=False, font=dict(color="#94a3b8"))
+    fig.update_layout(template='plotly_white', xaxis=dict(visible=False), yaxis=dict(visible=False),
+                      margin=dict(l=10, r=10, t=10, b=10), paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+    return fig
+
+
+@app.callback(
+    [Output('sensitivity-tornado', 'figure'),
+     Output('sensitivity-pdp', 'figure')],
+    [Input('run-btn', 'n_clicks'),
+     Input('sensitivity-driver', 'value'),
+     Input('crisis-mode-toggle', 'value')],
+    [State('input-cpi', 'value'),
+     State('input-rate', 'value'),
+     State('input-diesel', 'value'),
+     State('input-jet', 'value'),
+     State('input-cattle-live', 'value'),
+     State('input-cattle-feeder', 'value'),
+     State('input-wheat', 'value'),
+     State('input-milk', 'value')]
+)
+def update_sensitivity(n_clicks, driver, crisis_mode_val, cpi, ex_rate, diesel, jet, cattle_l, cattle_f, wheat, milk):
+    bundle = MODEL_REGISTRY.active()
+    if not bundle.ready:
+        message = "Load both models to see driver sensitivity"
+        return _empty_figure(message), _empty_figure(message)
+
+    base = {'cpi': cpi, 'ex_rate': ex_rate, 'diesel': diesel, 'jet': jet, 'cattle_live': cattle_l,
+            'cattle_feeder': cattle_f, 'wheat': wheat, 'milk': milk,
+            'crisis': 'crisis' in crisis_mode_val if crisis_mode_val else False}
+    try:
+        # Every driver's grid in one batched prediction
+        result = sensitivity.sweep(bundle, base)
+    except Exception as e:
+        return _empty_figure(f"Sensitivity unavailable: {e}"), _empty_figure("")
+
+    # Tornado: bars from the lowest to the highest prediction across each driver's range
+    rows = result['tornado'][::-1]   # largest swing on top
+    base_value = result['base']
+    tornado = go.Figure()
+    tornado.add_trace(go.Bar(
+        y=[r['label'] for r in rows], x=[r['pred_low'] - base_value for r in rows], base=base_value,
+        orientation='h', name='Lowest', marker_color='#93c5fd',
+        customdata=[r['low'] for r in rows], hovertemplate="at %{customdata:.3f}: $%{x:.2f}<extra></extra>"
+    ))
+    tornado.add_trace(go.Bar(
+        y=[r['label'] for r in rows], x=[r['pred_high'] - base_value for r in rows], base=base_value,
+        orientation='h', name='Highest', marker_color='#4f46e5',
+        customdata=[r['high'] for r in rows], hovertemplate="at %{customdata:.3f}: $%{x:.2f}<extra></extra>"
+    ))
+    tornado.update_layout(
+        template='plotly_white', barmode='overlay', showlegend=True,
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)",
+        xaxis=dict(title="RNFB Predicted ($)", showgrid=True, gridcolor="#f1f5f9"),
+    )
+
+    # Partial dependence of the selected driver at the current scenario
+    curve = result['pdp'][driver]
+    pdp = go.Figure()
+    pdp.add_trace(go.Scatter(x=curve['values'], y=curve['predicted'], mode='lines',
+                             name=curve['label'], line=dict(color='#4f46e5', width=2)))
+    pdp.add_trace(go.Scatter(x=[base[driver]], y=[base_value], mode='markers', name='Current',
+                             marker=dict(color='#ef4444', size=10, line=dict(color='white', width=2))))
+    pdp.update_layout(
+        template='plotly_white', showlegend=False,
+        margin=dict(l=10, r=10, t=10, b=10),
+        paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)",
+        xaxis=dict(title=curve['label'], showgrid=False),
+        yaxis=dict(title="RNFB Predicted ($)", showgrid=True, gridcolor="#f1f5f9"),
+    )
+    return tornado, pdp
 
 
 if __name__ == '__main__':
-    app.run(debug=False)
+    # Development server (single process); see gunicorn.conf.py for production
+    create_app().run(debug=False)
@@ -0,0 +1,275 @@
+"""
+Hybrid LR+RF predictions for batches of what-if scenarios.
+
+A scenario is one set of dashboard inputs (cpi, ex_rate, diesel, ...).
+build_features() maps a whole table of scenarios onto the model columns at
+once (e.g. Diesel_Price_lag_1M = diesel * 100), and predict_scenarios()
+runs one vectorized predict per model for the table. The dashboard's
+single prediction goes through the same mapping with a one-row table.
+The model columns themselves come from lag_features, the rules training
+uses: a scenario holds its values, so every lag reads the current value.
+Series a scenario does not set (WRSI_Anomaly, ...) are held at
+lag_features.held_values of the sample data, the same rule the horizon
+forecaster continues them with.
+"""
+import io
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data_cache
+import lag_features
+import model_load
+
+# Scenario inputs and their defaults (the dashboard's initial values)
+SCENARIO_DEFAULTS = {
+    'cpi': 158.3,
+    'ex_rate': 0.82,
+    'diesel': 1.85,
+    'jet': 2.10,
+    'temp': -15.0,
+    'snow': 25.0,
+    'cattle_live': 185.50,
+    'cattle_feeder': 255.20,
+    'wheat': 580.00,
+    'milk': 17.50,
+    'crisis': False,
+}
+SCENARIO_COLUMNS = list(SCENARIO_DEFAULTS)
+
+# Raw monthly series set by a scenario: sample column -> (scenario input, scale to the sample units)
+SCENARIO_SERIES = {
+    'CPI no adjusted': ('cpi', 1.0),
+    'currency_rate':   ('ex_rate', 1.0),
+    'diesel_price':    ('diesel', 100.0),
+    'jet_price':       ('jet', 100.0),
+    'ZW Price':        ('wheat', 1.0),
+    'DC Price':        ('milk', 1.0),
+    'GF Price':        ('cattle_feeder', 1.0),
+    'LE Price':        ('cattle_live', 1.0),
+}
+# Model columns of the shipped models (used when a model does not record its feature names)
+LR_COLUMNS = ['CPI_lag_1m', 'currency_rate']
+RF_COLUMNS = ['ZW_lag_12M', 'Diesel_Price_lag_1M', 'DC_lag_3M', 'GF_lag_6M', 'WRSI_Anomaly',
+              'Jet_Price_lag_1M', 'currency_rate', 'ZW_lag_8M', 'DC_lag_4M', 'CPI_lag_1m']
+
+# History of the raw series that scenarios do not set
+SAMPLES_CSV_PATH = os.path.join(model_load.BASE_DIR, 'all_samples_clean_final.csv')
+# Regime adjustment added to the hybrid prediction in crisis mode
+CRISIS_IMPACT = 25.5
+MAX_SCENARIOS = 100_000
+# Default interval: 5th-95th percentile of the residual forest's per-tree outputs
+INTERVAL_QUANTILES = (0.05, 0.95)
+
+_TRUE_STRINGS = {'1', 'true', 'yes', 'y', 'crisis'}
+
+_held_lock = threading.Lock()
+_held_cache = {}   # samples path -> (stat key, held values)
+
+
+def _as_flag(value):
+    # Accept true/false, 1/0 and strings from CSV cells; empty cells are not crisis
+    if isinstance(value, str):
+        return value.strip().lower() in _TRUE_STRINGS
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return False
+    return bool(value)
+
+
+def scenario_frame(records):
+    """
+    Validate scenarios and fill omitted inputs with SCENARIO_DEFAULTS.
+    Args:
+        records (list | pd.DataFrame): Dicts or a table with SCENARIO_COLUMNS (any subset).
+    Returns:
+        pd.DataFrame: One row per scenario, float inputs and a bool 'crisis' column.
+    """
+    if isinstance(records, pd.DataFrame):
+        df = records.copy()
+    else:
+        records = list(records)
+        # An explicit index keeps one row per record, including empty ones ({} = all defaults)
+        df = pd.DataFrame(records, index=range(len(records)))
+    if len(df) == 0:
+        raise ValueError("No scenarios given.")
+    if len(df) > MAX_SCENARIOS:
+        raise ValueError(f"Too many scenarios ({len(df)}); the limit is {MAX_SCENARIOS}.")
+    unknown = [c for c in df.columns if c not in SCENARIO_DEFAULTS]
+    if unknown:
+        raise ValueError(f"Unknown scenario inputs {unknown}; expected any of {SCENARIO_COLUMNS}.")
+
+    out = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    for col, default in SCENARIO_DEFAULTS.items():
+        values = df[col].reset_index(drop=True) if col in df.columns else pd.Series(default, index=out.index)
+        if col == 'crisis':
+            out[col] = values.map(_as_flag).astype(bool)
+            continue
+        try:
+            numeric = pd.to_numeric(values, errors='raise').astype(float)
+        except (ValueError, TypeError):
+            raise ValueError(f"Scenario input '{col}' must be numeric.")
+        out[col] = numeric.fillna(default)
+    return out
+
+
+def parse_scenarios(body, content_type=None):
+    """
+    Parse a request body into a scenario table.
+    Args:
+        body (bytes | str): CSV with a header row, or JSON: a list of objects
+            or {"scenarios": [...]}.
+        content_type (str, optional): 'text/csv' selects CSV, anything else JSON.
+    Returns:
+        pd.DataFrame: See scenario_frame.
+    """
+    text = body.decode('utf-8') if isinstance(body, bytes) else body
+    if content_type and 'csv' in content_type:
+        return scenario_frame(pd.read_csv(io.StringIO(text)))
+    try:
+        payload = json.loads(text)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if isinstance(payload, dict):
+        payload = payload.get('scenarios')
+    if not isinstance(payload, list) or not all(isinstance(r, dict) for r in payload):
+        raise ValueError('Expected a JSON list of scenario objects or {"scenarios": [...]}.')
+    return scenario_frame(payload)
+
+
+def model_columns(bundle):
+    """(lr_columns, rf_columns) the bundle's models were trained on."""
+    lr_names = getattr(bundle.lr_model, 'feature_names_in_', None)
+    rf_names = getattr(bundle.rf_model, 'feature_names_in_', None)
+    return ([str(c) for c in lr_names] if lr_names is not None else list(LR_COLUMNS),
+            [str(c) for c in rf_names] if rf_names is not None else list(RF_COLUMNS))
+
+
+def held_series(samples_path=SAMPLES_CSV_PATH):
+    """
+    Values of the raw series a scenario holds when it does not set them
+    (lag_features.held_values of the sample data), reloaded when the file changes.
+    Returns:
+        pd.Series: Series name -> value; empty when the samples cannot be read.
+    """
+    try:
+        st = os.stat(samples_path)
+    except OSError as e:
+        print(f"Scenario defaults unavailable: {e}")
+        return pd.Series(dtype=float)
+    key = (st.st_mtime_ns, st.st_size)
+    with _held_lock:
+        cached = _held_cache.get(samples_path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    samples = data_cache.load_samples(samples_path)
+    held = lag_features.held_values(samples[lag_features.raw_columns(samples)])
+    with _held_lock:
+        _held_cache[samples_path] = (key, held)
+    return held
+
+
+def raw_series(scenarios, held=None):
+    """
+    Scenarios as raw monthly series in the sample units (e.g. diesel in cents/L),
+    plus every other series at its held value.
+    Args:
+        held (pd.Series, optional): Values of the series scenarios do not set
+            (default: held_series()).
+    """
+    if held is None:
+        held = held_series()
+    raw = {col: np.full(len(scenarios), value) for col, value in held.items()}
+    raw.update({col: scenarios[name].to_numpy(dtype=float) * scale for col, (name, scale) in SCENARIO_SERIES.items()})
+    return pd.DataFrame(raw)
+
+
+def build_features(scenarios, lr_columns=LR_COLUMNS, rf_columns=RF_COLUMNS, held=None):
+    """
+    Map scenarios onto the model inputs, one row per scenario.
+    Args:
+        lr_columns, rf_columns (list): Model columns (see model_columns).
+        held (pd.Series, optional): See raw_series.
+    Returns:
+        tuple: (lr_features, rf_features) DataFrames named like the training columns.
+    """
+    raw = raw_series(scenarios, held)
+    return lag_features.steady_state(raw, lr_columns), lag_features.steady_state(raw, rf_columns)
+
+
+def predict_rf(bundle, rf_features):
+    """RF residuals from the compiled forest when available, else sklearn."""
+    if bundle.rf_compiled is not None:
+        return bundle.rf_compiled.predict_frame(rf_features)
+    return np.asarray(bundle.rf_model.predict(rf_features), dtype=float)
+
+
+def predict_rf_interval(bundle, rf_features, quantiles=INTERVAL_QUANTILES):
+    """
+    RF residuals plus quantiles of the per-tree residual predictions.
+    The compiled forest gets both from one traversal; the sklearn fallback
+    has to ask each tree separately.
+    Returns:
+        tuple: (mean (n_rows,), quantiles (n_rows, len(quantiles)))
+    """
+    if bundle.rf_compiled is not None:
+        return bundle.rf_compiled.predict_quantiles(rf_features, quantiles)
+    rf_model = bundle.rf_model
+    names = getattr(rf_model, 'feature_names_in_', None)
+    # The forest's trees are fitted on arrays, in the forest's column order
+    X = (rf_features[list(names)] if names is not None else rf_features).to_numpy(dtype=float)
+    per_tree = np.column_stack([est.predict(X) for est in rf_model.estimators_])
+    mean = np.asarray(rf_model.predict(rf_features), dtype=float)
+    return mean, np.quantile(per_tree, quantiles, axis=1).T
+
+
+def quantile_column(q):
+    """Results column of a quantile, e.g. 0.05 -> 'predicted_q0.05'."""
+    return f"predicted_q{q:g}"
+
+
+def predict_scenarios(bundle, scenarios, quantiles=None):
+    """
+    Hybrid predictions for every scenario with one predict call per model.
+    Args:
+        bundle (model_registry.ModelBundle): LR+RF pair to use (must be ready).
+        scenarios (pd.DataFrame): Output of scenario_frame / parse_scenarios.
+        quantiles (list, optional): Also return these quantiles of the hybrid
+            prediction, taken over the residual forest's per-tree outputs.
+    Returns:
+        pd.DataFrame: The scenario inputs plus lr_pred, rf_pred, crisis_adj and
+        predicted (and one predicted_q<q> column per quantile).
+    """
+    if not bundle.ready:
+        raise RuntimeError("LR and RF models must both be loaded.")
+    lr_features, rf_features = build_features(scenarios, *model_columns(bundle))
+    lr_pred = np.asarray(bundle.lr_model.predict(lr_features), dtype=float).reshape(-1)
+    if quantiles:
+        rf_pred, rf_quantiles = predict_rf_interval(bundle, rf_features, quantiles)
+    else:
+        rf_pred = predict_rf(bundle, rf_features)
+    crisis_adj = np.where(scenarios['crisis'].to_numpy(dtype=bool), CRISIS_IMPACT, 0.0)
+
+    results = scenarios.copy()
+    results['lr_pred'] = lr_pred
+    results['rf_pred'] = rf_pred
+    results['crisis_adj'] = crisis_adj
+    results['predicted'] = lr_pred + rf_pred + crisis_adj
+    for k, q in enumerate(quantiles or ()):
+        results[quantile_column(q)] = lr_pred + rf_quantiles[:, k] + crisis_adj
+    return results
+
+
+def parse_quantiles(text):
+    """'0.05,0.95' -> [0.05, 0.95]; empty -> None."""
+    if not text:
+        return None
+    try:
+        quantiles = [float(q) for q in text.split(',') if q.strip()]
+    except ValueError:
+        raise ValueError(f"Invalid quantiles {text!r}; expected e.g. 0.05,0.95.")
+    if not all(0.0 <= q <= 1.0 for q in quantiles):
+        raise ValueError("Quantiles must be between 0 and 1.")
+    return quantiles or None
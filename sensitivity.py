@@ -0,0 +1,137 @@
+"""
+Sensitivity of the hybrid forecast to each dashboard driver.
+
+sweep() takes the current scenario, varies every driver across a grid
+(and optionally pairs of drivers across a 2-D grid) with all other
+inputs held fixed, and predicts every varied scenario in one batched
+scenario.predict_scenarios call. That call is a single LR predict and a
+single pass over the flattened forest. The results are the partial
+dependence curves at the current scenario and a tornado ranking of the
+drivers by their swing: the spread between the lowest and highest
+prediction anywhere on the grid (the forest's response is not monotone,
+so the ends of the range alone can miss it).
+"""
+import numpy as np
+import pandas as pd
+
+import scenario
+
+# Driver -> (label, low, high). Bounds follow the dashboard sliders where
+# they exist; other drivers sweep RELATIVE_SPAN around the current value.
+DRIVERS = {
+    'diesel': ('Diesel Price ($/L)', 1.0, 3.0),
+    'jet': ('Jet Fuel Price ($/L)', 1.0, 3.5),
+    'ex_rate': ('CAD/USD Ex.Rate', 0.60, 1.10),
+    'cpi': ('CPI (Index)', None, None),
+    'wheat': ('Wheat', None, None),
+    'milk': ('Milk III', None, None),
+    'cattle_feeder': ('Feeder Cattle', None, None),
+}
+# Live cattle, temperature and snowfall do not feed either model, so sweeping them is flat
+RELATIVE_SPAN = 0.2
+DEFAULT_POINTS = 21
+DEFAULT_PAIR_POINTS = 11
+# Largest grids a request may ask for; the whole sweep is also held to scenario.MAX_SCENARIOS rows
+MAX_POINTS = 1001
+MAX_PAIR_POINTS = 101
+
+
+def parse_points(value, name='points', maximum=MAX_POINTS):
+    """Grid size from a request value: an integer in [2, maximum] (ints, or strings/floats holding one)."""
+    if isinstance(value, bool):
+        raise ValueError(f"'{name}' must be an integer.")
+    try:
+        points = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be an integer.")
+    if not points.is_integer():
+        raise ValueError(f"'{name}' must be an integer.")
+    if points < 2:
+        raise ValueError(f"'{name}' must be at least 2.")
+    if points > maximum:
+        raise ValueError(f"'{name}' must be at most {maximum}.")
+    return int(points)
+
+
+def driver_range(driver, base_value):
+    """(low, high) sweep bounds of a driver around its current value."""
+    _, low, high = DRIVERS[driver]
+    if low is None:
+        span = abs(base_value) * RELATIVE_SPAN or 1.0
+        low, high = base_value - span, base_value + span
+    return float(low), float(high)
+
+
+def _repeat(frame, n):
+    """n copies of a one-row scenario frame (dtypes kept)."""
+    return frame.loc[frame.index.repeat(n)].reset_index(drop=True)
+
+
+def sweep(bundle, base, drivers=None, n_points=DEFAULT_POINTS, pairs=(), pair_points=DEFAULT_PAIR_POINTS):
+    """
+    Evaluate the hybrid model across a grid for each driver and driver pair.
+    Args:
+        bundle (model_registry.ModelBundle): Models to use (must be ready).
+        base (dict): Current scenario inputs (see scenario.SCENARIO_COLUMNS).
+        drivers (list, optional): Drivers to sweep (default: all of DRIVERS).
+        n_points (int): Grid points per driver.
+        pairs (list): (driver_a, driver_b) tuples swept jointly on a pair_points^2 grid.
+    Returns:
+        dict: 'base' (prediction of the current scenario),
+              'pdp' {driver: {'label', 'values', 'predicted'}},
+              'tornado' [{'driver', 'label', 'low', 'high', 'pred_low', 'pred_high', 'swing'}] by swing, largest first
+                  (pred_low/pred_high are the lowest/highest prediction on the grid, low/high the driver values there),
+              'pairs' {"a|b": {'x', 'y', 'z'}} with z[j][k] at (x[k], y[j]).
+    """
+    drivers = list(drivers) if drivers is not None else list(DRIVERS)
+    pairs = list(pairs)
+    unknown = [d for d in drivers + [d for pair in pairs for d in pair] if d not in DRIVERS]
+    if unknown:
+        raise ValueError(f"Unknown drivers {unknown}; expected any of {list(DRIVERS)}.")
+    if n_points < 2 or pair_points < 2:
+        raise ValueError("Grids need at least 2 points.")
+    n_rows = 1 + len(drivers) * n_points + len(pairs) * pair_points ** 2
+    if n_rows > scenario.MAX_SCENARIOS:
+        raise ValueError(f"Too many grid points ({n_rows}); the limit is {scenario.MAX_SCENARIOS}.")
+    base_frame = scenario.scenario_frame([base])
+    base_row = base_frame.iloc[0]
+
+    # One table: the base scenario, then every 1-D grid, then every 2-D grid
+    grids = {d: np.linspace(*driver_range(d, base_row[d]), n_points) for d in drivers}
+    blocks = [base_frame]
+    for d, grid in grids.items():
+        block = _repeat(base_frame, len(grid))
+        block[d] = grid
+        blocks.append(block)
+    pair_grids = {}
+    for a, b in pairs:
+        ga = np.linspace(*driver_range(a, base_row[a]), pair_points)
+        gb = np.linspace(*driver_range(b, base_row[b]), pair_points)
+        xx, yy = np.meshgrid(ga, gb)
+        block = _repeat(base_frame, xx.size)
+        block[a] = xx.reshape(-1)
+        block[b] = yy.reshape(-1)
+        blocks.append(block)
+        pair_grids[(a, b)] = (ga, gb)
+
+    table = pd.concat(blocks, ignore_index=True)
+    predicted = scenario.predict_scenarios(bundle, table)['predicted'].to_numpy()
+
+    result = {'base': float(predicted[0]), 'pdp': {}, 'tornado': [], 'pairs': {}}
+    offset = 1
+    for d, grid in grids.items():
+        values = predicted[offset:offset + len(grid)]
+        offset += len(grid)
+        label = DRIVERS[d][0]
+        result['pdp'][d] = {'label': label, 'values': grid.tolist(), 'predicted': values.tolist()}
+        lo, hi = int(values.argmin()), int(values.argmax())
+        result['tornado'].append({'driver': d, 'label': label, 'low': float(grid[lo]), 'high': float(grid[hi]),
+                                  'pred_low': float(values[lo]), 'pred_high': float(values[hi]),
+                                  'swing': float(values[hi] - values[lo])})
+    for (a, b), (ga, gb) in pair_grids.items():
+        n = ga.size * gb.size
+        z = predicted[offset:offset + n].reshape(gb.size, ga.size)
+        offset += n
+        result['pairs'][f"{a}|{b}"] = {'x': ga.tolist(), 'y': gb.tolist(), 'z': z.tolist()}
+    result['tornado'].sort(key=lambda row: row['swing'], reverse=True)
+    return result
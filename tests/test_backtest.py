@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest
+from feature_store import FeatureStore
+from linear_update import fit_linear_path
+
+
+@pytest.fixture(scope='module')
+def store():
+    rng = np.random.default_rng(4)
+    n = 40
+    index = pd.date_range('2012-01-01', periods=n, freq='MS')
+    df = pd.DataFrame({
+        backtest.TARGET_COL: rng.normal(400, 10, n),
+        'CPI_lag_1m': rng.normal(150, 3, n),
+        'currency_rate': rng.normal(0.8, 0.05, n),
+        'a': rng.normal(size=n), 'b': rng.normal(size=n), 'c': rng.normal(size=n), 'd': rng.normal(size=n),
+    }, index=index)
+    y, X_linear, X_rf = backtest.prepare_features(df)
+    return FeatureStore(y, X_linear, X_rf)
+
+
+def _window(store, i, features, prev_rf=None, warm_trees=0):
+    lr_model = fit_linear_path(pd.DataFrame(store.X_linear, columns=store.linear_columns),
+                               pd.Series(store.y), [i])[i]
+    return backtest.train_window(i, store, seed=backtest.window_seed(i), n_jobs=1, keep_models=True,
+                                 top_features=features, prev_rf=prev_rf, warm_trees=warm_trees, lr_model=lr_model)
+
+
+def test_warm_start_reuses_the_forest_when_features_come_back_reordered(store):
+    first = _window(store, 20, ['a', 'b', 'c'])
+    assert not first['rf_warm']
+    kept = first['rf_model'].estimators_[backtest.WARM_TREES:]
+    second = _window(store, 21, ['c', 'a', 'b'], prev_rf=first['rf_model'], warm_trees=backtest.WARM_TREES)
+    assert second['rf_warm']
+    # Columns follow the previous forest's order, so its trees still read the right features
+    assert second['top_features'] == ['a', 'b', 'c']
+    assert list(second['rf_model'].feature_names_in_) == ['a', 'b', 'c']
+    assert len(second['rf_model'].estimators_) == backtest.RF_N_ESTIMATORS
+    assert second['rf_model'].estimators_[:len(kept)] == kept
+
+
+def test_warm_start_falls_back_to_a_full_fit_when_the_set_changes(store):
+    first = _window(store, 20, ['a', 'b', 'c'])
+    second = _window(store, 21, ['a', 'b', 'd'], prev_rf=first['rf_model'], warm_trees=backtest.WARM_TREES)
+    assert not second['rf_warm']
+    assert second['top_features'] == ['a', 'b', 'd']
+    assert second['rf_model'] is not first['rf_model']
+
+
+def test_warm_feature_order():
+    class Fitted:
+        feature_names_in_ = np.array(['x', 'y'], dtype=object)
+    assert backtest.warm_feature_order(Fitted(), ['y', 'x']) == ['x', 'y']
+    assert backtest.warm_feature_order(Fitted(), ['y', 'z']) == ['y', 'z']
+    assert backtest.warm_feature_order(None, ['y', 'x']) == ['y', 'x']
+    assert not backtest.same_feature_set(Fitted(), ['x', 'y', 'y'])
+
+
+def test_warm_mode_is_rejected_with_a_cache_dir(tmp_path):
+    with pytest.raises(ValueError, match='cache_dir'):
+        backtest.run_backtest(pd.DataFrame(), cache_dir=str(tmp_path), rf_mode='warm')
+
+
+def test_cli_rejects_incremental_with_warm_mode():
+    import rolling_window
+    with pytest.raises(SystemExit):
+        rolling_window.parse_args(['--incremental', '--rf-mode', 'warm'])
+    assert rolling_window.parse_args(['--rf-mode', 'warm']).rf_mode == 'warm'
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+import chart_data
+
+
+def test_results_metrics_match_sklearn(tmp_path):
+    rng = np.random.default_rng(5)
+    actual = rng.normal(400, 20, 30)
+    predicted = actual + rng.normal(0, 5, 30)
+    path = str(tmp_path / 'results.csv')
+    pd.DataFrame({'Date': pd.date_range('2015-01-01', periods=30, freq='MS'),
+                  'Actual RNFB': actual, 'Hybrid Predicted RNFB': predicted}).to_csv(path, index=False)
+    metrics = chart_data.results_metrics(path)
+    assert metrics['rmse'] == pytest.approx(np.sqrt(mean_squared_error(actual, predicted)))
+    assert metrics['mae'] == pytest.approx(mean_absolute_error(actual, predicted))
+    assert metrics['r2'] == pytest.approx(r2_score(actual, predicted))
+
+
+def test_results_metrics_without_results(tmp_path):
+    assert chart_data.results_metrics(str(tmp_path / 'missing.csv')) is None
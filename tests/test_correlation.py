@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+import correlation
+
+
+def _data(n=40, seed=1):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2012-01-01', periods=n, freq='MS')
+    y = pd.Series(rng.normal(400, 20, n), index=index)
+    X = pd.DataFrame({
+        'linear': y * 0.5 + rng.normal(0, 5, n),
+        'noise': rng.normal(0, 1, n),
+        'ties': np.round(rng.normal(0, 1, n)),
+        'gaps': y + rng.normal(0, 10, n),
+    }, index=index)
+    X.loc[X.index[[0, 1, 7, 20]], 'gaps'] = np.nan
+    return X, y
+
+
+def test_correlate_matches_corrwith():
+    X, y = _data()
+    result = correlation.correlate(X, y)
+    np.testing.assert_allclose(result['pearson'], X.corrwith(y), rtol=1e-10)
+    np.testing.assert_allclose(result['spearman'], X.corrwith(y, method='spearman'), rtol=1e-10)
+
+
+def test_expanding_correlations_match_corrwith_on_each_prefix():
+    X, y = _data()
+    ends = [5, 12, 25, 39]
+    pearson, spearman = correlation.expanding_correlations(X, y, ends)
+    for w, end in enumerate(ends):
+        np.testing.assert_allclose(pearson.iloc[w], X.iloc[:end].corrwith(y.iloc[:end]), rtol=1e-8, atol=1e-12)
+        np.testing.assert_allclose(spearman.iloc[w], X.iloc[:end].corrwith(y.iloc[:end], method='spearman'),
+                                   rtol=1e-8, atol=1e-12)
+    # Rows are labelled with the first month each window predicts
+    assert list(pearson.index) == list(X.index[ends])
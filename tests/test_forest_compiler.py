@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+import forest_compiler
+
+
+@pytest.fixture(scope='module')
+def forest():
+    rng = np.random.default_rng(2)
+    X = pd.DataFrame(rng.normal(size=(80, 4)), columns=['a', 'b', 'c', 'd'])
+    y = X['a'] * 3 - X['c'] + rng.normal(0, 0.1, 80)
+    return RandomForestRegressor(n_estimators=15, random_state=0).fit(X, y), X
+
+
+def test_compiled_forest_is_bit_identical(forest):
+    rf, X = forest
+    compiled = forest_compiler.compile_forest(rf)
+    identical, max_diff = forest_compiler.verify(rf, compiled)
+    assert identical and max_diff == 0.0
+    identical, _ = forest_compiler.verify(rf, compiled, X.to_numpy())
+    assert identical
+
+
+def test_predict_frame_reorders_columns_and_quantiles_share_the_mean(forest):
+    rf, X = forest
+    compiled = forest_compiler.compile_forest(rf)
+    shuffled = X[['d', 'b', 'a', 'c']]
+    np.testing.assert_array_equal(compiled.predict_frame(shuffled), rf.predict(X))
+    mean, q = compiled.predict_quantiles(X, (0.05, 0.95))
+    np.testing.assert_array_equal(mean, compiled.predict(X))
+    per_tree = np.column_stack([est.predict(X.to_numpy()) for est in rf.estimators_])
+    np.testing.assert_allclose(q, np.quantile(per_tree, (0.05, 0.95), axis=1).T)
+
+
+def test_save_and_load_round_trip(forest, tmp_path):
+    rf, X = forest
+    compiled = forest_compiler.compile_forest(rf)
+    out_dir = forest_compiler.save_compiled(compiled, str(tmp_path / 'rf.compiled'))
+    loaded = forest_compiler.load_compiled(out_dir)
+    assert loaded.n_trees == compiled.n_trees
+    np.testing.assert_array_equal(loaded.predict(X), rf.predict(X))
+
+
+def test_verify_reports_a_different_forest(forest):
+    rf, X = forest
+    other = RandomForestRegressor(n_estimators=15, random_state=1).fit(X, X['b'])
+    identical, max_diff = forest_compiler.verify(rf, forest_compiler.compile_forest(other))
+    assert not identical and max_diff > 0
+
+
+def test_unfitted_model_is_rejected():
+    with pytest.raises(ValueError):
+        forest_compiler.compile_forest(RandomForestRegressor())
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import lag_features
+
+
+def _raw(n=30, seed=3):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2012-01-01', periods=n, freq='MS')
+    return pd.DataFrame({
+        'ZW Price': rng.normal(600, 30, n),
+        'diesel_price': rng.normal(130, 5, n),
+        'CPI no adjusted': np.linspace(120, 150, n),
+        'WRSI_Anomaly': rng.normal(170, 20, n),
+        'RNFB_w/out': rng.normal(400, 10, n),
+    }, index=index)
+
+
+COLUMNS = ['ZW_lag_12M', 'Diesel_Price_lag_1M', 'CPI_lag_1m', 'CPI_change_rate', 'CPI_change_rate_lag_2m',
+           'WRSI_Anomaly', 'month_sin', 'month_cos', 'RNFB_lag_3m']
+
+
+@pytest.mark.parametrize('column, expected', [
+    ('ZW_lag_12M', ('lag', 'ZW Price', 12)),
+    ('Diesel_Price_lag_1M', ('lag', 'diesel_price', 1)),
+    ('CPI_change_rate', ('change', 'CPI no adjusted', 0)),
+    ('CPI_change_rate_lag_2m', ('change', 'CPI no adjusted', 2)),
+    ('month_sin', ('seasonal', 'month_sin', 0)),
+    ('currency_rate', ('raw', 'currency_rate', 0)),
+])
+def test_resolve(column, expected):
+    assert lag_features.resolve(column) == expected
+
+
+def test_derive_matches_pandas_shift():
+    raw = _raw()
+    derived = lag_features.derive(raw, COLUMNS)
+    pd.testing.assert_series_equal(derived['ZW_lag_12M'], raw['ZW Price'].shift(12), check_names=False)
+    pd.testing.assert_series_equal(derived['RNFB_lag_3m'], raw['RNFB_w/out'].shift(3), check_names=False)
+    change = raw['CPI no adjusted'].pct_change()
+    np.testing.assert_allclose(derived['CPI_change_rate'], change)
+    np.testing.assert_allclose(derived['CPI_change_rate_lag_2m'], change.shift(2))
+    angle = 2 * np.pi * raw.index.month / 12
+    np.testing.assert_allclose(derived['month_cos'], np.round(np.cos(angle), lag_features.SEASONAL_DECIMALS))
+
+
+def test_derive_needs_the_source_series():
+    with pytest.raises(KeyError):
+        lag_features.derive(_raw()[['ZW Price']], ['DC_lag_3M'])
+
+
+def test_lag_buffer_rolls_forward_like_derive():
+    raw = _raw()
+    expected = lag_features.derive(raw, COLUMNS)
+    buf = lag_features.LagBuffer.from_frame(raw.iloc[:14], COLUMNS)
+    for month, row in raw.iloc[14:].iterrows():
+        buf.push(month, row[buf.series].to_numpy(dtype=float))
+        np.testing.assert_allclose(buf.features(), expected.loc[month, COLUMNS].to_numpy(dtype=float))
+
+
+def test_lag_buffer_needs_consecutive_months():
+    raw = _raw()
+    buf = lag_features.LagBuffer.from_frame(raw, COLUMNS)
+    with pytest.raises(ValueError):
+        buf.push(raw.index[-1] + pd.offsets.MonthBegin(2), np.zeros(len(buf.series)))
+
+
+def test_lag_buffer_set_recent_and_copy():
+    raw = _raw()
+    buf = lag_features.LagBuffer.from_frame(raw, ['RNFB_lag_3m'])
+    clone = buf.copy()
+    month = raw.index[-1]
+    for k in range(3):
+        month = month + pd.offsets.MonthBegin(1)
+        clone.push(month, [np.nan])
+    clone.set_recent('RNFB_w/out', [1.0, 2.0, 3.0])
+    clone.push(month + pd.offsets.MonthBegin(1), [np.nan])
+    assert clone.features()[0] == 1.0
+    # The original buffer is untouched
+    assert buf.month == raw.index[-1]
+    with pytest.raises(ValueError):
+        clone.set_recent('RNFB_w/out', np.zeros(buf.capacity + 1))
+
+
+def test_steady_state_holds_every_lag_at_the_current_value():
+    raw = pd.DataFrame({'ZW Price': [600.0, 650.0], 'CPI no adjusted': [150.0, 160.0]})
+    out = lag_features.steady_state(raw, ['ZW_lag_12M', 'ZW_lag_8M', 'CPI_change_rate', 'CPI_lag_1m'])
+    assert out['ZW_lag_12M'].tolist() == [600.0, 650.0]
+    assert out['ZW_lag_8M'].tolist() == [600.0, 650.0]
+    assert out['CPI_change_rate'].tolist() == [0.0, 0.0]
+    with pytest.raises(ValueError):
+        lag_features.steady_state(raw, ['month_sin'])
+    with pytest.raises(ValueError):
+        lag_features.steady_state(raw, ['DC_lag_3M'])
+
+
+def test_check_samples_flags_mismatching_columns():
+    raw = _raw()
+    samples = pd.concat([raw, lag_features.derive(raw, ['ZW_lag_12M', 'Diesel_Price_lag_1M'])], axis=1)
+    assert lag_features.check_samples(samples) == {}
+    samples.iloc[20, samples.columns.get_loc('ZW_lag_12M')] += 1.0
+    assert lag_features.check_samples(samples) == {'ZW_lag_12M': 1}
+
+
+def test_held_values():
+    raw = _raw(24)
+    raw.iloc[-1, raw.columns.get_loc('ZW Price')] = np.nan
+    held = lag_features.held_values(raw)
+    # Weather: mean of the calendar-month means; others: last observed value
+    assert held['WRSI_Anomaly'] == pytest.approx(lag_features.climatology(raw)['WRSI_Anomaly'].mean())
+    assert held['ZW Price'] == raw['ZW Price'].iloc[-2]
+    assert held['diesel_price'] == raw['diesel_price'].iloc[-1]
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from linear_update import IncrementalLinearRegression, fit_linear_path, linear_predict
+
+
+def _data(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({'CPI_lag_1m': rng.normal(150, 5, n), 'currency_rate': rng.normal(0.8, 0.05, n)})
+    y = pd.Series(2.0 * X['CPI_lag_1m'] - 30 * X['currency_rate'] + rng.normal(0, 1, n))
+    return X, y
+
+
+def test_fit_linear_path_matches_sklearn_refit():
+    X, y = _data()
+    models = fit_linear_path(X, y, [12, 30, 59])
+    for i, model in models.items():
+        ref = LinearRegression().fit(X.iloc[:i], y.iloc[:i])
+        np.testing.assert_allclose(model.coef_, ref.coef_, rtol=1e-9)
+        assert model.intercept_ == pytest.approx(ref.intercept_, rel=1e-9)
+        np.testing.assert_allclose(linear_predict(model, X.to_numpy()), ref.predict(X), rtol=1e-9)
+        assert list(model.feature_names_in_) == list(X.columns)
+
+
+def test_rank_deficient_matches_minimum_norm_solution():
+    X, y = _data(20)
+    X['copy'] = X['CPI_lag_1m']
+    updater = IncrementalLinearRegression(3)
+    for row, value in zip(X.to_numpy(), y.to_numpy()):
+        updater.partial_fit(row, value)
+    ref = LinearRegression().fit(X, y)
+    np.testing.assert_allclose(updater.predict(X.to_numpy()), ref.predict(X), rtol=1e-8)
+
+
+def test_coefficients_need_samples():
+    with pytest.raises(ValueError):
+        IncrementalLinearRegression(2).coefficients()
@@ -0,0 +1,54 @@
+import pytest
+
+import log_store
+
+
+@pytest.fixture(params=['memory', 'shared'])
+def make_store(request, tmp_path):
+    path = str(tmp_path / 'logs.sqlite') if request.param == 'shared' else None
+    return lambda **kwargs: log_store.LogStore(path=path, **kwargs)
+
+
+def test_since_pages_through_new_entries(make_store):
+    store = make_store()
+    seqs = [store.append('s', f"entry {k}") for k in range(5)]
+    assert seqs == [1, 2, 3, 4, 5]
+    page = store.since('s', 1, limit=2)
+    assert page['entries'] == [(2, 'entry 1'), (3, 'entry 2')]
+    assert page['more'] and not page['truncated']
+    page = store.since('s', page['cursor'])
+    assert [seq for seq, _ in page['entries']] == [4, 5]
+    assert page['cursor'] == 5 and not page['more']
+    assert store.since('other', 0) == {'entries': [], 'cursor': 0, 'more': False, 'truncated': False}
+
+
+def test_ring_buffer_drops_the_oldest_entries(make_store):
+    store = make_store(max_entries=3)
+    for k in range(5):
+        store.append('s', f"entry {k}")
+    page = store.since('s', 0)
+    assert [seq for seq, _ in page['entries']] == [3, 4, 5]
+    assert page['truncated']
+
+
+def test_long_entries_are_cut_to_max_bytes(make_store):
+    store = make_store(max_bytes=64)
+    store.append('s', "x" * 1000)
+    (_, text), = store.since('s', 0)['entries']
+    assert text.endswith(log_store.TRUNCATED_MARKER)
+    assert len(text.encode('utf-8')) <= 64
+
+
+def test_workers_share_one_sequence_per_session(tmp_path):
+    path = str(tmp_path / 'logs.sqlite')
+    worker_a, worker_b = log_store.LogStore(path=path), log_store.LogStore(path=path)
+    assert [worker_a.append('s', 'a1'), worker_b.append('s', 'b1'), worker_a.append('s', 'a2')] == [1, 2, 3]
+    assert worker_b.since('s', 1)['entries'] == [(2, 'b1'), (3, 'a2')]
+
+
+def test_shared_store_keeps_the_newest_sessions(tmp_path):
+    store = log_store.LogStore(path=str(tmp_path / 'logs.sqlite'), max_sessions=2)
+    for k in range(log_store.PRUNE_EVERY):
+        store.append(f"s{k}", "entry")
+    assert store.since('s0', 0)['entries'] == []
+    assert store.since(f"s{log_store.PRUNE_EVERY - 1}", 0)['entries'] == [(1, 'entry')]
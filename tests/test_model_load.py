@@ -0,0 +1,64 @@
+import json
+import os
+
+import pytest
+
+import model_load
+
+
+def _write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def _read(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+
+@pytest.fixture
+def tree(tmp_path):
+    job, live = tmp_path / 'job', tmp_path / 'live'
+    for root, tag in ((job, 'new'), (live, 'old')):
+        os.makedirs(root / 'model.pkl.compiled')
+        _write(root / 'model.pkl', tag)
+        _write(root / 'results.csv', tag)
+        _write(root / 'model.pkl.compiled' / 'feature.npy', tag)
+    pairs = [(str(job / name), str(live / name)) for name in ('model.pkl', 'model.pkl.compiled', 'results.csv')]
+    return pairs, str(tmp_path / 'journal.json')
+
+
+def test_publish_files_replaces_files_and_directories(tree):
+    pairs, journal = tree
+    model_load.publish_files(pairs, journal)
+    live_dir = os.path.dirname(pairs[0][1])
+    assert _read(os.path.join(live_dir, 'model.pkl')) == 'new'
+    assert _read(os.path.join(live_dir, 'results.csv')) == 'new'
+    assert _read(os.path.join(live_dir, 'model.pkl.compiled', 'feature.npy')) == 'new'
+    assert sorted(os.listdir(live_dir)) == ['model.pkl', 'model.pkl.compiled', 'results.csv']
+    assert not os.path.exists(journal)
+
+
+def test_failed_staging_keeps_the_old_files(tree):
+    pairs, journal = tree
+    pairs.append((pairs[0][0] + '.missing', pairs[0][1] + '.meta.json'))
+    with pytest.raises(FileNotFoundError):
+        model_load.publish_files(pairs, journal)
+    live_dir = os.path.dirname(pairs[0][1])
+    assert sorted(os.listdir(live_dir)) == ['model.pkl', 'model.pkl.compiled', 'results.csv']
+    assert _read(os.path.join(live_dir, 'model.pkl')) == 'old'
+    assert not os.path.exists(journal)
+
+
+def test_finish_publish_completes_interrupted_renames(tree):
+    pairs, journal = tree
+    (src_pkl, dest_pkl), _, (src_csv, dest_csv) = pairs
+    # Crashed after renaming the pickle, before the results
+    os.replace(src_pkl, dest_pkl)
+    staged = dest_csv + '.publish1'
+    os.replace(src_csv, staged)
+    _write(journal, json.dumps([[dest_pkl + '.publish1', dest_pkl], [staged, dest_csv]]))
+    assert model_load.finish_publish(journal) == 1
+    assert _read(dest_pkl) == 'new' and _read(dest_csv) == 'new'
+    assert not os.path.exists(journal)
+    assert model_load.finish_publish(journal) == 0
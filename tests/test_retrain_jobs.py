@@ -0,0 +1,94 @@
+import os
+import time
+
+import pytest
+
+import retrain_jobs
+
+
+class _ExitedProcess:
+    """Stands in for the subprocess.Popen of a job process that has exited."""
+
+    def __init__(self, returncode):
+        self.returncode = returncode
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self):
+        return self.returncode
+
+
+def _job_dir(root, job_id, state):
+    job_dir = os.path.join(root, job_id)
+    os.makedirs(job_dir)
+    retrain_jobs._write_status(job_dir, state=state, stage=state, done=0, total=0, started=time.time(), message=state)
+    return job_dir
+
+
+def _fake_job(root, job_id, state, pid):
+    job_dir = os.path.join(root, job_id)
+    os.makedirs(job_dir)
+    retrain_jobs._write_status(job_dir, state=state, stage=state, done=0, total=0, started=time.time(), message=state)
+    with open(os.path.join(job_dir, retrain_jobs.PID_FILE), 'w') as f:
+        f.write(str(pid))
+    return job_dir
+
+
+def _dead_pid():
+    # A pid that is not running: the highest pid plus a margin is never in use on a test machine
+    return 2 ** 22 + 12345
+
+
+def test_ended_job_is_published_once_by_any_worker(tmp_path):
+    published = []
+    worker_a = retrain_jobs.RetrainJobs(str(tmp_path), publish=lambda job_id, status: published.append('a') or "a")
+    worker_b = retrain_jobs.RetrainJobs(str(tmp_path), publish=lambda job_id, status: published.append('b') or "b")
+    # Launched by a worker that is gone
+    _fake_job(str(tmp_path), 'job1', 'done', _dead_pid())
+    assert worker_b.status('job1')['published'] == "b"
+    status = worker_a.status('job1')
+    assert status['published'] == "b" and status['finalized']
+    assert published == ['b']
+
+
+def test_job_that_died_without_reporting_is_failed(tmp_path):
+    jobs = retrain_jobs.RetrainJobs(str(tmp_path))
+    _fake_job(str(tmp_path), 'job1', 'running', _dead_pid())
+    status = jobs.status('job1')
+    assert status['state'] == 'failed' and status['finalized']
+    assert jobs.running() is None
+
+
+def test_running_job_in_another_worker_blocks_start(tmp_path):
+    jobs = retrain_jobs.RetrainJobs(str(tmp_path))
+    _fake_job(str(tmp_path), 'job1', 'running', os.getpid())
+    assert jobs.running() == 'job1'
+    with pytest.raises(RuntimeError, match='job1'):
+        jobs.start()
+
+
+def test_watcher_publishes_a_finished_job(tmp_path):
+    published = []
+    jobs = retrain_jobs.RetrainJobs(str(tmp_path), publish=lambda job_id, status: published.append(job_id) or "ok")
+    _job_dir(str(tmp_path), 'job1', 'done')
+    jobs._processes['job1'] = _ExitedProcess(0)
+    jobs._watch('job1', jobs._processes['job1'])
+    status = jobs.status('job1')
+    assert status['published'] == "ok" and status['finalized']
+    assert published == ['job1']
+
+
+def test_job_process_that_exited_without_reporting_is_failed(tmp_path):
+    jobs = retrain_jobs.RetrainJobs(str(tmp_path))
+    _job_dir(str(tmp_path), 'job1', 'running')
+    jobs._processes['job1'] = _ExitedProcess(-9)
+    status = jobs.status('job1')
+    assert status['state'] == 'failed'
+    assert '-9' in status['message']
+    assert jobs.running() is None
+
+
+def test_unknown_job(tmp_path):
+    with pytest.raises(KeyError):
+        retrain_jobs.RetrainJobs(str(tmp_path)).status('missing')
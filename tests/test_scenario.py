@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import scenario
+
+
+def test_empty_record_takes_every_default():
+    frame = scenario.scenario_frame([{}])
+    assert len(frame) == 1
+    assert list(frame.columns) == scenario.SCENARIO_COLUMNS
+    for col, default in scenario.SCENARIO_DEFAULTS.items():
+        assert frame.at[0, col] == default
+
+
+def test_records_keep_one_row_each_and_fill_missing_inputs():
+    frame = scenario.scenario_frame([{'diesel': 2.5}, {}, {'cpi': None, 'crisis': 'yes'}])
+    assert len(frame) == 3
+    assert frame['diesel'].tolist() == [2.5, scenario.SCENARIO_DEFAULTS['diesel'], scenario.SCENARIO_DEFAULTS['diesel']]
+    assert frame.at[2, 'cpi'] == scenario.SCENARIO_DEFAULTS['cpi']
+    assert frame['crisis'].tolist() == [False, False, True]
+    assert frame['crisis'].dtype == bool
+
+
+def test_table_with_a_subset_of_columns():
+    frame = scenario.scenario_frame(pd.DataFrame({'wheat': [500, 600]}, index=[10, 11]))
+    assert frame['wheat'].tolist() == [500.0, 600.0]
+    assert list(frame.index) == [0, 1]
+
+
+@pytest.mark.parametrize('records, message', [
+    ([], 'No scenarios'),
+    ([{'unknown': 1}], 'Unknown scenario inputs'),
+    ([{'cpi': 'abc'}], "'cpi' must be numeric"),
+])
+def test_invalid_scenarios(records, message):
+    with pytest.raises(ValueError, match=message):
+        scenario.scenario_frame(records)
+
+
+def test_too_many_scenarios(monkeypatch):
+    monkeypatch.setattr(scenario, 'MAX_SCENARIOS', 2)
+    with pytest.raises(ValueError, match='Too many'):
+        scenario.scenario_frame([{}] * 3)
+
+
+def test_parse_scenarios_json_and_csv():
+    assert len(scenario.parse_scenarios('[{}, {"cpi": 160}]')) == 2
+    assert len(scenario.parse_scenarios(b'{"scenarios": [{}]}')) == 1
+    frame = scenario.parse_scenarios("cpi,crisis\n160,true\n,0\n", 'text/csv')
+    assert frame['cpi'].tolist() == [160.0, scenario.SCENARIO_DEFAULTS['cpi']]
+    assert frame['crisis'].tolist() == [True, False]
+    with pytest.raises(ValueError):
+        scenario.parse_scenarios('{"scenarios": 3}')
+    with pytest.raises(ValueError, match='Invalid JSON'):
+        scenario.parse_scenarios('{')
+
+
+def test_build_features_scales_inputs_and_fills_held_series():
+    frame = scenario.scenario_frame([{'diesel': 2.0, 'wheat': 610.0}])
+    held = pd.Series({'WRSI_Anomaly': 123.0})
+    lr, rf = scenario.build_features(frame, held=held)
+    assert list(lr.columns) == scenario.LR_COLUMNS
+    assert list(rf.columns) == scenario.RF_COLUMNS
+    assert rf.at[0, 'Diesel_Price_lag_1M'] == 200.0
+    assert rf.at[0, 'ZW_lag_12M'] == 610.0
+    assert rf.at[0, 'WRSI_Anomaly'] == 123.0
+    assert lr.at[0, 'CPI_lag_1m'] == scenario.SCENARIO_DEFAULTS['cpi']
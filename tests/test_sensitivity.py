@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+import model_registry
+import scenario
+import sensitivity
+
+
+@pytest.fixture(scope='module')
+def bundle():
+    rng = np.random.default_rng(7)
+    n = 200
+    scenarios = scenario.scenario_frame([dict(scenario.SCENARIO_DEFAULTS, cpi=rng.normal(150, 10),
+                                              diesel=rng.uniform(1.0, 3.0)) for _ in range(n)])
+    X_lr, X_rf = scenario.build_features(scenarios)
+    lr = LinearRegression().fit(X_lr, 2.0 * X_lr['CPI_lag_1m'])
+    rf = RandomForestRegressor(n_estimators=10, random_state=0).fit(X_rf, np.sin(X_rf['Diesel_Price_lag_1M'] / 20))
+    return model_registry.ModelBundle({'model': lr, 'info': '', 'digest': 'a' * 64},
+                                      {'model': rf, 'info': '', 'compiled': None, 'digest': 'b' * 64})
+
+
+def test_sweep_matches_one_prediction_per_scenario(bundle):
+    base = dict(scenario.SCENARIO_DEFAULTS)
+    result = sensitivity.sweep(bundle, base, drivers=['diesel', 'cpi'], n_points=5, pairs=[('diesel', 'cpi')],
+                               pair_points=3)
+    single = scenario.predict_scenarios(bundle, scenario.scenario_frame([base]))['predicted'].iloc[0]
+    assert result['base'] == pytest.approx(single)
+    curve = result['pdp']['diesel']
+    assert len(curve['values']) == 5
+    assert curve['values'][0] == 1.0 and curve['values'][-1] == 3.0
+    expected = scenario.predict_scenarios(
+        bundle, scenario.scenario_frame([dict(base, diesel=v) for v in curve['values']]))['predicted']
+    np.testing.assert_allclose(curve['predicted'], expected)
+    swings = [row['swing'] for row in result['tornado']]
+    assert swings == sorted(swings, reverse=True)
+    pair = result['pairs']['diesel|cpi']
+    assert np.asarray(pair['z']).shape == (3, 3)
+
+
+def test_swing_spans_the_whole_grid(monkeypatch):
+    # A response that peaks mid-range and is equal at both ends
+    def predict(bundle, table):
+        return pd.DataFrame({'predicted': 10.0 - (table['diesel'] - 2.0) ** 2 + table['jet']})
+    monkeypatch.setattr(scenario, 'predict_scenarios', predict)
+    result = sensitivity.sweep(None, {'jet': 1.0}, drivers=['diesel', 'jet'], n_points=5)
+    diesel = next(row for row in result['tornado'] if row['driver'] == 'diesel')
+    assert diesel['swing'] == pytest.approx(1.0)
+    assert (diesel['high'], diesel['pred_high']) == (2.0, pytest.approx(11.0))
+    assert diesel['pred_low'] == pytest.approx(10.0)
+    assert [row['driver'] for row in result['tornado']] == ['jet', 'diesel']
+
+
+def test_sweep_rejects_unknown_drivers_and_short_grids(bundle):
+    with pytest.raises(ValueError, match='Unknown drivers'):
+        sensitivity.sweep(bundle, {}, drivers=['snow'])
+    with pytest.raises(ValueError, match='at least 2'):
+        sensitivity.sweep(bundle, {'cpi': 150}, n_points=1)
+
+
+def test_sweep_is_held_to_the_scenario_limit(bundle, monkeypatch):
+    monkeypatch.setattr(scenario, 'MAX_SCENARIOS', 50)
+    with pytest.raises(ValueError, match='Too many grid points'):
+        sensitivity.sweep(bundle, {}, drivers=['diesel'], n_points=10, pairs=[('diesel', 'cpi')], pair_points=7)
+    assert len(sensitivity.sweep(bundle, {}, drivers=['diesel'], n_points=49)['pdp']['diesel']['values']) == 49
+
+
+@pytest.mark.parametrize('value, expected', [(21, 21), ('11', 11), (5.0, 5)])
+def test_parse_points(value, expected):
+    assert sensitivity.parse_points(value) == expected
+
+
+@pytest.mark.parametrize('value', ['abc', None, 2.5, 1, True, [3], sensitivity.MAX_POINTS + 1, 10 ** 7])
+def test_parse_points_rejects(value):
+    with pytest.raises(ValueError, match="'points'"):
+        sensitivity.parse_points(value)
+
+
+def test_parse_points_maximum():
+    assert sensitivity.parse_points(sensitivity.MAX_PAIR_POINTS, 'pair_points', maximum=sensitivity.MAX_PAIR_POINTS) == 101
+    with pytest.raises(ValueError, match="'pair_points' must be at most"):
+        sensitivity.parse_points(102, 'pair_points', maximum=sensitivity.MAX_PAIR_POINTS)